@@ -9,8 +9,15 @@ https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgiapplication
+from django.core.asgi import get_asgi_application
+
+from core.db import warm_pools
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
 
-application = get_asgiapplication()
+application = get_asgi_application()
+
+# every worker process loads this module , so each one starts with open
+# pool connections , a server preloading the application before it forks
+# would share them between workers , load it in the workers instead
+warm_pools()
@@ -47,6 +47,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # first , so the measurements cover the other middleware
+    'core.middleware.RequestMetricsMiddleware',
+    # next , so the metrics record the size sent
+    'core.middleware.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -80,14 +84,66 @@ WSGI_APPLICATION = 'app.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
+# core.db.backends.postgresql adds connection health checks and an
+# optional in process pool , with the pool connections go back to it at
+# the end of every request instead of staying with a thread
+DB_POOL = os.environ.get('DB_POOL', '0') == '1'
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'core.db.backends.postgresql',
         'HOST': os.environ.get('DB_HOST'),
         'NAME':  os.environ.get('DB_NAME'),
         'USER':  os.environ.get('DB_USER'),
         'PASSWORD':  os.environ.get('DB_PASS'),
+        'CONN_MAX_AGE': 0 if DB_POOL else int(
+            os.environ.get('DB_CONN_MAX_AGE', 60)
+        ),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'pool': {
+                'MIN_SIZE': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+                'MAX_SIZE': int(os.environ.get('DB_POOL_MAX_SIZE', 20)),
+                'IDLE_TIMEOUT': int(os.environ.get('DB_POOL_IDLE_TIMEOUT', 300)),
+                'TIMEOUT': int(os.environ.get('DB_POOL_TIMEOUT', 10)),
+                # every server worker opens MIN_SIZE when it starts
+                'WARM_ON_START': os.environ.get(
+                    'DB_POOL_WARM_ON_START', '1'
+                ) == '1',
+            } if DB_POOL else False,
+        },
+    }
+}
+
+# read replicas , a comma separated list of hosts , each one becomes the
+# alias replica_1 , replica_2 ... with the credentials of the primary ,
+# pointing one at the primary host routes the reads with a single server
+DB_REPLICA_HOSTS = [
+    host for host in os.environ.get('DB_REPLICA_HOSTS', '').split(',') if host
+]
+for index, host in enumerate(DB_REPLICA_HOSTS, 1):
+    DATABASES[f'replica_{index}'] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'TEST': {'MIRROR': 'default'},
     }
+
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+
+# safe requests of the recipe and tag views read from a replica , see
+# core.routers , CACHE holds the read your writes pins and has to be
+# shared by every process of the deployment , memcached or redis , with
+# the process local default cache every read goes to the primary unless
+# DB_REPLICA_LOCAL_PINS says the deployment runs a single process
+READ_REPLICAS = {
+    'ALIASES': [f'replica_{index}' for index in range(
+        1, len(DB_REPLICA_HOSTS) + 1
+    )],
+    'PIN_SECONDS': int(os.environ.get('DB_REPLICA_PIN_SECONDS', 5)),
+    'MAX_LAG': float(os.environ.get('DB_REPLICA_MAX_LAG', 5)),
+    'LAG_CHECK_INTERVAL': 2,
+    'CACHE': os.environ.get('DB_REPLICA_PIN_CACHE', 'default'),
+    'LOCAL_PINS': os.environ.get('DB_REPLICA_LOCAL_PINS', '0') == '1',
 }
 
 
@@ -109,6 +165,34 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# the first hasher hashes new passwords , the others still verify older
+# hashes which are rehashed with the first one on the next login
+PASSWORD_HASHER = os.environ.get('PASSWORD_HASHER', 'argon2')
+_PASSWORD_HASHERS = {
+    'argon2': 'core.hashers.Argon2PasswordHasher',
+    'pbkdf2': 'core.hashers.PBKDF2PasswordHasher',
+    # needs the bcrypt package
+    'bcrypt': 'core.hashers.BCryptSHA256PasswordHasher',
+}
+PASSWORD_HASHERS = [_PASSWORD_HASHERS[PASSWORD_HASHER]] + [
+    path for name, path in _PASSWORD_HASHERS.items()
+    if name != PASSWORD_HASHER
+]
+
+# cost of the hashers and the worker threads hashing , see core.hashers
+PASSWORD_HASHING = {
+    'ARGON2_TIME_COST': int(os.environ.get('ARGON2_TIME_COST', 2)),
+    'ARGON2_MEMORY_COST': int(os.environ.get('ARGON2_MEMORY_COST', 19456)),
+    'ARGON2_PARALLELISM': 1,
+    'BCRYPT_ROUNDS': int(os.environ.get('BCRYPT_ROUNDS', 12)),
+    'PBKDF2_ITERATIONS': int(os.environ.get('PBKDF2_ITERATIONS', 260000)),
+    'WORKERS': int(
+        os.environ.get('PASSWORD_HASHING_WORKERS', os.cpu_count() or 1)
+    ),
+    'QUEUE_SIZE': int(os.environ.get('PASSWORD_HASHING_QUEUE_SIZE', 64)),
+    'QUEUE_TIMEOUT': 2,
+}
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/3.2/topics/i18n/
@@ -138,4 +222,101 @@ AUTH_USER_MODEL = 'user.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    # keyset pagination , use core.pagination.PageNumberPagination
+    # for page number pagination instead
+    'DEFAULT_PAGINATION_CLASS': 'core.pagination.KeysetPagination',
+    'PAGE_SIZE': 100,
+}
+
+# core.authentication.CachedTokenAuthentication
+# TTL bounds how long other processes keep a token after it is revoked
+TOKEN_AUTH_CACHE = {
+    'MAX_SIZE': 10000,
+    'TTL': 60,
+    # alias in CACHES for a tier shared between processes , None disables it
+    'SHARED_CACHE': None,
+    'SHARED_TTL': 300,
+}
+
+# stateless signed tokens verified without a lookup , see core.tokens ,
+# with AUTH_TOKEN_MODE=signed the token endpoint issues them , database
+# tokens keep working either way
+SIGNED_TOKENS = {
+    'ENABLED': os.environ.get('AUTH_TOKEN_MODE', 'db') == 'signed',
+    # key id:secret pairs , ids without dots , the first signs and all of
+    # them verify , add a new key first and drop the old one after TTL
+    # to rotate
+    'KEYS': [
+        tuple(pair.split(':', 1))
+        for pair in os.environ.get('SIGNED_TOKEN_KEYS', '').split(',')
+        if pair
+    ],
+    'TTL': int(os.environ.get('SIGNED_TOKEN_TTL', 3600)),
+    # holds the revocations , shared like the READ_REPLICAS pins , with the
+    # process local default cache every verify reads the user row unless
+    # SIGNED_TOKEN_LOCAL_REVOCATIONS says the deployment runs a single
+    # process
+    'REVOCATION_CACHE': os.environ.get(
+        'SIGNED_TOKEN_REVOCATION_CACHE', 'default'
+    ),
+    'LOCAL_REVOCATIONS': os.environ.get(
+        'SIGNED_TOKEN_LOCAL_REVOCATIONS', '0'
+    ) == '1',
+}
+
+# core.middleware.RequestMetricsMiddleware , histograms at ops/metrics/
+REQUEST_METRICS = {
+    'ENABLED': True,
+    'SERVER_TIMING': True,
+    'PROFILE_SAMPLE_RATE': float(os.environ.get('PROFILE_SAMPLE_RATE', 0)),
+    'PROFILE_DIR': os.environ.get('PROFILE_DIR', '/tmp/profiles'),
+}
+
+# async read paths served under asgi , see core.async_views ,
+# they need postgresql and fall back to the sync views otherwise
+ASYNC_READS = {
+    'ENABLED': os.environ.get('ASYNC_READS', '0') == '1',
+    'POOL_MIN_SIZE': 1,
+    'POOL_MAX_SIZE': int(os.environ.get('ASYNC_READS_POOL_SIZE', 10)),
+}
+
+# chunked deletes of accounts and tags , see core.deletion
+FAST_DELETE = {
+    'CHUNK_SIZE': int(os.environ.get('FAST_DELETE_CHUNK_SIZE', 2000)),
+    'BACKGROUND_THRESHOLD': int(
+        os.environ.get('FAST_DELETE_BACKGROUND_THRESHOLD', 20000)
+    ),
+}
+
+# the job queue in the database , see core.jobs , run the workers with
+# python manage.py run_jobs
+JOBS = {
+    'POLL_INTERVAL': float(os.environ.get('JOBS_POLL_INTERVAL', 1)),
+    'MAX_ATTEMPTS': 3,
+    'RETRY_DELAY': 10,
+    'LEASE': int(os.environ.get('JOBS_LEASE', 600)),
+}
+
+# server side cache of rendered list pages , see core.mixins
+RESPONSE_CACHE = {
+    'ENABLED': False,
+    'CACHE': 'default',
+    'TTL': 300,
+}
+
+# gzip , brotli and zstd compression of the api , see core.compression
+COMPRESSION = {
+    'ENABLED': os.environ.get('COMPRESSION', '1') == '1',
+    'MIN_SIZE': int(os.environ.get('COMPRESSION_MIN_SIZE', 1024)),
+    'LEVELS': {
+        'br': int(os.environ.get('COMPRESSION_BROTLI_LEVEL', 4)),
+        'zstd': int(os.environ.get('COMPRESSION_ZSTD_LEVEL', 3)),
+        'gzip': int(os.environ.get('COMPRESSION_GZIP_LEVEL', 6)),
+    },
+}
+
+# batch requests at api/batch/ , see core.batch
+BATCH = {
+    'MAX_REQUESTS': int(os.environ.get('BATCH_MAX_REQUESTS', 20)),
+    'CONCURRENCY': int(os.environ.get('BATCH_CONCURRENCY', 4)),
 }
@@ -20,8 +20,11 @@ from drf_spectacular.views import (
 from django.contrib import admin
 from django.urls import path, include
 
+from core.views import MetricsView
+
 
 urlpatterns = [
+    path('ops/metrics/', MetricsView.as_view(), name='ops-metrics'),
     path('ops/', admin.site.urls),
     path('api/schema/', SpectacularAPIView.as_view(), name='api-schema'),
     path(
@@ -30,4 +33,5 @@ urlpatterns = [
     ),
     path('api/user/', include('user.urls')),
     path('api/recipes/', include('recipe.urls')),
+    path('api/', include('core.urls')),
 ]
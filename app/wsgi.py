@@ -11,6 +11,13 @@ import os
 
 from django.core.wsgi import get_wsgi_application
 
+from core.db import warm_pools
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
 
 application = get_wsgi_application()
+
+# every worker process loads this module , so each one starts with open
+# pool connections , a server preloading the application before it forks
+# would share them between workers , load it in the workers instead
+warm_pools()
@@ -0,0 +1,63 @@
+"""
+Async dispatch of the read requests , see core.mixins.AsyncReadMixin
+"""
+import asyncio
+from functools import update_wrapper
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.urls import URLPattern
+
+from core.asyncdb import get_async_reads_config, is_supported
+
+
+def get_read_action(view):
+    """ the action answering GET , the method name for plain views """
+    actions = getattr(view, 'actions', None)
+    return actions.get('get') if actions else 'get'
+
+
+def has_async_read(view):
+    cls = getattr(view, 'cls', None)
+    return hasattr(cls, 'async_dispatch') and \
+        hasattr(cls, f'async_{get_read_action(view)}')
+
+
+def async_read(view):
+    """
+    wrap a drf view so GET requests served by asgi try the async action of
+    the view first , everything else runs the sync view in a thread
+    """
+    if asyncio.iscoroutinefunction(view):
+        return view
+    actions = getattr(view, 'actions', None)
+    sync_view = sync_to_async(view)
+
+    async def async_view(request, *args, **kwargs):
+        if request.method == 'GET' and isinstance(request, ASGIRequest) \
+                and is_supported():
+            response = await view.cls.async_dispatch(
+                request,
+                dict(actions) if actions else None,
+                args,
+                kwargs,
+                view.initkwargs,
+            )
+            if response is not None:
+                return response
+        return await sync_view(request, *args, **kwargs)
+
+    # keeps cls , initkwargs and csrf_exempt for the schema and middleware
+    return update_wrapper(async_view, view)
+
+
+def with_async_reads(urlpatterns):
+    """ serve the views with async read actions through async_read """
+    if not get_async_reads_config()['ENABLED']:
+        return urlpatterns
+    for pattern in urlpatterns:
+        if not isinstance(pattern, URLPattern):
+            continue
+        if has_async_read(pattern.callback):
+            pattern.callback = async_read(pattern.callback)
+    return urlpatterns
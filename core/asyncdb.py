@@ -0,0 +1,116 @@
+"""
+Async access to the database for the async read paths ,
+querysets are compiled by the orm and run on a psycopg 3 connection pool
+"""
+import asyncio
+import time
+
+from django.conf import settings
+from django.core.exceptions import EmptyResultSet
+from django.db import connections
+from django.db.models.query import ValuesIterable, ValuesListIterable
+
+from core import metrics
+
+DEFAULT_ASYNC_READS = {
+    'ENABLED': False,
+    'POOL_MIN_SIZE': 1,
+    'POOL_MAX_SIZE': 10,
+}
+
+# one pool per event loop , a pool can not be shared between loops
+_pools = {}
+
+
+def get_async_reads_config():
+    return {
+        **DEFAULT_ASYNC_READS,
+        **getattr(settings, 'ASYNC_READS', {}),
+    }
+
+
+def is_supported(using='default'):
+    """ querysets compiled for postgresql run unchanged on psycopg 3 """
+    return connections[using].vendor == 'postgresql'
+
+
+def get_conninfo(using='default'):
+    from psycopg.conninfo import make_conninfo
+
+    settings_dict = connections[using].settings_dict
+    params = {
+        'dbname': settings_dict['NAME'],
+        'user': settings_dict['USER'],
+        'password': settings_dict['PASSWORD'],
+        'host': settings_dict['HOST'],
+        'port': settings_dict['PORT'],
+    }
+    return make_conninfo(
+        # the orm reads datetimes in utc
+        options='-c timezone=UTC',
+        **{name: value for name, value in params.items() if value}
+    )
+
+
+async def get_pool(using='default'):
+    """ return the pool of the running loop , opened on first use """
+    from psycopg_pool import AsyncConnectionPool
+
+    key = (id(asyncio.get_running_loop()), using)
+    pool = _pools.get(key)
+    if pool is None:
+        config = get_async_reads_config()
+        pool = AsyncConnectionPool(
+            get_conninfo(using),
+            min_size=config['POOL_MIN_SIZE'],
+            max_size=config['POOL_MAX_SIZE'],
+            kwargs={'autocommit': True},
+            open=False,
+        )
+        _pools[key] = pool
+        await pool.open()
+    return pool
+
+
+async def close_pools():
+    """ close the pools of the running loop """
+    loop_id = id(asyncio.get_running_loop())
+    for key in [key for key in _pools if key[0] == loop_id]:
+        await _pools.pop(key).close()
+
+
+async def fetch(queryset):
+    """
+    run a .values() or .values_list() queryset and return its rows ,
+    dicts for .values() and tuples for .values_list()
+    """
+    if queryset._iterable_class not in (ValuesIterable, ValuesListIterable):
+        raise TypeError('only .values() and .values_list() are supported')
+    query = queryset.query
+    compiler = query.get_compiler(using=queryset.db)
+    try:
+        sql, params = compiler.as_sql()
+    except EmptyResultSet:
+        return []
+
+    pool = await get_pool(queryset.db)
+    request_metrics = metrics.current()
+    start = time.perf_counter()
+    async with pool.connection() as connection:
+        cursor = await connection.execute(sql, params)
+        rows = await cursor.fetchall()
+    if request_metrics is not None:
+        request_metrics.add_query(time.perf_counter() - start)
+
+    fields = [select[0] for select in compiler.select[:compiler.col_count]]
+    converters = compiler.get_converters(fields)
+    if converters:
+        rows = list(compiler.apply_converters(rows, converters))
+    if queryset._iterable_class is ValuesIterable:
+        names = [
+            *query.extra_select,
+            *query.values_select,
+            *query.annotation_select,
+        ]
+        return [dict(zip(names, row)) for row in rows]
+    return [tuple(row) for row in rows]
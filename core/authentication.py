@@ -0,0 +1,163 @@
+"""
+Token authentication with cached token lookups
+"""
+import copy
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework.authentication import (
+    BaseAuthentication,
+    TokenAuthentication,
+    get_authorization_header,
+)
+from rest_framework.exceptions import AuthenticationFailed
+
+from core import tokens
+from core.cache import LRUCache
+
+DEFAULTS = {
+    'MAX_SIZE': 10000,
+    'TTL': 60,
+    'SHARED_CACHE': None,
+    'SHARED_TTL': 300,
+    'KEY_PREFIX': 'auth-token:',
+}
+
+_local_cache = None
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'TOKEN_AUTH_CACHE', {})}
+
+
+def get_local_cache():
+    """ return the process wide token cache , created on first use """
+    global _local_cache
+    if _local_cache is None:
+        config = get_config()
+        _local_cache = LRUCache(max_size=config['MAX_SIZE'], ttl=config['TTL'])
+    return _local_cache
+
+
+def reset_local_cache():
+    global _local_cache
+    _local_cache = None
+
+
+def get_shared_cache():
+    """ return the shared cache tier or None when it is disabled """
+    alias = get_config()['SHARED_CACHE']
+    return caches[alias] if alias else None
+
+
+def get_token_key(request, keyword):
+    """ the token of an Authorization header , None for other schemes """
+    auth = get_authorization_header(request).split()
+    if len(auth) != 2 or auth[0].lower() != keyword.lower().encode():
+        return None
+    try:
+        return auth[1].decode()
+    except UnicodeError:
+        return None
+
+
+def invalidate_token(key):
+    """ drop a token from every cache tier """
+    get_local_cache().delete(key)
+    shared_cache = get_shared_cache()
+    if shared_cache is not None:
+        shared_cache.delete(get_config()['KEY_PREFIX'] + key)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    token authentication keeping resolved tokens in a bounded in process
+    lru cache , backed by an optional shared cache , other processes see
+    an invalidation once their local entry expires
+    """
+
+    def authenticate_credentials(self, key):
+        token = get_local_cache().get(key)
+        if token is None:
+            token = self.get_shared_token(key)
+        if token is None:
+            user, token = super().authenticate_credentials(key)
+            self.set_shared_token(key, token)
+        get_local_cache().set(key, token)
+        return self.resolve_token(key, token)
+
+    def authenticate_cached(self, request):
+        """
+        authenticate from the local cache only , None when resolving the
+        token needs the database , used by the async read paths
+        """
+        key = get_token_key(request, self.keyword)
+        if key is None:
+            return None
+        token = get_local_cache().get(key)
+        if token is None:
+            return None
+        return self.resolve_token(key, token)
+
+    def resolve_token(self, key, token):
+        # every request works on its own copy of the cached objects
+        user = copy.copy(token.user)
+        if not user.is_active:
+            invalidate_token(key)
+            raise AuthenticationFailed(_('User inactive or deleted.'))
+        token = copy.copy(token)
+        token.user = user
+        return user, token
+
+    def get_shared_token(self, key):
+        shared_cache = get_shared_cache()
+        if shared_cache is None:
+            return None
+        return shared_cache.get(get_config()['KEY_PREFIX'] + key)
+
+    def set_shared_token(self, key, token):
+        shared_cache = get_shared_cache()
+        if shared_cache is not None:
+            shared_cache.set(
+                get_config()['KEY_PREFIX'] + key,
+                token,
+                get_config()['SHARED_TTL']
+            )
+
+
+class SignedTokenAuthentication(BaseAuthentication):
+    """
+    verifies signed tokens , see core.tokens , without any lookup once the
+    revocations of the user are cached , the user carries only its id and
+    the other fields load when accessed , database tokens are left to the
+    next authentication class
+    """
+    keyword = 'Token'
+
+    def authenticate(self, request, lookup=True):
+        key = get_token_key(request, self.keyword)
+        if key is None or not tokens.is_signed_token(key):
+            return None
+        try:
+            token = tokens.verify_token(key, lookup=lookup)
+        except tokens.InvalidToken as exc:
+            raise AuthenticationFailed(_('Invalid token , %s.') % exc)
+        if token is None:
+            return None
+        user = get_user_model().from_db(
+            DEFAULT_DB_ALIAS, ['id', 'is_active'], [token.user_id, True]
+        )
+        return user, token
+
+    def authenticate_cached(self, request):
+        """
+        authenticate with the cached revocations only , None when checking
+        them needs the database , used by the async read paths
+        """
+        return self.authenticate(request, lookup=False)
+
+    def authenticate_header(self, request):
+        return self.keyword
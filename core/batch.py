@@ -0,0 +1,231 @@
+"""
+Batch requests , a list of sub-requests against the api run in process
+with the user of the batch request , authenticated once , consecutive reads
+run at the same time on a pool of threads , see core.views.BatchView
+"""
+import asyncio
+import io
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from urllib.parse import urlsplit
+
+import orjson
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import (
+    DEFAULT_DB_ALIAS,
+    close_old_connections,
+    connections,
+    transaction,
+)
+from django.urls import Resolver404, resolve
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH = {
+    'MAX_REQUESTS': 20,
+    # threads running consecutive reads , 1 runs every sub-request in
+    # order on the connection of the batch request
+    'CONCURRENCY': 4,
+    # the sub-requests must target paths under this prefix
+    'PATH_PREFIX': '/api/',
+}
+
+METHODS = ('GET', 'POST', 'PUT', 'PATCH', 'DELETE')
+# environ of the batch request every sub-request inherits
+INHERITED_META = (
+    'SERVER_NAME',
+    'SERVER_PORT',
+    'SCRIPT_NAME',
+    'REMOTE_ADDR',
+    'HTTP_HOST',
+    'HTTP_USER_AGENT',
+    'HTTP_ACCEPT_LANGUAGE',
+    'HTTP_X_FORWARDED_FOR',
+    'HTTP_X_FORWARDED_PROTO',
+)
+# headers a sub-request may not set , the batch request decides them
+RESERVED_HEADERS = (
+    'ACCEPT',
+    'ACCEPT_ENCODING',
+    'AUTHORIZATION',
+    'CONTENT_LENGTH',
+    'CONTENT_TYPE',
+    'COOKIE',
+    'HOST',
+)
+# headers of a sub-response returned with its body
+RESPONSE_HEADERS = (
+    'Content-Type',
+    'ETag',
+    'Last-Modified',
+    'Location',
+    'Retry-After',
+)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_batch_config():
+    return {**DEFAULT_BATCH, **getattr(settings, 'BATCH', {})}
+
+
+def get_executor():
+    """ the process wide pool running the reads , created on first use """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=get_batch_config()['CONCURRENCY'],
+                    thread_name_prefix='batch',
+                )
+    return _executor
+
+
+def reset_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+        _executor = None
+
+
+def build_request(parent, method, path, body=None, headers=None):
+    """ a json request to path made with the user of parent """
+    url = urlsplit(path)
+    data = b'' if body is None else orjson.dumps(body)
+    environ = {
+        key: parent.META[key] for key in INHERITED_META if key in parent.META
+    }
+    for name, value in (headers or {}).items():
+        key = name.upper().replace('-', '_')
+        if key not in RESERVED_HEADERS:
+            environ[f'HTTP_{key}'] = value
+    environ.update({
+        'REQUEST_METHOD': method,
+        'PATH_INFO': url.path,
+        'QUERY_STRING': url.query,
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(data)),
+        'HTTP_ACCEPT': 'application/json',
+        'wsgi.input': io.BytesIO(data),
+        'wsgi.url_scheme': parent.scheme,
+    })
+    request = WSGIRequest(environ)
+    # drf authenticates these requests as this user without a lookup ,
+    # see rest_framework.request.Request
+    request._force_auth_user = parent.user
+    request._force_auth_token = parent.auth
+    return request
+
+
+def response_body(response):
+    """ the data of a sub-response , embedded as it is in the batch """
+    if hasattr(response, 'data'):
+        return response.data
+    if response.streaming:
+        content = b''.join(response.streaming_content)
+    else:
+        content = response.content
+    if not content:
+        return None
+    content_type = response.get('Content-Type', '')
+    if content_type.startswith('application/json'):
+        return orjson.loads(content)
+    if content_type.startswith('application/x-ndjson'):
+        return [orjson.loads(line) for line in content.splitlines()]
+    return content.decode(response.charset or 'utf-8', errors='replace')
+
+
+def run_request(parent, method, path, body=None, headers=None):
+    """
+    run one sub-request , returns its status , headers and body , an error
+    the view does not handle answers 500 for this sub-request only ,
+    inside a transaction its writes roll back to a savepoint so the
+    sub-requests after it still run
+    """
+    in_transaction = connections[DEFAULT_DB_ALIAS].in_atomic_block
+    try:
+        with transaction.atomic() if in_transaction else nullcontext():
+            return respond(parent, method, path, body, headers)
+    except Exception:
+        logger.exception('batch sub-request %s %s failed', method, path)
+        return {
+            'status': 500,
+            'headers': {},
+            'body': {'detail': 'A server error occurred.'},
+        }
+
+
+def respond(parent, method, path, body=None, headers=None):
+    """ the response of a sub-request as run_request returns it """
+    request = build_request(parent, method, path, body, headers)
+    try:
+        match = resolve(request.path_info)
+    except Resolver404:
+        return {'status': 404, 'headers': {}, 'body': {'detail': 'Not found.'}}
+    view = match.func
+    if asyncio.iscoroutinefunction(view):
+        # the sync view behind core.async_views.async_read
+        view = view.__wrapped__
+    response = view(request, *match.args, **match.kwargs)
+    if hasattr(response, 'render'):
+        # sets the headers of the negotiated renderer
+        response.render()
+    return {
+        'status': response.status_code,
+        'headers': {
+            name: response[name]
+            for name in RESPONSE_HEADERS if response.has_header(name)
+        },
+        'body': response_body(response),
+    }
+
+
+def run_read(parent, sub_request):
+    """ run a read on a pool thread , its connection is kept for reuse """
+    try:
+        return run_request(parent, **sub_request)
+    finally:
+        # what the end of a request does , honours CONN_MAX_AGE
+        close_old_connections()
+
+
+def run_batch(parent, sub_requests):
+    """
+    run the sub-requests , writes one at a time in order and the reads
+    between two writes at the same time , returns the sub-responses in
+    the order of sub_requests
+    """
+    config = get_batch_config()
+    # reads on other connections would not see the uncommitted writes
+    concurrent = config['CONCURRENCY'] > 1 and \
+        not connections[DEFAULT_DB_ALIAS].in_atomic_block
+    responses = [None] * len(sub_requests)
+    reads = []
+
+    def run_reads():
+        if concurrent and len(reads) > 1:
+            futures = [
+                (i, get_executor().submit(run_read, parent, sub_requests[i]))
+                for i in reads
+            ]
+            for i, future in futures:
+                responses[i] = future.result()
+        else:
+            for i in reads:
+                responses[i] = run_request(parent, **sub_requests[i])
+        reads.clear()
+
+    for i, sub_request in enumerate(sub_requests):
+        if sub_request['method'] == 'GET':
+            reads.append(i)
+            continue
+        run_reads()
+        responses[i] = run_request(parent, **sub_request)
+    run_reads()
+    return responses
@@ -0,0 +1,143 @@
+"""
+Compression of the api responses with the best content coding the client
+accepts , gzip , brotli or zstd , see core.middleware.CompressionMiddleware ,
+cached list pages are stored compressed , see core.mixins
+"""
+import re
+import zlib
+
+import brotli
+import zstandard
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+DEFAULT_COMPRESSION = {
+    'ENABLED': True,
+    # preferred first when the client accepts several equally
+    'ENCODINGS': ['br', 'zstd', 'gzip'],
+    'LEVELS': {'br': 4, 'zstd': 3, 'gzip': 6},
+    # smaller bodies are sent as they are , the headers cost more
+    'MIN_SIZE': 1024,
+    'PATH_PREFIXES': ['/api/'],
+    # pages carrying csrf tokens leak them when compressed , see BREACH
+    'EXCLUDED_CONTENT_TYPES': ['text/html'],
+}
+
+_accept_encoding_re = re.compile(
+    r'\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?\s*(?:,|$)'
+)
+
+
+def get_compression_config():
+    return {**DEFAULT_COMPRESSION, **getattr(settings, 'COMPRESSION', {})}
+
+
+class BrotliCompressor:
+    """ brotli.Compressor with the interface of zlib.compressobj """
+    def __init__(self, level):
+        self.compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data):
+        return self.compressor.process(data)
+
+    def flush(self):
+        return self.compressor.finish()
+
+
+COMPRESSORS = {
+    'br': BrotliCompressor,
+    'zstd': lambda level: zstandard.ZstdCompressor(level=level).compressobj(),
+    # a gzip header and trailer around the deflate stream
+    'gzip': lambda level: zlib.compressobj(level, zlib.DEFLATED, 31),
+}
+
+
+def get_compressor(encoding, level=None):
+    if level is None:
+        level = get_compression_config()['LEVELS'][encoding]
+    return COMPRESSORS[encoding](level)
+
+
+def compress(encoding, data, level=None):
+    compressor = get_compressor(encoding, level)
+    return compressor.compress(data) + compressor.flush()
+
+
+def compress_stream(encoding, chunks, level=None):
+    """
+    compress an iterable of chunks , output is yielded as the compressor
+    fills its blocks rather than flushed after every chunk , so many
+    small rows compress as well as one body
+    """
+    compressor = get_compressor(encoding, level)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def negotiate(request):
+    """
+    the encoding of ENCODINGS the request accepts with the highest q value ,
+    None for the identity
+    """
+    config = get_compression_config()
+    header = request.META.get('HTTP_ACCEPT_ENCODING', '')
+    if not config['ENABLED'] or not header:
+        return None
+    accepted = {}
+    for name, q in _accept_encoding_re.findall(header.lower()):
+        try:
+            accepted[name] = float(q) if q else 1.0
+        except ValueError:
+            continue
+    wildcard = accepted.get('*', 0.0)
+    best, best_q = None, 0.0
+    for encoding in config['ENCODINGS']:
+        q = accepted.get(encoding, wildcard)
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def is_compressible(request, response):
+    config = get_compression_config()
+    if not config['ENABLED']:
+        return False
+    if not request.path.startswith(tuple(config['PATH_PREFIXES'])):
+        return False
+    content_type = response.get('Content-Type', '').split(';')[0].strip()
+    return content_type not in config['EXCLUDED_CONTENT_TYPES']
+
+
+def compress_response(request, response):
+    """
+    compress response in place with the negotiated encoding , returns the
+    encoding or None when the response is sent as it is
+    """
+    if not is_compressible(request, response):
+        return None
+    patch_vary_headers(response, ('Accept-Encoding',))
+    encoding = negotiate(request)
+    if encoding is None or response.has_header('Content-Encoding'):
+        return None
+    if response.streaming:
+        response.streaming_content = compress_stream(
+            encoding, response.streaming_content
+        )
+        del response['Content-Length']
+    else:
+        if len(response.content) < get_compression_config()['MIN_SIZE']:
+            return None
+        content = compress(encoding, response.content)
+        if len(content) >= len(response.content):
+            return None
+        response.content = content
+        response['Content-Length'] = str(len(content))
+    # the compressed bytes differ from the ones the etag was computed for
+    etag = response.get('ETag')
+    if etag and etag.startswith('"'):
+        response['ETag'] = 'W/' + etag
+    response['Content-Encoding'] = encoding
+    return encoding
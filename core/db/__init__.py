@@ -0,0 +1,29 @@
+"""
+Database backends and the connection pool , see core.db.pool
+"""
+import logging
+
+from django.db import OperationalError, connections
+
+logger = logging.getLogger(__name__)
+
+
+def warm_pools():
+    """
+    open the pool connections of every database up to MIN_SIZE , called
+    once per server worker as it loads the application , see app.wsgi ,
+    a database that is down is skipped and its pool fills on first use ,
+    returns the connections opened by alias
+    """
+    opened = {}
+    for connection in connections.all():
+        options = getattr(connection, 'pool_options', None)
+        if not options or not options['WARM_ON_START']:
+            continue
+        try:
+            opened[connection.alias] = connection.warm_pool()
+        except OperationalError as exc:
+            logger.warning(
+                'could not warm the pool of %s , %s', connection.alias, exc
+            )
+    return opened
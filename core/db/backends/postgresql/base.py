@@ -0,0 +1,142 @@
+"""
+PostgreSQL backend with health checked persistent connections and an
+optional in process connection pool ,
+
+    'CONN_MAX_AGE': 60,
+    'CONN_HEALTH_CHECKS': True,
+    'OPTIONS': {'pool': {'MIN_SIZE': 1, 'MAX_SIZE': 20}},
+
+CONN_HEALTH_CHECKS follows django 4.1 , a persistent connection is checked
+with SELECT 1 the first time a request uses it , OPTIONS['pool'] keeps
+closed connections open in a pool shared by the threads of the process ,
+see core.db.pool , use it with CONN_MAX_AGE 0 so connections go back to
+the pool at the end of every request
+"""
+import psycopg2
+from django.db.backends.postgresql import base, creation
+
+from core.db import pool as db_pool
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+
+    def _destroy_test_db(self, test_database_name, verbosity):
+        # pooled connections would keep the test database in use
+        db_pool.close_pool(self.connection.get_pool_key(test_database_name))
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.health_check_enabled = False
+        self.health_check_done = False
+
+    @property
+    def pool_options(self):
+        """ OPTIONS['pool'] over the defaults , None when pooling is off """
+        options = self.settings_dict['OPTIONS'].get('pool')
+        if not options:
+            return None
+        if options is True:
+            options = {}
+        return {**db_pool.DEFAULT_POOL, **options}
+
+    @property
+    def pool(self):
+        """ the pool of this database , None when pooling is off """
+        options = self.pool_options
+        if options is None:
+            return None
+        return db_pool.get_pool(self.get_pool_key(), options)
+
+    def get_pool_key(self, name=None):
+        settings_dict = self.settings_dict
+        return (
+            self.alias,
+            name or settings_dict['NAME'] or 'postgres',
+            settings_dict['HOST'],
+            settings_dict['PORT'],
+        )
+
+    def warm_pool(self):
+        """ open pool connections up to MIN_SIZE , returns how many """
+        conn_params = self.get_connection_params()
+        with self.wrap_database_errors:
+            return self.pool.warm(
+                lambda: super(DatabaseWrapper, self).get_new_connection(
+                    conn_params
+                )
+            )
+
+    def get_connection_params(self):
+        conn_params = super().get_connection_params()
+        conn_params.pop('pool', None)
+        return conn_params
+
+    def get_new_connection(self, conn_params):
+        pool = self.pool
+        if pool is None:
+            return super().get_new_connection(conn_params)
+        try:
+            connection = pool.get(
+                lambda: super(DatabaseWrapper, self).get_new_connection(
+                    conn_params
+                ),
+                check=self.is_usable_connection
+                if self.settings_dict.get('CONN_HEALTH_CHECKS') else None,
+            )
+        except db_pool.PoolTimeout as exc:
+            raise psycopg2.OperationalError(str(exc)) from exc
+        # a reused connection skipped the setup of get_new_connection
+        self.isolation_level = self.settings_dict['OPTIONS'].get(
+            'isolation_level', connection.isolation_level
+        )
+        return connection
+
+    def connect(self):
+        super().connect()
+        self.health_check_enabled = self.settings_dict.get(
+            'CONN_HEALTH_CHECKS', False
+        )
+        # a new connection needs no check
+        self.health_check_done = True
+
+    def _close(self):
+        pool = self.pool
+        if self.connection is None or pool is None:
+            return super()._close()
+        with self.wrap_database_errors:
+            pool.put(self.connection)
+
+    def _cursor(self, name=None):
+        self.close_if_health_check_failed()
+        return super()._cursor(name)
+
+    def close_if_health_check_failed(self):
+        """ check a reused persistent connection once per request """
+        if self.connection is None or not self.health_check_enabled or \
+                self.health_check_done or self.in_atomic_block:
+            return
+        if not self.is_usable():
+            self.close()
+        self.health_check_done = True
+
+    def close_if_unusable_or_obsolete(self):
+        # called when a request starts and ends
+        self.health_check_done = False
+        super().close_if_unusable_or_obsolete()
+
+    @staticmethod
+    def is_usable_connection(connection):
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            if not connection.autocommit:
+                # warmed connections are not in autocommit yet
+                connection.rollback()
+        except psycopg2.Error:
+            return False
+        return True
@@ -0,0 +1,207 @@
+"""
+In process pool of database connections shared by the threads of a process
+"""
+import threading
+import time
+
+DEFAULT_POOL = {
+    'MIN_SIZE': 1,
+    'MAX_SIZE': 20,
+    # idle connections above MIN_SIZE are closed after this many seconds
+    'IDLE_TIMEOUT': 300,
+    # seconds to wait for a free connection when MAX_SIZE are in use
+    'TIMEOUT': 10,
+    # open MIN_SIZE connections when a server worker starts , see
+    # core.db.warm_pools
+    'WARM_ON_START': True,
+}
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    """
+    bounded pool of dbapi connections , idle connections are reused most
+    recently returned first , expired ones are closed lazily on get and put
+    """
+    def __init__(self, min_size=1, max_size=20, idle_timeout=300, timeout=10):
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        # (connection, returned at) , the last entry is the newest
+        self._idle = []
+        self._size = 0
+        self._closed = False
+        self._condition = threading.Condition()
+        self._stats = {
+            'created': 0,
+            'reused': 0,
+            'discarded': 0,
+            'waits': 0,
+            'timeouts': 0,
+        }
+
+    def get(self, connect, check=None):
+        """
+        return an idle connection or one made with connect() , check is
+        called on reused connections and a falsy result discards them
+        """
+        deadline = time.monotonic() + self.timeout
+        while True:
+            with self._condition:
+                self._expire()
+                connection = self._take(deadline)
+                if connection is None:
+                    # a slot is reserved , connect outside the lock
+                    self._size += 1
+            if connection is None:
+                return self._connect(connect)
+            if check is None or check(connection):
+                with self._condition:
+                    self._stats['reused'] += 1
+                return connection
+            self._discard(connection)
+
+    def _take(self, deadline):
+        """ pop an idle connection , None when a new one may be opened """
+        while not self._idle:
+            if self._size < self.max_size:
+                return None
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self._stats['timeouts'] += 1
+                raise PoolTimeout(
+                    f'no connection free after {self.timeout} seconds , '
+                    f'all {self.max_size} are in use'
+                )
+            self._stats['waits'] += 1
+            self._condition.wait(remaining)
+        connection, _ = self._idle.pop()
+        return connection
+
+    def _connect(self, connect):
+        try:
+            connection = connect()
+        except BaseException:
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
+        with self._condition:
+            self._stats['created'] += 1
+        return connection
+
+    def put(self, connection):
+        """ return a connection , broken ones are closed """
+        if self._closed or not self._reset(connection):
+            self._discard(connection)
+            return
+        with self._condition:
+            self._idle.append((connection, time.monotonic()))
+            self._expire()
+            self._condition.notify()
+
+    def _reset(self, connection):
+        """ roll back anything left open , False when it is unusable """
+        if connection.closed:
+            return False
+        try:
+            if connection.get_transaction_status() != 0:
+                # anything but idle , a transaction or a broken connection
+                connection.rollback()
+            return connection.get_transaction_status() == 0
+        except Exception:
+            return False
+
+    def _discard(self, connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+        with self._condition:
+            self._size -= 1
+            self._stats['discarded'] += 1
+            self._condition.notify()
+
+    def _expire(self):
+        """ close the idle connections past the timeout , keep min_size """
+        expire_before = time.monotonic() - self.idle_timeout
+        while self._idle and self._size > self.min_size:
+            connection, returned_at = self._idle[0]
+            if returned_at > expire_before:
+                break
+            self._idle.pop(0)
+            self._size -= 1
+            self._stats['discarded'] += 1
+            try:
+                connection.close()
+            except Exception:
+                pass
+
+    def warm(self, connect):
+        """ open connections until min_size exist , returns how many """
+        opened = []
+        while True:
+            with self._condition:
+                if self._size >= self.min_size:
+                    break
+                self._size += 1
+            opened.append(self._connect(connect))
+        for connection in opened:
+            self.put(connection)
+        return len(opened)
+
+    def close(self):
+        """ close the idle connections , in use ones close when returned """
+        with self._condition:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._closed = True
+        for connection, _ in idle:
+            connection.close()
+
+    def stats(self):
+        with self._condition:
+            return {
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                **self._stats,
+            }
+
+
+def get_pool(key, options):
+    """ return the pool registered under key , created on first use """
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                options = {**DEFAULT_POOL, **options}
+                pool = _pools[key] = ConnectionPool(
+                    min_size=options['MIN_SIZE'],
+                    max_size=options['MAX_SIZE'],
+                    idle_timeout=options['IDLE_TIMEOUT'],
+                    timeout=options['TIMEOUT'],
+                )
+    return pool
+
+
+def close_pool(key):
+    with _pools_lock:
+        pool = _pools.pop(key, None)
+    if pool is not None:
+        pool.close()
+
+
+def pools():
+    """ the pools of this process by key """
+    return dict(_pools)
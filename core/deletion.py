@@ -0,0 +1,44 @@
+"""
+Set based deletes in chunks , the ids never leave the database so memory
+stays flat however many rows go
+"""
+from django.conf import settings
+from django.db import router, transaction
+from django.db.models import Subquery
+
+DEFAULT_FAST_DELETE = {
+    # rows deleted per statement and transaction
+    'CHUNK_SIZE': 2000,
+    # accounts with more recipes are deleted by a job , see core.jobs
+    'BACKGROUND_THRESHOLD': 20000,
+}
+
+
+def get_fast_delete_config():
+    return {**DEFAULT_FAST_DELETE, **getattr(settings, 'FAST_DELETE', {})}
+
+
+def delete_in_chunks(queryset, chunk_size=None, progress=None):
+    """
+    delete the rows of queryset with one DELETE ... WHERE pk IN (SELECT
+    pk ... LIMIT chunk_size) per chunk , each in its own transaction so
+    locks are held briefly , no signals are sent and nothing cascades ,
+    delete the referencing rows first , progress(deleted) is called after
+    every chunk , returns the rows deleted
+    """
+    chunk_size = chunk_size or get_fast_delete_config()['CHUNK_SIZE']
+    model = queryset.model
+    using = router.db_for_write(model)
+    chunk = model._base_manager.filter(pk__in=Subquery(
+        queryset.order_by().values('pk')[:chunk_size]
+    ))
+    deleted = 0
+    while True:
+        with transaction.atomic(using=using):
+            # the public delete collects every row in memory first
+            count = chunk._raw_delete(using)
+        deleted += count
+        if progress is not None:
+            progress(deleted)
+        if count < chunk_size:
+            return deleted
@@ -0,0 +1,137 @@
+"""
+Password hashers with configurable cost , hashing runs on a bounded pool
+of worker threads
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import hashers
+
+DEFAULT_PASSWORD_HASHING = {
+    # argon2id , memory in KiB
+    'ARGON2_TIME_COST': 2,
+    'ARGON2_MEMORY_COST': 19456,
+    'ARGON2_PARALLELISM': 1,
+    'BCRYPT_ROUNDS': 12,
+    'PBKDF2_ITERATIONS': 260000,
+    # threads hashing at the same time , 0 hashes on the calling thread
+    'WORKERS': 2,
+    # hashes waiting for a worker before new ones are refused
+    'QUEUE_SIZE': 64,
+    # seconds to wait for a place in the queue
+    'QUEUE_TIMEOUT': 2,
+}
+
+_executor = None
+_slots = None
+_executor_lock = threading.Lock()
+_workers = threading.local()
+
+
+def get_hashing_config():
+    return {
+        **DEFAULT_PASSWORD_HASHING,
+        **getattr(settings, 'PASSWORD_HASHING', {}),
+    }
+
+
+class HashingBusy(Exception):
+    """
+    raised by the hashers when the queue is full , the api views answer
+    503 , see core.mixins.HashingBusyMixin
+    """
+
+
+def get_executor():
+    """ return the process wide (executor, slots) , created on first use """
+    global _executor, _slots
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                config = get_hashing_config()
+                _slots = threading.BoundedSemaphore(
+                    config['WORKERS'] + config['QUEUE_SIZE']
+                )
+                _executor = ThreadPoolExecutor(
+                    max_workers=config['WORKERS'],
+                    thread_name_prefix='hasher',
+                    initializer=_mark_worker,
+                )
+    return _executor, _slots
+
+
+def _mark_worker():
+    _workers.is_worker = True
+
+
+def reset_executor():
+    global _executor, _slots
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+        _executor = _slots = None
+
+
+def run(func, *args):
+    """
+    run func on a hashing worker and wait for it , raises HashingBusy
+    when WORKERS are busy and QUEUE_SIZE hashes already wait , the pool
+    bounds how many hashes run at once , the calling thread still blocks
+    until its hash is done
+    """
+    config = get_hashing_config()
+    if not config['WORKERS'] or getattr(_workers, 'is_worker', False):
+        return func(*args)
+    executor, slots = get_executor()
+    if not slots.acquire(timeout=config['QUEUE_TIMEOUT']):
+        raise HashingBusy()
+    try:
+        future = executor.submit(func, *args)
+    except BaseException:
+        slots.release()
+        raise
+    future.add_done_callback(lambda _: slots.release())
+    return future.result()
+
+
+class OffloadedHasherMixin:
+    """ hash and verify on the worker pool , the C hashes release the gil """
+
+    def encode(self, password, salt, *args):
+        return run(super().encode, password, salt, *args)
+
+    def verify(self, password, encoded):
+        return run(super().verify, password, encoded)
+
+
+class Argon2PasswordHasher(OffloadedHasherMixin,
+                           hashers.Argon2PasswordHasher):
+
+    @property
+    def time_cost(self):
+        return get_hashing_config()['ARGON2_TIME_COST']
+
+    @property
+    def memory_cost(self):
+        return get_hashing_config()['ARGON2_MEMORY_COST']
+
+    @property
+    def parallelism(self):
+        return get_hashing_config()['ARGON2_PARALLELISM']
+
+
+class BCryptSHA256PasswordHasher(OffloadedHasherMixin,
+                                 hashers.BCryptSHA256PasswordHasher):
+
+    @property
+    def rounds(self):
+        return get_hashing_config()['BCRYPT_ROUNDS']
+
+
+class PBKDF2PasswordHasher(OffloadedHasherMixin,
+                           hashers.PBKDF2PasswordHasher):
+
+    @property
+    def iterations(self):
+        return get_hashing_config()['PBKDF2_ITERATIONS']
@@ -0,0 +1,139 @@
+"""
+A job queue in the database , workers claim due jobs with SELECT ... FOR
+UPDATE SKIP LOCKED so they never wait on each other , failed jobs are
+retried with a growing delay , no broker is needed
+"""
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import router, transaction
+from django.utils import timezone
+
+from core.models import Job
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_JOBS = {
+    # seconds a worker sleeps when no job is due
+    'POLL_INTERVAL': 1,
+    'MAX_ATTEMPTS': 3,
+    # seconds before the first retry , doubled on every further one
+    'RETRY_DELAY': 10,
+    # seconds a running job may go without progress before it is taken
+    # as lost with its worker and queued again
+    'LEASE': 600,
+}
+
+_handlers = {}
+
+
+class JobError(Exception):
+    """ raised by a handler for a failure retrying will not fix """
+    def __init__(self, message, result=None):
+        super().__init__(message)
+        self.result = result
+
+
+def get_jobs_config():
+    return {**DEFAULT_JOBS, **getattr(settings, 'JOBS', {})}
+
+
+def register(name):
+    """
+    register the decorated function as the handler of the jobs named name ,
+    it is called with the job and returns the json result
+    """
+    def decorator(func):
+        _handlers[name] = func
+        return func
+    return decorator
+
+
+def get_handler(name):
+    return _handlers.get(name)
+
+
+def enqueue(name, payload=None, user=None, max_attempts=None, run_at=None):
+    """ queue a job , returns it """
+    if name not in _handlers:
+        raise ValueError(f'no handler registered for job {name}')
+    return Job.objects.create(
+        name=name,
+        payload=payload or {},
+        user=user,
+        max_attempts=max_attempts or get_jobs_config()['MAX_ATTEMPTS'],
+        run_at=run_at or timezone.now(),
+    )
+
+
+def claim():
+    """
+    mark the next due job running and return it , None when no job is due ,
+    jobs locked by other workers are skipped rather than waited on
+    """
+    now = timezone.now()
+    with transaction.atomic(using=router.db_for_write(Job)):
+        job = Job.objects.select_for_update(skip_locked=True).filter(
+            status=Job.QUEUED,
+            run_at__lte=now,
+        ).order_by('run_at', 'id').first()
+        if job is None:
+            return None
+        job.status = Job.RUNNING
+        job.attempts += 1
+        job.heartbeat = now
+        job.save(update_fields=['status', 'attempts', 'heartbeat'])
+    return job
+
+
+def requeue_lost():
+    """ queue again the running jobs whose worker stopped reporting """
+    lease = timedelta(seconds=get_jobs_config()['LEASE'])
+    with transaction.atomic(using=router.db_for_write(Job)):
+        lost = list(Job.objects.select_for_update(skip_locked=True).filter(
+            status=Job.RUNNING,
+            heartbeat__lt=timezone.now() - lease,
+        ))
+        for job in lost:
+            finish(job, error='the worker running the job was lost')
+    return len(lost)
+
+
+def run(job):
+    """ run a claimed job and record how it ended , returns the job """
+    handler = get_handler(job.name)
+    if handler is None:
+        return finish(job, error=f'no handler for job {job.name}', retry=False)
+    try:
+        result = handler(job)
+    except JobError as exc:
+        return finish(job, error=str(exc), result=exc.result, retry=False)
+    except Exception:
+        logger.exception('job %s failed', job.pk)
+        return finish(job, error=traceback.format_exc())
+    return finish(job, result=result)
+
+
+def finish(job, result=None, error=None, retry=True):
+    """
+    record the end of an attempt , a failed one is queued again after
+    RETRY_DELAY * 2 ** (attempts - 1) until max_attempts is reached
+    """
+    now = timezone.now()
+    job.result = result
+    job.error = error or ''
+    if error is None:
+        job.status = Job.SUCCEEDED
+        job.finished = now
+    elif retry and job.attempts < job.max_attempts:
+        job.status = Job.QUEUED
+        job.run_at = now + timedelta(seconds=(
+            get_jobs_config()['RETRY_DELAY'] * 2 ** (job.attempts - 1)
+        ))
+    else:
+        job.status = Job.FAILED
+        job.finished = now
+    job.save(update_fields=['status', 'result', 'error', 'run_at', 'finished'])
+    return job
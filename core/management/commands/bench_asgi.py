@@ -0,0 +1,256 @@
+"""
+Django command comparing the sync and async read paths under asgi
+"""
+import asyncio
+import multiprocessing
+import time
+from contextlib import contextmanager
+from types import ModuleType
+
+from django.contrib.auth import get_user_model
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection as default_connection
+from django.test.utils import override_settings
+from django.urls import path
+
+from core import authentication
+from core.asyncdb import close_pools, is_supported
+from core.async_views import async_read
+from core.management.commands.benchmark import (
+    Command as BenchmarkCommand,
+    percentile,
+)
+from recipe.views import RecipeViewSet, TagViewSet
+from user.views import ManageUserView
+
+ENDPOINTS = {
+    'recipe-list': lambda: RecipeViewSet.as_view({'get': 'list'}),
+    'tag-list': lambda: TagViewSet.as_view({'get': 'list'}),
+    'me': lambda: ManageUserView.as_view(),
+}
+BENCH_PATH = '/bench/'
+
+
+class LatencyProxy:
+    """
+    tcp proxy in front of the database delaying every chunk by half the
+    round trip in each direction , like a database across a network ,
+    it runs in its own process so it does not compete for the gil
+    """
+    def __init__(self, host, port, latency):
+        self.host = host
+        self.port = port
+        self.delay = latency / 2
+
+    def start(self):
+        """ start the proxy process and return its address """
+        receiver, sender = multiprocessing.Pipe(duplex=False)
+        self.process = multiprocessing.Process(
+            target=self.run, args=(sender,), daemon=True
+        )
+        self.process.start()
+        return receiver.recv()
+
+    def stop(self):
+        self.process.terminate()
+        self.process.join()
+
+    def run(self, sender):
+        async def serve():
+            server = await asyncio.start_server(self.handle, '127.0.0.1', 0)
+            sender.send(server.sockets[0].getsockname())
+            await server.serve_forever()
+
+        asyncio.run(serve())
+
+    async def handle(self, client_reader, client_writer):
+        if self.host.startswith('/'):
+            server_reader, server_writer = await asyncio.open_unix_connection(
+                f'{self.host}/.s.PGSQL.{self.port}'
+            )
+        else:
+            server_reader, server_writer = await asyncio.open_connection(
+                self.host, self.port
+            )
+        await asyncio.gather(
+            self.pipe(client_reader, server_writer),
+            self.pipe(server_reader, client_writer),
+        )
+
+    async def pipe(self, reader, writer):
+        """ deliver every chunk delay seconds after it was read , in order """
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+
+        async def deliver():
+            while True:
+                at, data = await queue.get()
+                await asyncio.sleep(at - loop.time())
+                if not data:
+                    writer.close()
+                    return
+                writer.write(data)
+                await writer.drain()
+
+        delivery = asyncio.ensure_future(deliver())
+        while True:
+            data = await reader.read(65536)
+            queue.put_nowait((loop.time() + self.delay, data))
+            if not data:
+                break
+        await delivery
+
+
+@contextmanager
+def database_latency(latency):
+    """ route the database connections through a LatencyProxy """
+    if not latency:
+        yield
+        return
+    settings_dict = default_connection.settings_dict
+    host, port = settings_dict['HOST'], settings_dict['PORT']
+    proxy = LatencyProxy(host or 'localhost', port or 5432, latency)
+    settings_dict['HOST'], settings_dict['PORT'] = proxy.start()
+    default_connection.close()
+    try:
+        yield
+    finally:
+        proxy.stop()
+        settings_dict['HOST'], settings_dict['PORT'] = host, port
+        default_connection.close()
+
+
+class Command(BaseCommand):
+    help = (
+        'drive an endpoint through the asgi application at growing '
+        'connection counts with the sync and the async read path , the '
+        'data is committed for the pool connections and deleted afterwards'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--recipes', type=int, default=100,
+                            help='recipes per user')
+        parser.add_argument('--tags', type=int, default=10)
+        parser.add_argument('--requests', type=int, default=1000,
+                            help='requests per connection count and mode')
+        parser.add_argument('--connections', default='1,10,50,200',
+                            help='comma separated concurrent connections')
+        parser.add_argument('--endpoint', default='recipe-list',
+                            choices=sorted(ENDPOINTS))
+        parser.add_argument('--db-latency', type=float, default=0,
+                            help='database round trip in ms added by a '
+                                 'local proxy , like a database on a network')
+        parser.add_argument('--query', default='',
+                            help='query string , eg search=recipe')
+        parser.add_argument('--host', default='localhost',
+                            help='host header , must be in ALLOWED_HOSTS')
+
+    def handle(self, *args, **options):
+        if not is_supported():
+            raise CommandError('the async read path needs postgres')
+        counts = [int(count) for count in options['connections'].split(',')]
+        users = BenchmarkCommand().seed(
+            options['users'], options['recipes'], options['tags']
+        )
+        try:
+            self.stdout.write(
+                f'{"connections":>11}{"mode":>7}{"req/s":>10}'
+                f'{"p50 ms":>10}{"p99 ms":>10}'
+            )
+            with database_latency(options['db_latency'] / 1000):
+                for count in counts:
+                    for mode in ('sync', 'async'):
+                        result = self.run_mode(
+                            mode, options['endpoint'], users, count, options
+                        )
+                        self.stdout.write(
+                            f'{count:>11}{mode:>7}{result["rps"]:>10.1f}'
+                            f'{result["p50_ms"]:>10.2f}'
+                            f'{result["p99_ms"]:>10.2f}'
+                        )
+        finally:
+            get_user_model().objects.filter(
+                email__in=[email for email, _ in users]
+            ).delete()
+            authentication.reset_local_cache()
+
+    def run_mode(self, mode, endpoint, users, count, options):
+        view = ENDPOINTS[endpoint]()
+        if mode == 'async':
+            view = async_read(view)
+        urlconf = ModuleType('bench_asgi_urls')
+        urlconf.urlpatterns = [path(BENCH_PATH[1:], view)]
+        with override_settings(ROOT_URLCONF=urlconf):
+            return asyncio.run(self.drive(
+                get_asgi_application(), users, count, options
+            ))
+
+    async def drive(self, application, users, count, options):
+        request_count = options['requests']
+
+        async def request(key):
+            await self.request(
+                application, key, options['host'], options['query']
+            )
+
+        # every token is resolved once so both modes start warm
+        for _, key in users:
+            await request(key)
+
+        timings = []
+        pending = iter(range(request_count))
+
+        async def connection():
+            for i in pending:
+                start = time.perf_counter()
+                await request(users[i % len(users)][1])
+                timings.append(time.perf_counter() - start)
+
+        try:
+            started = time.perf_counter()
+            await asyncio.gather(*(connection() for _ in range(count)))
+            elapsed = time.perf_counter() - started
+        finally:
+            await close_pools()
+
+        timings.sort()
+        return {
+            'rps': request_count / elapsed,
+            'p50_ms': percentile(timings, 50) * 1000,
+            'p99_ms': percentile(timings, 99) * 1000,
+        }
+
+    @staticmethod
+    async def request(application, key, host, query):
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': BENCH_PATH,
+            'raw_path': BENCH_PATH.encode(),
+            'query_string': query.encode(),
+            'root_path': '',
+            'headers': [
+                (b'host', host.encode()),
+                (b'authorization', f'Token {key}'.encode()),
+            ],
+            'client': ('127.0.0.1', 0),
+            'server': (host, 80),
+        }
+        status = None
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+
+        await application(scope, receive, send)
+        if status != 200:
+            raise CommandError(f'the endpoint answered {status}')
@@ -0,0 +1,93 @@
+"""
+Django command comparing the cpu cost and the bytes saved by each
+compression level on recipe list pages
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core import compression
+from recipe.management.commands.bench_serializers import (
+    Command as BenchSerializers,
+)
+
+LEVELS = {
+    'gzip': [1, 6, 9],
+    'br': [1, 4, 6, 9, 11],
+    'zstd': [1, 3, 9, 19],
+}
+MEDIA_TYPES = {
+    'json': 'application/json',
+    'msgpack': 'application/msgpack',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'compress a rendered recipe list page with every encoding and level , '
+        'reports the compressed size , the ratio and the compression time , '
+        'the generated recipes are rolled back afterwards'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=1000,
+                            help='recipes on the page , at most 1000 '
+                                 'but for ndjson')
+        parser.add_argument('--tags', type=int, default=5)
+        parser.add_argument('--format', choices=MEDIA_TYPES, default='json')
+        parser.add_argument('--encodings', default=','.join(LEVELS))
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--host', default='localhost',
+                            help='host header , must be in ALLOWED_HOSTS')
+
+    def handle(self, *args, **options):
+        body = self.render_page(options)
+        self.stdout.write(
+            f'{options["format"]} page of {options["recipes"]} recipes : '
+            f'{len(body)} bytes'
+        )
+        for encoding in options['encodings'].split(','):
+            for level in LEVELS[encoding]:
+                seconds, size = self.best_of(
+                    options['repeat'],
+                    lambda: compression.compress(encoding, body, level)
+                )
+                self.stdout.write(
+                    f'{encoding:<5} {level:>2} : {size:>9} bytes '
+                    f'x{len(body) / size:>5.1f} '
+                    f'{seconds * 1000:>8.2f} ms '
+                    f'{len(body) / seconds / 2 ** 20:>7.1f} MB/s'
+                )
+
+    def render_page(self, options):
+        media_type = MEDIA_TYPES[options['format']]
+        with transaction.atomic(), \
+                override_settings(COMPRESSION={'ENABLED': False}):
+            user = BenchSerializers().seed(options['recipes'], options['tags'])
+            client = APIClient(HTTP_HOST=options['host'])
+            client.force_authenticate(user)
+            res = client.get(
+                reverse('recipe:recipe-list'),
+                {'page_size': options['recipes']},
+                HTTP_ACCEPT=media_type
+            )
+            if res.streaming:
+                body = b''.join(res.streaming_content)
+            else:
+                body = res.content
+            transaction.set_rollback(True)
+        return body
+
+    @staticmethod
+    def best_of(repeat, func):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            size = len(func())
+            timings.append(time.perf_counter() - start)
+        return min(timings), size
@@ -0,0 +1,111 @@
+"""
+Django command measuring logins per second per core for each password hasher
+"""
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import get_hasher
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from core import hashers
+
+PASSWORD = 'benchmark-password'
+HASHERS = {
+    'argon2': 'core.hashers.Argon2PasswordHasher',
+    'pbkdf2': 'core.hashers.PBKDF2PasswordHasher',
+    'bcrypt': 'core.hashers.BCryptSHA256PasswordHasher',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'time logins through the token endpoint with each password hasher '
+        'and the hashing throughput of the worker pool , the users are '
+        'rolled back afterwards'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--algorithms', default=','.join(HASHERS))
+        parser.add_argument('--logins', type=int, default=20,
+                            help='timed logins per hasher')
+        parser.add_argument('--threads', type=int, default=os.cpu_count(),
+                            help='threads verifying at once on the pool')
+        parser.add_argument('--host', default='localhost',
+                            help='host header , must be in ALLOWED_HOSTS')
+
+    def handle(self, *args, **options):
+        algorithms = options['algorithms'].split(',')
+        unknown = set(algorithms) - set(HASHERS)
+        if unknown:
+            raise CommandError(f'unknown algorithms {sorted(unknown)}')
+
+        cores = os.cpu_count() or 1
+        self.stdout.write(
+            f'{cores} cores , '
+            f'{hashers.get_hashing_config()["WORKERS"]} hashing workers , '
+            f'{options["threads"]} threads'
+        )
+        self.stdout.write(
+            f'{"hasher":<8}{"hash ms":>10}{"logins/s":>10}'
+            f'{"pool/s":>10}{"per core":>10}'
+        )
+        for algorithm in algorithms:
+            with override_settings(PASSWORD_HASHERS=[HASHERS[algorithm]]):
+                try:
+                    get_hasher().encode(PASSWORD, get_hasher().salt())
+                except ValueError as exc:
+                    # the library of the hasher is not installed
+                    self.stdout.write(f'{algorithm:<8}skipped , {exc}')
+                    continue
+                result = self.run(algorithm, options)
+            self.stdout.write(
+                f'{algorithm:<8}{result["hash_ms"]:>10.1f}'
+                f'{result["logins"]:>10.1f}{result["pool"]:>10.1f}'
+                f'{result["pool"] / min(cores, options["threads"]):>10.1f}'
+            )
+
+    def run(self, algorithm, options):
+        """ return the hash ms , the logins/s and the pool verifications/s """
+        client = Client(HTTP_HOST=options['host'])
+        count = options['logins']
+        with transaction.atomic():
+            user = get_user_model().objects.create_user(
+                email=f'bench-{uuid.uuid4().hex}@example.com',
+                password=PASSWORD
+            )
+            payload = {'email': user.email, 'password': PASSWORD}
+
+            started = time.perf_counter()
+            for _ in range(count):
+                response = client.post(reverse('user:token'), payload)
+                if response.status_code != 200:
+                    raise CommandError(
+                        f'{algorithm} login answered {response.status_code}'
+                    )
+            logins = count / (time.perf_counter() - started)
+
+            hasher = get_hasher()
+            started = time.perf_counter()
+            for _ in range(count):
+                hasher.verify(PASSWORD, user.password)
+            hash_ms = (time.perf_counter() - started) / count * 1000
+
+            threads = options['threads']
+            with ThreadPoolExecutor(max_workers=threads) as executor:
+                started = time.perf_counter()
+                results = list(executor.map(
+                    lambda _: hasher.verify(PASSWORD, user.password),
+                    range(count * threads)
+                ))
+                pool = len(results) / (time.perf_counter() - started)
+            transaction.set_rollback(True)
+
+        if not all(results):
+            raise CommandError(f'{algorithm} failed to verify')
+        return {'hash_ms': hash_ms, 'logins': logins, 'pool': pool}
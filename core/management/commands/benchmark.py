@@ -0,0 +1,211 @@
+"""
+Django command benchmarking the api endpoints in process
+"""
+import json
+import math
+import time
+import uuid
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from recipe.models import Recipe, Tag
+
+PASSWORD = 'benchmark-password'
+ENDPOINTS = ['recipe-list', 'tag-list', 'token', 'me']
+
+
+def percentile(timings, percent):
+    """ nearest rank percentile of a sorted list """
+    index = max(0, math.ceil(len(timings) * percent / 100) - 1)
+    return timings[index]
+
+
+def compare(results, baseline, tolerance):
+    """ return the regressions of results against a saved baseline """
+    regressions = []
+    for name, base in baseline.items():
+        current = results.get(name)
+        if current is None:
+            continue
+        for key in ('p50_ms', 'p99_ms'):
+            if current[key] > base[key] * (1 + tolerance):
+                regressions.append(
+                    f'{name} {key} {current[key]:.2f} > {base[key]:.2f}'
+                )
+        if current['queries'] > base['queries']:
+            regressions.append(
+                f'{name} queries {current["queries"]} > {base["queries"]}'
+            )
+    return regressions
+
+
+class Command(BaseCommand):
+    help = (
+        'seed synthetic users , tags and recipes and time the api '
+        'endpoints through the real url routes , everything is rolled '
+        'back afterwards'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--recipes', type=int, default=100,
+                            help='recipes per user')
+        parser.add_argument('--tags', type=int, default=10,
+                            help='tags per user , every recipe gets 3')
+        parser.add_argument('--requests', type=int, default=200,
+                            help='timed requests per endpoint')
+        parser.add_argument('--warmup', type=int, default=10)
+        parser.add_argument('--endpoints', default=','.join(ENDPOINTS))
+        parser.add_argument('--host', default='localhost',
+                            help='host header , must be in ALLOWED_HOSTS')
+        parser.add_argument('--save', help='write the results to a file')
+        parser.add_argument('--baseline', help='compare with a saved file')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='allowed latency growth over the baseline')
+
+    def handle(self, *args, **options):
+        endpoints = options['endpoints'].split(',')
+        unknown = set(endpoints) - set(ENDPOINTS)
+        if unknown:
+            raise CommandError(f'unknown endpoints {sorted(unknown)}')
+
+        with transaction.atomic():
+            users = self.seed(
+                options['users'],
+                options['recipes'],
+                options['tags']
+            )
+            results = {
+                name: self.run(
+                    Client(HTTP_HOST=options['host']),
+                    name,
+                    users,
+                    options['requests'],
+                    options['warmup']
+                )
+                for name in endpoints
+            }
+            transaction.set_rollback(True)
+
+        self.report(results)
+        if options['save']:
+            with open(options['save'], 'w') as results_file:
+                json.dump(results, results_file, indent=2)
+        if options['baseline']:
+            with open(options['baseline']) as baseline_file:
+                baseline = json.load(baseline_file)
+            regressions = compare(results, baseline, options['tolerance'])
+            if regressions:
+                raise CommandError(
+                    'regressions against the baseline\n' +
+                    '\n'.join(regressions)
+                )
+            self.stdout.write(self.style.SUCCESS('no regressions'))
+
+    def seed(self, user_count, recipe_count, tag_count):
+        """ bulk insert the data set , returns (email, token) per user """
+        password = make_password(PASSWORD)
+        run = uuid.uuid4().hex[:8]
+        User = get_user_model()
+        User.objects.bulk_create([
+            User(email=f'bench-{run}-{i}@example.com', password=password)
+            for i in range(user_count)
+        ])
+        users = list(User.objects.filter(email__startswith=f'bench-{run}-'))
+        Token.objects.bulk_create([
+            Token(key=Token.generate_key(), user=user) for user in users
+        ])
+        Tag.objects.bulk_create([
+            Tag(user=user, name=f'Tag {i}')
+            for user in users for i in range(tag_count)
+        ])
+        Recipe.objects.bulk_create([
+            Recipe(
+                user=user,
+                title=f'Recipe {i}',
+                description='description ' * 10,
+                time_minutes=i % 120,
+                price=Decimal(i % 10000) / 100,
+            )
+            for user in users for i in range(recipe_count)
+        ])
+
+        recipes = Recipe.objects.filter(
+            user__in=users
+        ).values_list('id', 'user_id')
+        tags = {}
+        for tag_id, user_id in Tag.objects.filter(
+            user__in=users
+        ).values_list('id', 'user_id'):
+            tags.setdefault(user_id, []).append(tag_id)
+        through = Recipe.tags.through
+        through.objects.bulk_create([
+            through(recipe_id=recipe_id, tag_id=tag_id)
+            for recipe_id, user_id in recipes
+            for tag_id in tags.get(user_id, [])[recipe_id % 7:][:3]
+        ])
+        return list(Token.objects.filter(
+            user__in=users
+        ).values_list('user__email', 'key'))
+
+    def request(self, client, name, email, token):
+        if name == 'token':
+            return client.post(
+                reverse('user:token'),
+                {'email': email, 'password': PASSWORD}
+            )
+        url = {
+            'recipe-list': reverse('recipe:recipe-list'),
+            'tag-list': reverse('recipe:tag-list'),
+            'me': reverse('user:me'),
+        }[name]
+        return client.get(url, HTTP_AUTHORIZATION=f'Token {token}')
+
+    def run(self, client, name, users, request_count, warmup):
+        """ time request_count requests rotating over the users """
+        for i in range(warmup):
+            self.request(client, name, *users[i % len(users)])
+
+        timings = []
+        queries = 0
+        started = time.perf_counter()
+        for i in range(request_count):
+            with CaptureQueriesContext(connection) as ctx:
+                start = time.perf_counter()
+                response = self.request(client, name, *users[i % len(users)])
+                timings.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                raise CommandError(
+                    f'{name} answered {response.status_code}'
+                )
+            queries = max(queries, len(ctx.captured_queries))
+        elapsed = time.perf_counter() - started
+
+        timings.sort()
+        return {
+            'requests': request_count,
+            'p50_ms': percentile(timings, 50) * 1000,
+            'p99_ms': percentile(timings, 99) * 1000,
+            'rps': request_count / elapsed,
+            'queries': queries,
+        }
+
+    def report(self, results):
+        self.stdout.write(
+            f'{"endpoint":<14}{"p50 ms":>10}{"p99 ms":>10}'
+            f'{"req/s":>10}{"queries":>9}'
+        )
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name:<14}{result["p50_ms"]:>10.2f}'
+                f'{result["p99_ms"]:>10.2f}{result["rps"]:>10.1f}'
+                f'{result["queries"]:>9}'
+            )
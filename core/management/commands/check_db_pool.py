@@ -0,0 +1,69 @@
+"""
+Django command to check the database accepts the pool connections ,
+the pool lives in each server process , the workers warm their own when
+they start , see core.db.warm_pools
+"""
+import time
+from psycopg2 import OperationalError as Psycopg2Error
+from django.db import connections
+from django.db.utils import OperationalError
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        'wait for the database , check MIN_SIZE pool connections can be '
+        'opened and report the pool settings and the server connection '
+        'limits , the connections close when the command exits'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        alias = options['database']
+        self.stdout.write('waiting for database...')
+        is_db_up = False
+        while is_db_up is False:
+            try:
+                self.check(databases=[alias])
+                is_db_up = True
+            except (Psycopg2Error, OperationalError):
+                self.stdout.write("database is unavailable , waiting 1 second")
+                time.sleep(1)
+        self.stdout.write(self.style.SUCCESS('database available !'))
+
+        connection = connections[alias]
+        pool = getattr(connection, 'pool', None)
+        if pool is None:
+            self.stdout.write(
+                f'no pool , persistent connections with CONN_MAX_AGE='
+                f'{connection.settings_dict["CONN_MAX_AGE"]} and '
+                f'CONN_HEALTH_CHECKS='
+                f'{connection.settings_dict.get("CONN_HEALTH_CHECKS", False)}'
+            )
+        else:
+            opened = connection.warm_pool()
+            self.stdout.write(f'opened {opened} pool connections')
+            self.stdout.write(
+                'warmed on worker start'
+                if connection.pool_options['WARM_ON_START']
+                else 'not warmed on worker start , WARM_ON_START is off'
+            )
+            for name, value in pool.stats().items():
+                self.stdout.write(f'  {name:<10} {value}')
+
+        if connection.vendor != 'postgresql':
+            return
+        with connection.cursor() as cursor:
+            cursor.execute('SHOW max_connections')
+            max_connections = cursor.fetchone()[0]
+            cursor.execute(
+                'SELECT count(*) FROM pg_stat_activity '
+                'WHERE datname = current_database()'
+            )
+            in_use = cursor.fetchone()[0]
+        self.stdout.write(
+            f'server max_connections {max_connections} , '
+            f'{in_use} open to this database'
+        )
@@ -0,0 +1,76 @@
+"""
+Django command working through the job queue , see core.jobs
+"""
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core import jobs
+
+
+class Command(BaseCommand):
+    help = (
+        'run queued jobs on up to --concurrency threads , polling the '
+        'database for due jobs , start more workers to run more at once'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=1,
+                            help='jobs this worker runs at the same time')
+        parser.add_argument('--once', action='store_true',
+                            help='exit once no job is due')
+        parser.add_argument('--max-jobs', type=int, default=0,
+                            help='exit after this many jobs , 0 never')
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.stopping = threading.Event()
+        self.done = 0
+        self.done_lock = threading.Lock()
+        concurrency = options['concurrency']
+        self.stdout.write(f'running jobs on {concurrency} threads...')
+        if concurrency == 1:
+            self.work()
+        else:
+            threads = [
+                threading.Thread(target=self.work, name=f'jobs-{i}')
+                for i in range(concurrency)
+            ]
+            for thread in threads:
+                thread.start()
+            try:
+                for thread in threads:
+                    thread.join()
+            except KeyboardInterrupt:
+                self.stopping.set()
+                self.stdout.write('finishing the running jobs...')
+                for thread in threads:
+                    thread.join()
+        self.stdout.write(self.style.SUCCESS(f'{self.done} jobs run !'))
+
+    def work(self):
+        """ claim and run jobs until stopped , on one thread """
+        poll_interval = jobs.get_jobs_config()['POLL_INTERVAL']
+        try:
+            while not self.stopping.is_set():
+                job = jobs.claim()
+                if job is None:
+                    if jobs.requeue_lost():
+                        continue
+                    if self.options['once']:
+                        return
+                    self.stopping.wait(poll_interval)
+                    continue
+                job = jobs.run(job)
+                self.stdout.write(
+                    f'job {job.pk} {job.name} {job.status} '
+                    f'after {job.attempts} attempts'
+                )
+                with self.done_lock:
+                    self.done += 1
+                    if self.done == self.options['max_jobs']:
+                        self.stopping.set()
+        finally:
+            if threading.current_thread() is not threading.main_thread():
+                connections.close_all()
@@ -0,0 +1,177 @@
+"""
+Per request metrics aggregated into constant memory histograms
+"""
+import contextvars
+import threading
+import time
+
+from contextlib import contextmanager
+
+# upper bounds of the histogram buckets , the last one is open
+LATENCY_BUCKETS_MS = (
+    1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000,
+)
+SIZE_BUCKETS_BYTES = (
+    256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216,
+)
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+
+class Histogram:
+    """ fixed bucket histogram , memory does not grow with the samples """
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        index = len(self.bounds)
+        for i, bound in enumerate(self.bounds):
+            if value <= bound:
+                index = i
+                break
+        self.counts[index] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def percentile(self, percent):
+        """ upper bound of the bucket holding the percentile """
+        if not self.count:
+            return 0
+        rank = self.count * percent / 100
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return self.bounds[i] if i < len(self.bounds) else self.max
+        return self.max
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else 0,
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99),
+            'max': self.max,
+            'buckets': dict(zip(
+                [*map(str, self.bounds), 'inf'],
+                self.counts
+            )),
+        }
+
+
+class RequestMetrics:
+    """ the measurements of a single request """
+    def __init__(self):
+        self.timings = {}
+        self.queries = 0
+        self._active = set()
+
+    def add(self, name, seconds):
+        self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+    def add_query(self, seconds):
+        self.queries += 1
+        self.add('db', seconds)
+
+
+def query_wrapper(execute, sql, params, many, context):
+    """
+    execute wrapper installed on every database connection , it counts and
+    times the queries of the current request
+    """
+    request_metrics = _current.get()
+    if request_metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        request_metrics.add_query(time.perf_counter() - start)
+
+
+def current():
+    """ the metrics of the request being handled , None outside one """
+    return _current.get()
+
+
+def activate(metrics):
+    return _current.set(metrics)
+
+
+def deactivate(token):
+    _current.reset(token)
+
+
+@contextmanager
+def timer(name):
+    """ add the time spent in the block to the current request """
+    metrics = _current.get()
+    if metrics is None or name in metrics._active:
+        # outside a request or nested in the same timer
+        yield
+        return
+    metrics._active.add(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics._active.discard(name)
+        metrics.add(name, time.perf_counter() - start)
+
+
+class Registry:
+    """ histograms per view , bounded by the number of routes """
+    def __init__(self):
+        self._views = {}
+        self._lock = threading.Lock()
+
+    def _view(self, name):
+        view = self._views.get(name)
+        if view is None:
+            view = self._views.setdefault(name, {
+                'wall_ms': Histogram(LATENCY_BUCKETS_MS),
+                'db_ms': Histogram(LATENCY_BUCKETS_MS),
+                'serializer_ms': Histogram(LATENCY_BUCKETS_MS),
+                'queries': Histogram((0, 1, 2, 5, 10, 20, 50, 100)),
+                'response_bytes': Histogram(SIZE_BUCKETS_BYTES),
+            })
+        return view
+
+    def record(self, name, wall, metrics, size=None):
+        with self._lock:
+            view = self._view(name)
+            view['wall_ms'].observe(wall * 1000)
+            view['db_ms'].observe(metrics.timings.get('db', 0.0) * 1000)
+            view['serializer_ms'].observe(
+                metrics.timings.get('serializer', 0.0) * 1000
+            )
+            view['queries'].observe(metrics.queries)
+            if size is not None:
+                view['response_bytes'].observe(size)
+
+    def record_size(self, name, size):
+        with self._lock:
+            self._view(name)['response_bytes'].observe(size)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                name: {
+                    key: histogram.as_dict()
+                    for key, histogram in view.items()
+                }
+                for name, view in sorted(self._views.items())
+            }
+
+    def clear(self):
+        with self._lock:
+            self._views.clear()
+
+
+registry = Registry()
@@ -0,0 +1,161 @@
+"""
+Middleware measuring every request , see core.metrics , and compressing
+the api responses , see core.compression
+"""
+import asyncio
+import cProfile
+import os
+import random
+import time
+
+from django.conf import settings
+from django.utils.deprecation import MiddlewareMixin
+
+from core import compression, metrics
+
+DEFAULT_REQUEST_METRICS = {
+    'ENABLED': True,
+    'SERVER_TIMING': True,
+    # fraction of the requests run under cProfile
+    'PROFILE_SAMPLE_RATE': 0.0,
+    'PROFILE_DIR': '/tmp/profiles',
+}
+
+
+def get_metrics_config():
+    return {
+        **DEFAULT_REQUEST_METRICS,
+        **getattr(settings, 'REQUEST_METRICS', {}),
+    }
+
+
+def get_view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    return match.view_name
+
+
+def server_timing(wall, request_metrics):
+    timings = request_metrics.timings
+    entries = [
+        f'total;dur={wall * 1000:.2f}',
+        f'db;dur={timings.get("db", 0.0) * 1000:.2f};'
+        f'desc="{request_metrics.queries} queries"',
+    ]
+    if 'serializer' in timings:
+        entries.append(f'serializer;dur={timings["serializer"] * 1000:.2f}')
+    return ', '.join(entries)
+
+
+def dump_profile(profiler, directory, view_name):
+    """ write the stats of a sampled request , read them with pstats """
+    os.makedirs(directory, exist_ok=True)
+    name = view_name.replace(':', '-').replace('.', '-')
+    path = os.path.join(
+        directory, f'{name}-{time.time_ns()}-{os.getpid()}.prof'
+    )
+    profiler.dump_stats(path)
+    return path
+
+
+def count_streamed(content, view_name):
+    """ record the size of a streamed response once it is sent """
+    size = 0
+    for chunk in content:
+        size += len(chunk)
+        yield chunk
+    metrics.registry.record_size(view_name, size)
+
+
+class RequestMetricsMiddleware:
+    """
+    records wall time , query count and time , serializer time and
+    response size per view into core.metrics.registry , adds them as a
+    Server-Timing header and profiles a sample of the requests
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(self.get_response):
+            # lets the handler call the middleware without a thread
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        config = get_metrics_config()
+        if not config['ENABLED']:
+            return self.get_response(request)
+        request_metrics, token, profiler = self.start(config)
+        try:
+            start = time.perf_counter()
+            response = self.get_response(request)
+            wall = time.perf_counter() - start
+        finally:
+            self.stop(token, profiler)
+        return self.finish(
+            config, request, response, wall, request_metrics, profiler
+        )
+
+    async def __acall__(self, request):
+        config = get_metrics_config()
+        if not config['ENABLED']:
+            return await self.get_response(request)
+        request_metrics, token, profiler = self.start(config)
+        try:
+            start = time.perf_counter()
+            response = await self.get_response(request)
+            wall = time.perf_counter() - start
+        finally:
+            self.stop(token, profiler)
+        return self.finish(
+            config, request, response, wall, request_metrics, profiler
+        )
+
+    def start(self, config):
+        request_metrics = metrics.RequestMetrics()
+        token = metrics.activate(request_metrics)
+        profiler = None
+        if random.random() < config['PROFILE_SAMPLE_RATE']:
+            # under asgi the profile covers everything the loop runs
+            profiler = cProfile.Profile()
+            profiler.enable()
+        return request_metrics, token, profiler
+
+    def stop(self, token, profiler):
+        if profiler is not None:
+            profiler.disable()
+        metrics.deactivate(token)
+
+    def finish(self, config, request, response, wall, request_metrics,
+               profiler):
+        view_name = get_view_name(request)
+        if response.streaming:
+            size = None
+            response.streaming_content = count_streamed(
+                response.streaming_content, view_name
+            )
+        else:
+            size = len(response.content)
+        metrics.registry.record(view_name, wall, request_metrics, size)
+
+        if config['SERVER_TIMING']:
+            response['Server-Timing'] = server_timing(wall, request_metrics)
+        if profiler is not None:
+            dump_profile(profiler, config['PROFILE_DIR'], view_name)
+        return response
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    compresses api responses with the best encoding the client accepts ,
+    streamed responses are compressed as they stream , responses already
+    encoded , like cached pages stored compressed , go through untouched
+    """
+
+    def process_response(self, request, response):
+        compression.compress_response(request, response)
+        return response
@@ -0,0 +1,392 @@
+"""
+Mixins shared by the api views
+"""
+import hashlib
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
+from django.utils.http import http_date
+from django.utils.translation import gettext_lazy as _
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from core import compression, hashers, routers
+from core.asyncdb import fetch
+from core.serializers import ValuesSerializer
+
+DEFAULT_RESPONSE_CACHE = {
+    'ENABLED': False,
+    'CACHE': 'default',
+    'TTL': 300,
+}
+
+
+def get_response_cache_config():
+    return {
+        **DEFAULT_RESPONSE_CACHE,
+        **getattr(settings, 'RESPONSE_CACHE', {}),
+    }
+
+
+class HashingUnavailable(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = _('Too many logins at once , try again shortly.')
+    default_code = 'hashing_busy'
+
+
+class HashingBusyMixin:
+    """ views hashing passwords answer 503 when the hashers are busy """
+
+    def handle_exception(self, exc):
+        if isinstance(exc, hashers.HashingBusy):
+            exc = HashingUnavailable()
+        return super().handle_exception(exc)
+
+
+class ConditionalGetMixin:
+    """
+    answers list requests with ETag and Last-Modified taken from a data
+    version , so unchanged data returns 304 before anything is queried or
+    serialized , rendered list pages can also be cached server side under
+    the same version , wrap other read actions with conditional_response
+    """
+    cached_actions = ('list',)
+
+    def get_data_version(self):
+        """ return (version, last_modified) of the data behind the view """
+        raise ImproperlyConfigured(
+            f'{type(self).__name__} must implement get_data_version'
+        )
+
+    async def async_get_data_version(self):
+        """ the async counterpart , None sends the request to the sync path """
+        return None
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().list, request, *args, **kwargs
+        )
+
+    async def async_list(self, request, *args, **kwargs):
+        return await self.async_conditional_response(
+            super().async_list, request, *args, **kwargs
+        )
+
+    def conditional_response(self, handler, request, *args, **kwargs):
+        key, etag, last_modified = self.get_validators(
+            request, *self.get_data_version()
+        )
+        response = get_conditional_response(
+            request,
+            etag=etag,
+            last_modified=last_modified
+        )
+        if response is None and self.action in self.cached_actions:
+            response = self.get_cached_page(key)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code == 200:
+                self.page_cache_key = key
+        return self.set_validators(response, etag, last_modified)
+
+    async def async_conditional_response(self, handler, request, *args,
+                                         **kwargs):
+        data_version = await self.async_get_data_version()
+        if data_version is None:
+            return None
+        key, etag, last_modified = self.get_validators(
+            request, *data_version
+        )
+        response = get_conditional_response(
+            request,
+            etag=etag,
+            last_modified=last_modified
+        )
+        if response is None and self.action in self.cached_actions:
+            response = await sync_to_async(self.get_cached_page)(key)
+        if response is None:
+            response = await handler(request, *args, **kwargs)
+            if response is None:
+                return None
+            if response.status_code == 200:
+                self.async_page_cache_key = key
+        return self.set_validators(response, etag, last_modified)
+
+    def get_validators(self, request, version, last_modified):
+        """ return the page cache key , the ETag and the Last-Modified """
+        key = hashlib.sha1(':'.join([
+            str(request.user.pk),
+            str(version),
+            request.accepted_media_type or '',
+            request.get_full_path(),
+        ]).encode()).hexdigest()
+        if last_modified is not None:
+            last_modified = int(last_modified.timestamp())
+        return key, f'"{key}"', last_modified
+
+    def set_validators(self, response, etag, last_modified):
+        if response.status_code in (200, 304):
+            if response.has_header('Content-Encoding'):
+                # a cached page stored compressed , see core.compression
+                etag = 'W/' + etag
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        # responses differ per user so shared caches must not reuse them
+        patch_vary_headers(response, ['Accept', 'Authorization'])
+        if 'ETag' in response:
+            patch_cache_control(response, private=True, no_cache=True)
+        key = getattr(self, 'page_cache_key', None)
+        if key is not None and self.action in self.cached_actions:
+            self.set_cached_page(key, response)
+        return response
+
+    async def async_finalize_response(self, request, response, *args,
+                                      **kwargs):
+        response = await super().async_finalize_response(
+            request, response, *args, **kwargs
+        )
+        key = getattr(self, 'async_page_cache_key', None)
+        if key is not None and self.action in self.cached_actions:
+            await sync_to_async(self.set_cached_page)(key, response)
+        return response
+
+    def get_cached_page(self, key):
+        config = get_response_cache_config()
+        if not config['ENABLED']:
+            return None
+        cached = caches[config['CACHE']].get(self.get_page_key(key))
+        if cached is None:
+            return None
+        content, content_type, content_encoding = cached
+        response = HttpResponse(content, content_type=content_type)
+        if content_encoding is not None:
+            response['Content-Encoding'] = content_encoding
+        compression.compress_response(self.request, response)
+        return response
+
+    def set_cached_page(self, key, response):
+        """
+        the page is stored compressed with the encoding the request
+        negotiated , so repeat hits are sent without compressing again
+        """
+        config = get_response_cache_config()
+        if not config['ENABLED'] or getattr(response, 'streaming', False):
+            return
+        response.render()
+        compression.compress_response(self.request, response)
+        caches[config['CACHE']].set(
+            self.get_page_key(key),
+            (
+                response.content,
+                response['Content-Type'],
+                response.get('Content-Encoding'),
+            ),
+            config['TTL']
+        )
+
+    def get_page_key(self, key):
+        encoding = compression.negotiate(self.request) or 'identity'
+        return f'page:{key}:{encoding}'
+
+
+class AsyncReadMixin:
+    """
+    async counterparts of the read actions , named async_<action> , served
+    under asgi when ASYNC_READS is enabled , see core.async_views ,
+    they run without a thread as long as the token is in the local cache
+    and the queryset renders through a ValuesSerializer , for anything
+    else they return None and the request goes to the sync action
+    """
+    # renderers producing their output without a query
+    async_renderer_classes = (JSONRenderer,)
+
+    @classmethod
+    async def async_dispatch(cls, request, actions, args, kwargs,
+                             initkwargs):
+        """
+        the async counterpart of as_view()(request) for GET , actions is
+        the method to action map of a viewset and None for other views
+        """
+        action = actions['get'] if actions else 'get'
+        self = cls(**initkwargs)
+        handler = getattr(self, f'async_{action}', None)
+        if handler is None or self.get_throttles():
+            return None
+        if actions:
+            self.action_map = actions
+        self.args = args
+        self.kwargs = kwargs
+        self.request = request = self.initialize_request(
+            request, *args, **kwargs
+        )
+        self.action = action
+        self.headers = self.default_response_headers
+        try:
+            if not self.async_initial(request, *args, **kwargs):
+                return None
+            response = await handler(request, *args, **kwargs)
+        except (APIException, ValueError):
+            # the sync action answers with the proper error
+            return None
+        if response is None:
+            return None
+        return await self.async_finalize_response(
+            request, response, *args, **kwargs
+        )
+
+    def async_initial(self, request, *args, **kwargs):
+        """ negotiate , authenticate and check permissions without a query """
+        self.format_kwarg = self.get_format_suffix(**kwargs)
+        renderer, media_type = self.perform_content_negotiation(request)
+        if not isinstance(renderer, self.async_renderer_classes):
+            return False
+        request.accepted_renderer = renderer
+        request.accepted_media_type = media_type
+
+        for authenticator in self.get_authenticators():
+            if not hasattr(authenticator, 'authenticate_cached'):
+                return False
+            user_auth = authenticator.authenticate_cached(request)
+            if user_auth is not None:
+                request.user, request.auth = user_auth
+                break
+        else:
+            return False
+        self.check_permissions(request)
+        return True
+
+    async def async_finalize_response(self, request, response, *args,
+                                      **kwargs):
+        response = self.finalize_response(request, response, *args, **kwargs)
+        if hasattr(response, 'render'):
+            # rendering needs no query
+            response.render()
+        return response
+
+    async def async_list(self, request, *args, **kwargs):
+        serializer_class = self.get_serializer_class()
+        if not issubclass(serializer_class, ValuesSerializer):
+            return None
+        queryset = self.filter_queryset(self.get_queryset())
+        paginator = self.paginator
+        if paginator is None:
+            return Response(
+                await serializer_class.async_render(await fetch(queryset))
+            )
+        if not hasattr(paginator, 'prepare_page'):
+            return None
+        page = paginator.prepare_page(queryset, request, view=self)
+        if page is None:
+            return Response(
+                await serializer_class.async_render(await fetch(queryset))
+            )
+        page = paginator.set_page(await fetch(page))
+        return paginator.get_paginated_response(
+            await serializer_class.async_render(page)
+        )
+
+    async def async_retrieve(self, request, *args, **kwargs):
+        serializer_class = self.get_serializer_class()
+        if not issubclass(serializer_class, ValuesSerializer):
+            return None
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.filter_queryset(self.get_queryset()).filter(**{
+            self.lookup_field: self.kwargs[lookup_url_kwarg]
+        })
+        rows = await fetch(queryset[:1])
+        if not rows:
+            # the sync action answers the 404
+            return None
+        self.check_object_permissions(request, rows[0])
+        data = await serializer_class.async_render(rows)
+        return Response(data[0])
+
+
+class ReplicaReadMixin:
+    """
+    serves safe requests from a read replica chosen once the user is
+    authenticated , a user who wrote through the view reads from the
+    primary for PIN_SECONDS afterwards , see core.routers
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        with routers.reads_from(None):
+            return super().dispatch(request, *args, **kwargs)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in SAFE_METHODS and \
+                routers.get_read_replicas_config()['ALIASES'] and \
+                not routers.is_pinned(request.user.pk):
+            routers.use_replica(routers.choose_replica())
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if request.method not in SAFE_METHODS and \
+                response.status_code < 400 and \
+                request.user.is_authenticated:
+            routers.pin_to_primary(request.user.pk)
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class SparseFieldsMixin:
+    """
+    the fields= and exclude= query params , comma separated field names ,
+    trim the values serializers of the read actions , only the columns of
+    the fields left are fetched and nested fields left out are not
+    fetched at all
+    """
+
+    def sparse_fields(self, serializer_class):
+        """ serializer_class restricted to the requested fields """
+        params = self.request.query_params
+        if not params.get('fields') and not params.get('exclude'):
+            return serializer_class
+        known = names = serializer_class.field_names()
+        if params.get('fields'):
+            names = self.sparse_field_names(
+                params['fields'], 'fields', known
+            )
+        if params.get('exclude'):
+            excluded = self.sparse_field_names(
+                params['exclude'], 'exclude', known
+            )
+            names = [name for name in names if name not in excluded]
+        if not names:
+            raise ValidationError({'fields': ['no field left to render']})
+        return serializer_class.restrict(names)
+
+    @staticmethod
+    def sparse_field_names(value, param, names):
+        requested = [name.strip() for name in value.split(',') if name.strip()]
+        unknown = [name for name in requested if name not in names]
+        if unknown:
+            raise ValidationError(
+                {param: [f'unknown fields: {", ".join(unknown)}']}
+            )
+        return requested
+
+    def get_value_fields(self, serializer_class, ordering):
+        """ the columns of serializer_class and the ones the cursor needs """
+        fields = serializer_class.value_fields()
+        ordered = [order.lstrip('-') for order in ordering]
+        return [
+            *fields, *(field for field in ordered if field not in fields)
+        ]
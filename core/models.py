@@ -0,0 +1,82 @@
+from django.conf import settings
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """
+    a unit of background work , queued in the database and run by the
+    run_jobs workers , see core.jobs
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUSES = [
+        (QUEUED, 'queued'),
+        (RUNNING, 'running'),
+        (SUCCEEDED, 'succeeded'),
+        (FAILED, 'failed'),
+    ]
+
+    # the client polling the job , kept when the user is deleted by it ,
+    # indexed by the (user, -id) index below
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        db_index=False
+    )
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(
+        max_length=20,
+        choices=STATUSES,
+        default=QUEUED
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    # units of work done out of total , as reported by the handler
+    progress = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(null=True, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    # not run before , pushed back on every retry
+    run_at = models.DateTimeField(default=timezone.now)
+    # refreshed on progress , a running job without one for LEASE seconds
+    # lost its worker
+    heartbeat = models.DateTimeField(null=True, blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    finished = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # the poll of the workers
+            models.Index(
+                fields=['run_at', 'id'],
+                condition=Q(status='queued'),
+                name='job_queued_run_at_idx'
+            ),
+            models.Index(
+                fields=['user', '-id'],
+                name='job_user_id_desc_idx'
+            ),
+        ]
+
+    def set_progress(self, progress, total=None):
+        """ record the progress , also the heartbeat of the worker """
+        self.progress = progress
+        if total is not None:
+            self.total = total
+        self.heartbeat = timezone.now()
+        Job.objects.filter(pk=self.pk).update(
+            progress=self.progress,
+            total=self.total,
+            heartbeat=self.heartbeat,
+        )
+
+    def __str__(self):
+        return f'{self.pk}:{self.name}:{self.status}'
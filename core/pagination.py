@@ -0,0 +1,116 @@
+"""
+Pagination classes shared by the api views
+"""
+from rest_framework import pagination
+from rest_framework.pagination import _reverse_ordering
+
+
+class PageNumberPagination(pagination.PageNumberPagination):
+    """ classic page number pagination , cost grows with the page number """
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+
+class KeysetPagination(pagination.CursorPagination):
+    """
+    cursor pagination seeking on the view ordering , taken from
+    view.get_ordering() when the view has it ,
+    every page costs the same no matter how deep it is ,
+    prepare_page and set_page split the fetch out for the async paths
+    """
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+    def get_ordering(self, request, queryset, view):
+        if hasattr(view, 'get_ordering'):
+            ordering = view.get_ordering()
+        else:
+            ordering = getattr(view, 'ordering', None) or self.ordering
+        if isinstance(ordering, str):
+            return (ordering,)
+        return tuple(ordering)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page_queryset = self.prepare_page(queryset, request, view)
+        if page_queryset is None:
+            return None
+        return self.set_page(list(page_queryset))
+
+    def prepare_page(self, queryset, request, view=None):
+        """
+        the first half of paginate_queryset , return the sliced queryset
+        of the page without running it
+        """
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            (offset, reverse, current_position) = (0, False, None)
+        else:
+            (offset, reverse, current_position) = self.cursor
+
+        if reverse:
+            queryset = queryset.order_by(*_reverse_ordering(self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        if current_position is not None:
+            order = self.ordering[0]
+            is_reversed = order.startswith('-')
+            order_attr = order.lstrip('-')
+
+            # (cursor reversed) XOR (queryset reversed)
+            if self.cursor.reverse != is_reversed:
+                kwargs = {order_attr + '__lt': current_position}
+            else:
+                kwargs = {order_attr + '__gt': current_position}
+
+            queryset = queryset.filter(**kwargs)
+
+        # one extra row tells whether a following page exists
+        return queryset[offset:offset + self.page_size + 1]
+
+    def set_page(self, results):
+        """ the second half of paginate_queryset , from the fetched rows """
+        if self.cursor is None:
+            (offset, reverse, current_position) = (0, False, None)
+        else:
+            (offset, reverse, current_position) = self.cursor
+        self.page = list(results[:self.page_size])
+
+        if len(results) > len(self.page):
+            has_following_position = True
+            following_position = self._get_position_from_instance(
+                results[-1], self.ordering
+            )
+        else:
+            has_following_position = False
+            following_position = None
+
+        if reverse:
+            # the rows were fetched in reverse , restore the page order
+            self.page = list(reversed(self.page))
+
+            self.has_next = (current_position is not None) or (offset > 0)
+            self.has_previous = has_following_position
+            if self.has_next:
+                self.next_position = current_position
+            if self.has_previous:
+                self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = (current_position is not None) or (offset > 0)
+            if self.has_next:
+                self.next_position = following_position
+            if self.has_previous:
+                self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
@@ -0,0 +1,169 @@
+"""
+Database router sending the safe requests of selected views to read
+replicas
+"""
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+DEFAULT_READ_REPLICAS = {
+    # database aliases of the replicas , empty disables the routing
+    'ALIASES': [],
+    # seconds a user reads from the primary after a write
+    'PIN_SECONDS': 5,
+    # replicas further behind the primary are skipped
+    'MAX_LAG': 5,
+    # seconds a lag measurement is reused by a process
+    'LAG_CHECK_INTERVAL': 2,
+    # alias in CACHES for the pins , shared between processes , with a
+    # cache local to the process the reads go to the primary
+    'CACHE': 'default',
+    'KEY_PREFIX': 'replica-pin:',
+    # the deployment runs a single process , a local cache is enough
+    'LOCAL_PINS': False,
+}
+
+# the replica the reads of the current request go to , None for the primary
+_replica = ContextVar('replica', default=None)
+# alias -> (checked at, lag in seconds or None when unreachable)
+_lags = {}
+
+LAG_SQL = (
+    'SELECT CASE '
+    'WHEN NOT pg_is_in_recovery() THEN 0 '
+    'WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 '
+    'ELSE COALESCE(EXTRACT(EPOCH FROM '
+    'now() - pg_last_xact_replay_timestamp()), 0) END'
+)
+
+
+def get_read_replicas_config():
+    return {**DEFAULT_READ_REPLICAS, **getattr(settings, 'READ_REPLICAS', {})}
+
+
+def get_pin_cache():
+    return caches[get_read_replicas_config()['CACHE']]
+
+
+def pin_to_primary(user_id):
+    """ send the reads of a user to the primary for PIN_SECONDS """
+    config = get_read_replicas_config()
+    if config['ALIASES']:
+        get_pin_cache().set(
+            config['KEY_PREFIX'] + str(user_id), 1, config['PIN_SECONDS']
+        )
+
+
+def pins_are_shared():
+    """
+    whether a pin set by one process is seen by the others , a pin only
+    the writing process sees lets the next read of the user reach a
+    replica that has not replayed the write yet
+    """
+    cache = get_pin_cache()
+    if isinstance(cache, DummyCache):
+        # pins are never stored
+        return False
+    return get_read_replicas_config()['LOCAL_PINS'] or \
+        not isinstance(cache, LocMemCache)
+
+
+def is_pinned(user_id):
+    config = get_read_replicas_config()
+    return get_pin_cache().get(config['KEY_PREFIX'] + str(user_id)) is not None
+
+
+def get_lag(alias):
+    """
+    return the replication lag of a replica in seconds , measured at most
+    once per LAG_CHECK_INTERVAL , None when the replica is unreachable
+    """
+    now = time.monotonic()
+    checked_at, lag = _lags.get(alias, (None, None))
+    interval = get_read_replicas_config()['LAG_CHECK_INTERVAL']
+    if checked_at is not None and now - checked_at < interval:
+        return lag
+    connection = connections[alias]
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(LAG_SQL)
+            lag = float(cursor.fetchone()[0])
+    except DatabaseError:
+        # the next request connects again
+        connection.close()
+        lag = None
+    _lags[alias] = (now, lag)
+    return lag
+
+
+def reset_lags():
+    _lags.clear()
+
+
+def choose_replica():
+    """
+    a random replica within MAX_LAG , None falls back to the primary ,
+    so does a pin cache the processes do not share
+    """
+    if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+        # the router keeps these reads on the primary anyway
+        return None
+    if not pins_are_shared():
+        return None
+    config = get_read_replicas_config()
+    replicas = []
+    for alias in config['ALIASES']:
+        lag = get_lag(alias)
+        if lag is not None and lag <= config['MAX_LAG']:
+            replicas.append(alias)
+    return random.choice(replicas) if replicas else None
+
+
+def current_replica():
+    return _replica.get()
+
+
+def use_replica(alias):
+    """ route the remaining reads of the current context to alias """
+    _replica.set(alias)
+
+
+@contextmanager
+def reads_from(alias):
+    """ route the reads inside the block to alias , None for the primary """
+    token = _replica.set(alias)
+    try:
+        yield
+    finally:
+        _replica.reset(token)
+
+
+class ReplicaRouter:
+    """
+    reads go to the replica chosen for the current request , see
+    core.mixins.ReplicaReadMixin , everything else and every read inside
+    a transaction goes to the primary
+    """
+
+    def db_for_read(self, model, **hints):
+        alias = _replica.get()
+        if alias is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # the replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in get_read_replicas_config()['ALIASES']
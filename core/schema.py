@@ -0,0 +1,22 @@
+"""
+drf-spectacular extensions for the core authentication classes
+"""
+from drf_spectacular.extensions import OpenApiAuthenticationExtension
+
+
+class SignedTokenScheme(OpenApiAuthenticationExtension):
+    """ signed tokens travel in the header of the database tokens """
+    target_class = 'core.authentication.SignedTokenAuthentication'
+    name = 'signedTokenAuth'
+
+    def get_security_definition(self, auto_schema):
+        return {
+            'type': 'apiKey',
+            'in': 'header',
+            'name': 'Authorization',
+            'description': (
+                f'signed token issued by the token endpoint with '
+                f'AUTH_TOKEN_MODE=signed , with the required prefix '
+                f'"{self.target.keyword}"'
+            ),
+        }
@@ -0,0 +1,276 @@
+"""
+Read only serializers rendering rows fetched with .values() , and the
+serializers of the jobs and the batch requests
+"""
+from collections import OrderedDict, defaultdict
+from urllib.parse import urlsplit
+
+from django.urls import reverse
+from rest_framework import serializers
+
+from core import batch
+from core.asyncdb import fetch
+from core.metrics import timer
+from core.models import Job
+
+# fields whose database value is already the wire value
+PASSTHROUGH_FIELDS = (
+    serializers.BooleanField,
+    serializers.CharField,
+    serializers.IntegerField,
+)
+
+
+def compile_fields(serializer):
+    """
+    return (name, source, converter) for the readable fields of a
+    serializer in output order , nested serializers get no source
+    """
+    compiled = []
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if isinstance(field, serializers.BaseSerializer):
+            compiled.append((name, None, None))
+            continue
+        converter = field.to_representation
+        if type(field) in PASSTHROUGH_FIELDS:
+            converter = None
+        compiled.append((name, field.source, converter))
+    return compiled
+
+
+class TimedDataMixin:
+    """ records the time spent building .data as serializer time """
+    @property
+    def data(self):
+        with timer('serializer'):
+            return super().data
+
+
+class TimedListSerializer(TimedDataMixin, serializers.ListSerializer):
+    pass
+
+
+class ValuesSerializer:
+    """
+    read only counterpart of a model serializer , it renders the dicts of
+    queryset.values(*value_fields()) with converters compiled once per class
+    and fetches every nested many to many field with one query per batch ,
+    the output is identical to the output of serializer_class
+    """
+    serializer_class = None
+
+    def __init__(self, instance=None, many=False, context=None, **kwargs):
+        self.instance = instance
+        self.many = many
+        self.context = context or {}
+
+    @classmethod
+    def compiled(cls):
+        """ compile the field accessors of serializer_class on first use """
+        if '_compiled' not in cls.__dict__:
+            serializer = cls.serializer_class()
+            model = serializer.Meta.model
+            nested = []
+            for name, field in serializer.fields.items():
+                if field.write_only:
+                    continue
+                if not isinstance(field, serializers.BaseSerializer):
+                    continue
+                if not isinstance(field, serializers.ListSerializer):
+                    raise TypeError(
+                        f'{cls.__name__}.{name} , only nested serializers '
+                        f'with many=True are supported'
+                    )
+                relation = model._meta.get_field(field.source)
+                nested.append((
+                    name,
+                    relation.related_model,
+                    relation.related_query_name(),
+                    compile_fields(field.child),
+                ))
+            cls._compiled = (compile_fields(serializer), nested)
+        return cls._compiled
+
+    @classmethod
+    def value_fields(cls):
+        """ the columns to pass to queryset.values() """
+        fields, nested = cls.compiled()
+        sources = [source for _, source, _ in fields if source is not None]
+        if nested and 'pk' not in sources and 'id' not in sources:
+            # the nested fields are fetched by the parent pk
+            sources.append('pk')
+        return sources
+
+    @classmethod
+    def field_names(cls):
+        fields, _ = cls.compiled()
+        return tuple(name for name, _, _ in fields)
+
+    @classmethod
+    def restrict(cls, names):
+        """
+        a subclass rendering only the fields in names , the columns of the
+        others are not fetched and nor are their nested rows
+        """
+        names = tuple(name for name in cls.field_names() if name in names)
+        if names == cls.field_names():
+            return cls
+        if '_restricted' not in cls.__dict__:
+            cls._restricted = {}
+        if names not in cls._restricted:
+            fields, nested = cls.compiled()
+            cls._restricted[names] = type(cls.__name__, (cls,), {
+                '_compiled': (
+                    [field for field in fields if field[0] in names],
+                    [field for field in nested if field[0] in names],
+                ),
+            })
+        return cls._restricted[names]
+
+    @property
+    def data(self):
+        with timer('serializer'):
+            rows = list(self.instance) if self.many else [self.instance]
+            data = self.render(rows)
+        return data if self.many else data[0]
+
+    @classmethod
+    def render(cls, rows):
+        _, nested = cls.compiled()
+        related = {
+            name: cls.fetch_related(rows, *relation)
+            for name, *relation in nested
+        }
+        return cls.render_rows(rows, related)
+
+    @classmethod
+    async def async_render(cls, rows):
+        """ render with the nested fields fetched through core.asyncdb """
+        with timer('serializer'):
+            _, nested = cls.compiled()
+            related = {}
+            for name, model, query_name, fields in nested:
+                queryset = cls.related_queryset(
+                    rows, model, query_name, fields
+                )
+                values = []
+                if queryset is not None:
+                    values = await fetch(queryset)
+                related[name] = cls.group_related(values, fields)
+            return cls.render_rows(rows, related)
+
+    @classmethod
+    def render_rows(cls, rows, related):
+        fields, _ = cls.compiled()
+        data = []
+        for row in rows:
+            pk = row.get('id', row.get('pk'))
+            item = OrderedDict()
+            for name, source, converter in fields:
+                if source is None:
+                    item[name] = related[name].get(pk, [])
+                    continue
+                value = row[source]
+                if converter is not None and value is not None:
+                    value = converter(value)
+                item[name] = value
+            data.append(item)
+        return data
+
+    @classmethod
+    def fetch_related(cls, rows, model, query_name, fields):
+        """ fetch and render a many to many field for a batch of rows """
+        queryset = cls.related_queryset(rows, model, query_name, fields)
+        if queryset is None:
+            return defaultdict(list)
+        return cls.group_related(queryset, fields)
+
+    @staticmethod
+    def related_queryset(rows, model, query_name, fields):
+        """ the rows of a many to many field , None for an empty batch """
+        pks = [row.get('id', row.get('pk')) for row in rows]
+        if not pks:
+            return None
+        sources = [source for _, source, _ in fields]
+        return model.objects.filter(
+            **{f'{query_name}__in': pks}
+        ).values_list(query_name, *sources).order_by('pk')
+
+    @staticmethod
+    def group_related(rows, fields):
+        """ render (parent pk, *sources) rows grouped by the parent """
+        children = defaultdict(list)
+        for parent_pk, *values in rows:
+            item = OrderedDict()
+            for (name, _, converter), value in zip(fields, values):
+                if converter is not None and value is not None:
+                    value = converter(value)
+                item[name] = value
+            children[parent_pk].append(item)
+        return children
+
+
+class JobSerializer(serializers.ModelSerializer):
+    """ the state of a job as polled by its client """
+
+    class Meta:
+        model = Job
+        fields = [
+            'id',
+            'name',
+            'status',
+            'progress',
+            'total',
+            'attempts',
+            'max_attempts',
+            'result',
+            'error',
+            'run_at',
+            'created',
+            'finished',
+        ]
+        read_only_fields = fields
+
+
+class BatchRequestSerializer(serializers.Serializer):
+    """ a sub-request of a batch , the body is sent as json """
+    method = serializers.ChoiceField(choices=batch.METHODS)
+    path = serializers.CharField(max_length=2000)
+    body = serializers.JSONField(required=False, allow_null=True)
+    headers = serializers.DictField(
+        child=serializers.CharField(),
+        required=False
+    )
+
+    def validate_path(self, value):
+        path = urlsplit(value).path
+        if not path.startswith(batch.get_batch_config()['PATH_PREFIX']):
+            raise serializers.ValidationError('not an api path')
+        if path == reverse('core:batch'):
+            raise serializers.ValidationError('batches can not be nested')
+        return value
+
+
+class BatchSerializer(serializers.Serializer):
+    requests = BatchRequestSerializer(many=True, allow_empty=False)
+
+    def validate_requests(self, value):
+        max_requests = batch.get_batch_config()['MAX_REQUESTS']
+        if len(value) > max_requests:
+            raise serializers.ValidationError(
+                f'at most {max_requests} requests per batch'
+            )
+        return value
+
+
+class BatchResponseSerializer(serializers.Serializer):
+    """ a sub-response , the body is the parsed json of the response """
+    status = serializers.IntegerField()
+    headers = serializers.DictField(child=serializers.CharField())
+    body = serializers.JSONField(allow_null=True)
+
+
+class BatchResultSerializer(serializers.Serializer):
+    responses = BatchResponseSerializer(many=True)
@@ -0,0 +1,46 @@
+"""
+Signal handlers keeping the core caches consistent
+"""
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from core import authentication, metrics, tokens
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    authentication.invalidate_token(instance.key)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_user_tokens(sender, instance, created, **kwargs):
+    """
+    cached tokens hold a copy of the user , drop them on any change ,
+    signed tokens carry no user to check so an inactive user has them
+    revoked
+    """
+    if created:
+        return
+    if not instance.is_active:
+        tokens.revoke_user(instance.pk)
+    for key in Token.objects.filter(
+        user_id=instance.pk
+    ).values_list('key', flat=True):
+        authentication.invalidate_token(key)
+
+
+@receiver(setting_changed)
+def reset_token_cache(setting, **kwargs):
+    if setting == 'TOKEN_AUTH_CACHE':
+        authentication.reset_local_cache()
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    """ count and time the queries of every request , see core.middleware """
+    if metrics.query_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(metrics.query_wrapper)
@@ -0,0 +1,118 @@
+from unittest.mock import patch
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core import authentication
+from core.cache import LRUCache
+
+ME_URL = reverse('user:me')
+TAGS_URL = reverse('recipe:tag-list')
+
+LOCMEM_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+
+
+class LRUCacheTests(TestCase):
+    """ test the in process lru cache """
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(max_size=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+        self.assertEqual(len(cache), 2)
+
+    @patch('core.cache.time.monotonic')
+    def test_entries_expire(self, patched_monotonic):
+        patched_monotonic.return_value = 100
+        cache = LRUCache(max_size=2, ttl=10)
+        cache.set('a', 1)
+
+        patched_monotonic.return_value = 109
+        self.assertEqual(cache.get('a'), 1)
+        patched_monotonic.return_value = 110
+        self.assertIsNone(cache.get('a'))
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """ test token lookups are cached and invalidated """
+    def setUp(self):  # noqa
+        authentication.reset_local_cache()
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='test1234',
+            name='Test Name'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def tearDown(self):  # noqa
+        authentication.reset_local_cache()
+
+    def test_cached_token_skips_lookup(self):
+        res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['email'], self.user.email)
+
+    def test_invalid_token_rejected(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Token invalid')
+        res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deleted_token_invalidated(self):
+        self.client.get(ME_URL)
+        self.token.delete()
+
+        res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_invalidated(self):
+        self.client.get(TAGS_URL)
+        self.user.is_active = False
+        self.user.save()
+
+        res = self.client.get(TAGS_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_user_update_invalidated(self):
+        """ test changes through the me endpoint are seen right away """
+        self.client.get(ME_URL)
+        res = self.client.patch(ME_URL, {'name': 'New Name'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        res = self.client.get(ME_URL)
+        self.assertEqual(res.data['name'], 'New Name')
+
+    @override_settings(
+        CACHES=LOCMEM_CACHES,
+        TOKEN_AUTH_CACHE={'SHARED_CACHE': 'default'},
+    )
+    def test_shared_cache_tier(self):
+        """ test a cold process resolves the token from the shared tier """
+        self.client.get(ME_URL)
+        authentication.reset_local_cache()
+
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        self.token.delete()
+        authentication.reset_local_cache()
+        res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
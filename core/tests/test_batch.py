@@ -0,0 +1,285 @@
+import threading
+from unittest import skipUnless
+from unittest.mock import patch
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core import batch
+from core.authentication import CachedTokenAuthentication
+from recipe.models import Recipe, Tag
+from recipe.views import TagViewSet
+
+BATCH_URL = reverse('core:batch')
+ME_URL = reverse('user:me')
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+def recipe_url(recipe_id):
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def create_user(email='test@example.com'):
+    return get_user_model().objects.create_user(
+        email=email,
+        password='test1234'
+    )
+
+
+def create_recipe(user, **params):
+    return Recipe.objects.create(
+        user=user,
+        title=params.pop('title', 'Soup'),
+        time_minutes=5,
+        price='2.50',
+        **params
+    )
+
+
+class BatchApiTests(TestCase):
+    """ test running several requests in one batch """
+    def setUp(self):  # noqa
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def post_batch(self, *requests):
+        return self.client.post(
+            BATCH_URL, {'requests': list(requests)}, format='json'
+        )
+
+    def test_auth_is_required(self):
+        res = APIClient().post(BATCH_URL, {'requests': [
+            {'method': 'GET', 'path': ME_URL},
+        ]}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_startup_reads(self):
+        """ test a batch answers like the requests sent one by one """
+        recipes = [create_recipe(self.user, title=f'R{i}') for i in range(2)]
+        Tag.objects.create(user=self.user, name='Vegan')
+        paths = [
+            ME_URL,
+            TAGS_URL,
+            f'{RECIPES_URL}?fields=id,title',
+            *(recipe_url(recipe.id) for recipe in recipes),
+        ]
+
+        res = self.post_batch(*(
+            {'method': 'GET', 'path': path} for path in paths
+        ))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        responses = res.json()['responses']
+        self.assertEqual(len(responses), len(paths))
+        for path, response in zip(paths, responses):
+            expected = self.client.get(path)
+            self.assertEqual(response['status'], expected.status_code)
+            self.assertEqual(response['body'], expected.json())
+            self.assertEqual(
+                response['headers'].get('ETag'), expected.get('ETag')
+            )
+
+    def test_authenticated_once(self):
+        token = Token.objects.create(user=self.user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+        with patch.object(
+            CachedTokenAuthentication,
+            'authenticate',
+            autospec=True,
+            side_effect=CachedTokenAuthentication.authenticate,
+        ) as authenticate:
+            res = client.post(BATCH_URL, {'requests': [
+                {'method': 'GET', 'path': ME_URL},
+                {'method': 'GET', 'path': TAGS_URL},
+                {'method': 'GET', 'path': RECIPES_URL},
+            ]}, format='json')
+
+        self.assertEqual(
+            [response['status'] for response in res.json()['responses']],
+            [200, 200, 200]
+        )
+        authenticate.assert_called_once()
+
+    def test_writes_run_in_order(self):
+        recipe = create_recipe(self.user)
+        url = recipe_url(recipe.id)
+
+        res = self.post_batch(
+            {'method': 'PATCH', 'path': url, 'body': {'title': 'First'}},
+            {'method': 'GET', 'path': url},
+            {
+                'method': 'PATCH',
+                'path': url,
+                'body': {'title': 'Stale'},
+                'headers': {'If-Match': '"1"'},
+            },
+            {'method': 'DELETE', 'path': url},
+            {'method': 'GET', 'path': url},
+        )
+
+        responses = res.json()['responses']
+        self.assertEqual(
+            [response['status'] for response in responses],
+            [200, 200, 412, 204, 404]
+        )
+        self.assertEqual(responses[1]['body']['title'], 'First')
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_sub_request_headers(self):
+        etag = self.client.get(TAGS_URL)['ETag']
+
+        res = self.post_batch({
+            'method': 'GET',
+            'path': TAGS_URL,
+            'headers': {'If-None-Match': etag, 'Accept': 'text/html'},
+        })
+
+        response = res.json()['responses'][0]
+        self.assertEqual(response['status'], status.HTTP_304_NOT_MODIFIED)
+        self.assertIsNone(response['body'])
+
+    def test_failing_sub_request(self):
+        """ test an unhandled error fails only its own sub-request """
+        recipe = create_recipe(self.user)
+        url = recipe_url(recipe.id)
+
+        with patch.object(TagViewSet, 'list', side_effect=RuntimeError), \
+                self.assertLogs('core.batch', 'ERROR'):
+            res = self.post_batch(
+                {'method': 'GET', 'path': TAGS_URL},
+                {'method': 'PATCH', 'path': url, 'body': {'title': 'New'}},
+                {'method': 'GET', 'path': url},
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        responses = res.json()['responses']
+        self.assertEqual(
+            [response['status'] for response in responses], [500, 200, 200]
+        )
+        self.assertEqual(responses[2]['body']['title'], 'New')
+
+    def test_unknown_path(self):
+        res = self.post_batch({'method': 'GET', 'path': '/api/unknown/'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json()['responses'][0]['status'], 404)
+
+    @override_settings(BATCH={'MAX_REQUESTS': 2})
+    def test_invalid_batches(self):
+        for requests in [
+            [],
+            [{'method': 'GET', 'path': '/ops/metrics/'}],
+            [{'method': 'POST', 'path': BATCH_URL}],
+            [{'method': 'TRACE', 'path': ME_URL}],
+            [{'method': 'GET', 'path': ME_URL}] * 3,
+        ]:
+            res = self.post_batch(*requests)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'reads on other connections')
+class BatchConcurrencyTests(TransactionTestCase):
+    """ test the reads of a batch run on the pool """
+    def setUp(self):  # noqa
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.addCleanup(batch.reset_executor)
+
+    def test_reads_run_on_the_pool(self):
+        recipe = create_recipe(self.user)
+        threads = []
+        run_request = batch.run_request
+
+        def record(*args, **kwargs):
+            threads.append(threading.current_thread().name)
+            return run_request(*args, **kwargs)
+
+        with patch('core.batch.run_request', side_effect=record):
+            res = self.client.post(BATCH_URL, {'requests': [
+                {'method': 'GET', 'path': ME_URL},
+                {'method': 'GET', 'path': recipe_url(recipe.id)},
+                {
+                    'method': 'PATCH',
+                    'path': recipe_url(recipe.id),
+                    'body': {'title': 'New'},
+                },
+                {'method': 'GET', 'path': recipe_url(recipe.id)},
+                {'method': 'GET', 'path': RECIPES_URL},
+            ]}, format='json')
+
+        responses = res.json()['responses']
+        self.assertEqual(
+            [response['status'] for response in responses],
+            [200, 200, 200, 200, 200]
+        )
+        self.assertEqual(responses[1]['body']['title'], 'Soup')
+        self.assertEqual(responses[3]['body']['title'], 'New')
+        self.assertEqual(
+            responses[4]['body']['results'][0]['title'], 'New'
+        )
+        # the write runs on the thread of the batch request
+        self.assertEqual(
+            [name.startswith('batch') for name in threads],
+            [True, True, False, True, True]
+        )
+
+    def test_reads_after_a_write_see_it(self):
+        recipe = create_recipe(self.user)
+        url = recipe_url(recipe.id)
+        reads = [
+            {'method': 'GET', 'path': url},
+            {'method': 'GET', 'path': RECIPES_URL},
+            {'method': 'GET', 'path': TAGS_URL},
+        ]
+
+        res = self.client.post(BATCH_URL, {'requests': [
+            *reads,
+            {
+                'method': 'PATCH',
+                'path': url,
+                'body': {'title': 'New', 'tags': [{'name': 'Vegan'}]},
+            },
+            *reads,
+            {'method': 'DELETE', 'path': url},
+            *reads,
+        ]}, format='json')
+
+        bodies = [response['body'] for response in res.json()['responses']]
+        self.assertEqual(bodies[0]['title'], 'Soup')
+        self.assertEqual(bodies[1]['results'][0]['title'], 'Soup')
+        self.assertEqual(bodies[2]['results'], [])
+        self.assertEqual(bodies[4]['title'], 'New')
+        self.assertEqual(bodies[5]['results'][0]['title'], 'New')
+        self.assertEqual(bodies[6]['results'][0]['name'], 'Vegan')
+        self.assertEqual(
+            [response['status'] for response in res.json()['responses'][8:]],
+            [404, 200, 200]
+        )
+        self.assertEqual(bodies[9]['results'], [])
+
+    def test_failing_pooled_read(self):
+        recipe = create_recipe(self.user)
+
+        with patch.object(TagViewSet, 'list', side_effect=RuntimeError), \
+                self.assertLogs('core.batch', 'ERROR'):
+            res = self.client.post(BATCH_URL, {'requests': [
+                {'method': 'GET', 'path': recipe_url(recipe.id)},
+                {'method': 'GET', 'path': TAGS_URL},
+                {'method': 'GET', 'path': ME_URL},
+            ]}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [response['status'] for response in res.json()['responses']],
+            [200, 500, 200]
+        )
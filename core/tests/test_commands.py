@@ -1,8 +1,24 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import skipUnless
 from unittest.mock import patch
 from psycopg2 import OperationalError as Psycopg2Error
+from django.contrib.auth import get_user_model
 from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
 from django.db.utils import OperationalError
-from django.test import SimpleTestCase
+from django.test import (
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+
+from core.management.commands.benchmark import compare
+from recipe.models import Recipe
 
 
 @patch('core.management.commands.wait_for_db.Command.check')
@@ -35,3 +51,127 @@ class CommandTests(SimpleTestCase):
         self.assertEqual(patched_check.call_count, 6)
 
         patched_check.assert_called_with(databases=['default'])
+
+
+class BenchmarkCommandTests(TestCase):
+    """ test the api benchmark command """
+    def benchmark(self, **options):
+        out = StringIO()
+        call_command(
+            'benchmark',
+            users=2,
+            recipes=3,
+            tags=2,
+            requests=2,
+            warmup=1,
+            host='testserver',
+            stdout=out,
+            **options
+        )
+        return out.getvalue()
+
+    def test_benchmark_reports_endpoints(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'baseline.json')
+            output = self.benchmark(save=path)
+            with open(path) as results_file:
+                results = json.load(results_file)
+
+        for name in ['recipe-list', 'tag-list', 'token', 'me']:
+            self.assertIn(name, output)
+            self.assertEqual(results[name]['requests'], 2)
+        self.assertFalse(get_user_model().objects.exists())
+
+    def test_benchmark_fails_on_regression(self):
+        baseline = {
+            'me': {'p50_ms': 0, 'p99_ms': 0, 'rps': 1e9, 'queries': 0},
+        }
+        with tempfile.NamedTemporaryFile('w', suffix='.json') as base_file:
+            json.dump(baseline, base_file)
+            base_file.flush()
+            with self.assertRaises(CommandError):
+                self.benchmark(endpoints='me', baseline=base_file.name)
+
+    def test_compare_query_growth(self):
+        base = {'p50_ms': 1, 'p99_ms': 2, 'rps': 10, 'queries': 2}
+        current = {**base, 'queries': 3}
+
+        self.assertEqual(compare({'me': base}, {'me': base}, 0.2), [])
+        self.assertEqual(len(compare({'me': current}, {'me': base}, 0.2)), 1)
+
+
+@override_settings(PASSWORD_HASHING={
+    'ARGON2_TIME_COST': 1,
+    'ARGON2_MEMORY_COST': 1024,
+    'PBKDF2_ITERATIONS': 1000,
+})
+class BenchLoginsCommandTests(TestCase):
+    """ test the login benchmark command """
+    def test_bench_logins(self):
+        out = StringIO()
+
+        call_command(
+            'bench_logins',
+            algorithms='argon2,pbkdf2',
+            logins=2,
+            threads=2,
+            host='testserver',
+            stdout=out
+        )
+
+        lines = out.getvalue().splitlines()
+        self.assertEqual(len(lines), 4)
+        self.assertTrue(lines[2].startswith('argon2'))
+        self.assertFalse(get_user_model().objects.exists())
+
+    def test_unknown_algorithm(self):
+        with self.assertRaises(CommandError):
+            call_command('bench_logins', algorithms='md5')
+
+
+class BenchCompressionCommandTests(TestCase):
+    """ test the compression benchmark command """
+    def test_bench_compression(self):
+        out = StringIO()
+
+        call_command(
+            'bench_compression',
+            recipes=20,
+            format='ndjson',
+            encodings='gzip,zstd',
+            repeat=1,
+            host='testserver',
+            stdout=out
+        )
+
+        lines = out.getvalue().splitlines()
+        self.assertEqual(len(lines), 8)
+        self.assertTrue(lines[1].startswith('gzip'))
+        self.assertFalse(Recipe.objects.exists())
+
+
+@skipUnless(connection.vendor == 'postgresql', 'async reads need postgres')
+class BenchAsgiCommandTests(TransactionTestCase):
+    """ test the sync against async read benchmark """
+    def test_reports_both_modes(self):
+        out = StringIO()
+
+        call_command(
+            'bench_asgi',
+            users=2,
+            recipes=5,
+            tags=2,
+            requests=10,
+            connections='1,4',
+            db_latency=1,
+            host='testserver',
+            stdout=out
+        )
+
+        lines = out.getvalue().splitlines()
+        self.assertEqual(len(lines), 5)
+        self.assertEqual(
+            [line.split()[1] for line in lines[1:]],
+            ['sync', 'async', 'sync', 'async']
+        )
+        self.assertFalse(get_user_model().objects.exists())
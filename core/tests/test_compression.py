@@ -0,0 +1,157 @@
+import gzip
+from unittest.mock import patch
+
+import brotli
+import zstandard
+from django.contrib.auth import get_user_model
+from django.test import RequestFactory, SimpleTestCase, TestCase, \
+    override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import compression
+from recipe.models import Recipe
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def zstd_decompress(data):
+    # streamed frames do not carry their size
+    return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+
+
+DECOMPRESS = {
+    'gzip': gzip.decompress,
+    'br': brotli.decompress,
+    'zstd': zstd_decompress,
+}
+
+
+class NegotiateTests(SimpleTestCase):
+    """ test choosing the encoding from Accept-Encoding """
+    def negotiate(self, header):
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING=header)
+        return compression.negotiate(request)
+
+    def test_server_preference_on_ties(self):
+        self.assertEqual(self.negotiate('gzip, deflate, br, zstd'), 'br')
+        self.assertEqual(self.negotiate('gzip, zstd'), 'zstd')
+
+    def test_q_values(self):
+        self.assertEqual(self.negotiate('br;q=0.5, gzip'), 'gzip')
+        self.assertEqual(self.negotiate('br;q=0, gzip;q=0.1'), 'gzip')
+        self.assertIsNone(self.negotiate('br;q=0, identity'))
+
+    def test_wildcard(self):
+        self.assertEqual(self.negotiate('*'), 'br')
+        self.assertEqual(self.negotiate('*;q=0.5, br;q=0, zstd;q=0'), 'gzip')
+
+    def test_no_header(self):
+        self.assertIsNone(compression.negotiate(RequestFactory().get('/')))
+
+    @override_settings(COMPRESSION={'ENABLED': False})
+    def test_disabled(self):
+        self.assertIsNone(self.negotiate('gzip'))
+
+    def test_stream_round_trip(self):
+        chunks = [b'{"id":%d,"title":"Recipe"}\n' % i for i in range(500)]
+        for encoding, decompress in DECOMPRESS.items():
+            compressed = list(compression.compress_stream(encoding, chunks))
+            # blocks are emitted as they fill , not once per chunk
+            self.assertLess(len(compressed), 10)
+            self.assertEqual(
+                decompress(b''.join(compressed)), b''.join(chunks)
+            )
+
+
+@override_settings(COMPRESSION={'MIN_SIZE': 200})
+class CompressionMiddlewareTests(TestCase):
+    """ test compressing the api responses """
+    def setUp(self):  # noqa
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='test1234'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        for i in range(10):
+            Recipe.objects.create(
+                user=self.user,
+                title=f'Recipe {i}',
+                time_minutes=5,
+                price='2.50',
+            )
+
+    def test_compressed_list(self):
+        plain = self.client.get(RECIPES_URL)
+        for encoding, decompress in DECOMPRESS.items():
+            res = self.client.get(RECIPES_URL, HTTP_ACCEPT_ENCODING=encoding)
+
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertEqual(res['Content-Encoding'], encoding)
+            self.assertIn('Accept-Encoding', res['Vary'])
+            self.assertEqual(res['ETag'], 'W/' + plain['ETag'])
+            self.assertEqual(int(res['Content-Length']), len(res.content))
+            self.assertLess(len(res.content), len(plain.content))
+            self.assertEqual(decompress(res.content), plain.content)
+
+    def test_small_response_not_compressed(self):
+        Recipe.objects.all().delete()
+
+        res = self.client.get(RECIPES_URL, HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertNotIn('Content-Encoding', res)
+        self.assertIn('Accept-Encoding', res['Vary'])
+
+    def test_streamed_list_compressed(self):
+        plain = self.client.get(
+            RECIPES_URL, HTTP_ACCEPT='application/x-ndjson'
+        )
+        res = self.client.get(
+            RECIPES_URL,
+            HTTP_ACCEPT='application/x-ndjson',
+            HTTP_ACCEPT_ENCODING='gzip'
+        )
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertNotIn('Content-Length', res)
+        self.assertEqual(
+            gzip.decompress(b''.join(res.streaming_content)),
+            b''.join(plain.streaming_content)
+        )
+
+    def test_not_modified_with_weak_etag(self):
+        res = self.client.get(RECIPES_URL, HTTP_ACCEPT_ENCODING='gzip')
+
+        res = self.client.get(
+            RECIPES_URL,
+            HTTP_ACCEPT_ENCODING='gzip',
+            HTTP_IF_NONE_MATCH=res['ETag']
+        )
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    @override_settings(
+        RESPONSE_CACHE={'ENABLED': True},
+        CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }},
+    )
+    def test_cached_page_stored_compressed(self):
+        plain = self.client.get(RECIPES_URL).content
+        with patch(
+            'core.compression.compress', wraps=compression.compress
+        ) as compress:
+            responses = [
+                self.client.get(RECIPES_URL, HTTP_ACCEPT_ENCODING='br')
+                for _ in range(3)
+            ]
+
+        compress.assert_called_once()
+        for res in responses:
+            self.assertEqual(res['Content-Encoding'], 'br')
+            self.assertEqual(res['ETag'], responses[0]['ETag'])
+            self.assertIn('Accept-Encoding', res['Vary'])
+            self.assertEqual(brotli.decompress(res.content), plain)
+        # the identity page is cached on its own
+        self.assertEqual(self.client.get(RECIPES_URL).content, plain)
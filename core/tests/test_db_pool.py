@@ -0,0 +1,185 @@
+from io import StringIO
+from unittest import skipUnless
+from unittest.mock import patch
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test import SimpleTestCase, TransactionTestCase
+
+from core.db import warm_pools
+from core.db.pool import ConnectionPool, PoolTimeout, close_pool
+
+
+class FakeConnection:
+    """ the parts of a psycopg2 connection the pool uses """
+    def __init__(self):
+        self.closed = 0
+        self.status = 0
+
+    def get_transaction_status(self):
+        return self.status
+
+    def rollback(self):
+        self.status = 0
+
+    def close(self):
+        self.closed = 1
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    """ test the connection pool """
+    def setUp(self):  # noqa
+        self.pool = ConnectionPool(
+            min_size=1,
+            max_size=2,
+            idle_timeout=60,
+            timeout=0.01
+        )
+
+    def test_reuses_returned_connections(self):
+        conn = self.pool.get(FakeConnection)
+        self.pool.put(conn)
+
+        self.assertIs(self.pool.get(FakeConnection), conn)
+        stats = self.pool.stats()
+        self.assertEqual(stats['created'], 1)
+        self.assertEqual(stats['reused'], 1)
+        self.assertEqual(stats['in_use'], 1)
+
+    def test_times_out_when_all_connections_are_in_use(self):
+        self.pool.get(FakeConnection)
+        self.pool.get(FakeConnection)
+
+        with self.assertRaises(PoolTimeout):
+            self.pool.get(FakeConnection)
+        self.assertEqual(self.pool.stats()['timeouts'], 1)
+
+    def test_rolls_back_open_transactions(self):
+        conn = self.pool.get(FakeConnection)
+        conn.status = 2
+
+        self.pool.put(conn)
+
+        self.assertEqual(conn.status, 0)
+        self.assertEqual(self.pool.stats()['idle'], 1)
+
+    def test_discards_broken_connections(self):
+        conn = self.pool.get(FakeConnection)
+        conn.closed = 2
+        self.pool.put(conn)
+        healthy = self.pool.get(FakeConnection)
+        self.pool.put(healthy)
+
+        self.assertIsNot(
+            self.pool.get(FakeConnection, check=lambda c: False),
+            healthy
+        )
+        stats = self.pool.stats()
+        self.assertEqual(stats['discarded'], 2)
+        self.assertEqual(stats['size'], 1)
+
+    def test_closes_expired_idle_connections_above_min_size(self):
+        first = self.pool.get(FakeConnection)
+        second = self.pool.get(FakeConnection)
+        self.pool.put(first)
+        self.pool.put(second)
+
+        with patch('time.monotonic', return_value=10 ** 9):
+            self.pool.stats()
+            conn = self.pool.get(FakeConnection)
+
+        self.assertTrue(first.closed)
+        self.assertIs(conn, second)
+        self.assertEqual(self.pool.stats()['size'], 1)
+
+    def test_warm_opens_min_size(self):
+        self.assertEqual(self.pool.warm(FakeConnection), 1)
+        self.assertEqual(self.pool.warm(FakeConnection), 0)
+        self.assertEqual(self.pool.stats()['idle'], 1)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'postgres backend')
+class PooledBackendTests(TransactionTestCase):
+    """ test health checks and pooling on a separate connection """
+    def make_wrapper(self, **options):
+        settings_dict = {
+            **connection.settings_dict,
+            'CONN_MAX_AGE': 0 if options else 60,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {'pool': options} if options else {},
+        }
+        backend = type(connections['default'])
+        wrapper = backend(settings_dict, alias='pool-test')
+        self.addCleanup(close_pool, wrapper.get_pool_key())
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def backend_pid(self, wrapper):
+        with wrapper.cursor() as cursor:
+            cursor.execute('SELECT pg_backend_pid()')
+            return cursor.fetchone()[0]
+
+    def terminate(self, pid):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_terminate_backend(%s)', [pid])
+
+    def test_health_check_replaces_a_dead_persistent_connection(self):
+        wrapper = self.make_wrapper()
+        pid = self.backend_pid(wrapper)
+        self.terminate(pid)
+
+        wrapper.close_if_unusable_or_obsolete()
+
+        self.assertNotEqual(self.backend_pid(wrapper), pid)
+
+    def test_closed_connections_go_back_to_the_pool(self):
+        wrapper = self.make_wrapper(MAX_SIZE=2)
+        pid = self.backend_pid(wrapper)
+        wrapper.close()
+
+        self.assertEqual(self.backend_pid(wrapper), pid)
+        stats = wrapper.pool.stats()
+        self.assertEqual(stats['created'], 1)
+        self.assertEqual(stats['reused'], 1)
+
+    def test_pool_drops_dead_connections(self):
+        wrapper = self.make_wrapper(MAX_SIZE=2)
+        pid = self.backend_pid(wrapper)
+        wrapper.close()
+        self.terminate(pid)
+
+        self.assertNotEqual(self.backend_pid(wrapper), pid)
+        self.assertEqual(wrapper.pool.stats()['discarded'], 1)
+
+    def test_warm_pools(self):
+        key = connection.get_pool_key()
+        self.addCleanup(close_pool, key)
+        for warm_on_start, opened, idle in [
+            (False, {}, 0),
+            (True, {'default': 2}, 2),
+        ]:
+            close_pool(key)
+            options = {**connection.settings_dict['OPTIONS'], 'pool': {
+                'MIN_SIZE': 2,
+                'WARM_ON_START': warm_on_start,
+            }}
+            with patch.dict(connection.settings_dict, OPTIONS=options):
+                self.assertEqual(warm_pools(), opened)
+                self.assertEqual(connection.pool.stats()['idle'], idle)
+
+    def test_check_db_pool(self):
+        out = StringIO()
+        options = {**connection.settings_dict['OPTIONS'], 'pool': {
+            'MIN_SIZE': 2,
+        }}
+        key = connection.get_pool_key()
+        self.addCleanup(close_pool, key)
+        close_pool(key)
+
+        with patch.dict(connection.settings_dict, OPTIONS=options):
+            call_command('check_db_pool', stdout=out)
+            stats = connection.pool.stats()
+
+        self.assertIn('opened 2 pool connections', out.getvalue())
+        self.assertIn('warmed on worker start', out.getvalue())
+        self.assertIn('server max_connections', out.getvalue())
+        self.assertEqual(stats['size'], 2)
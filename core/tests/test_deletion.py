@@ -0,0 +1,179 @@
+import gc
+import tracemalloc
+from decimal import Decimal
+from unittest.mock import patch
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+
+from core import jobs, tokens
+from core.deletion import delete_in_chunks
+from core.models import Job
+from recipe.deletion import delete_user_data
+from recipe.models import Recipe, Tag
+from user.deletion import delete_user
+
+
+def create_user(email='test@example.com'):
+    return get_user_model().objects.create_user(
+        email=email,
+        password='test1234'
+    )
+
+
+def add_recipes(user, count, tags=2):
+    """ bulk create recipes of the user , each linked to every tag """
+    Tag.objects.bulk_create([
+        Tag(user=user, name=f'Tag {i}') for i in range(tags)
+    ])
+    Recipe.objects.bulk_create([
+        Recipe(user=user, title='Soup', time_minutes=5, price=Decimal('8'))
+        for _ in range(count)
+    ])
+    # sqlite returns no ids from bulk inserts
+    through = Recipe.tags.through
+    through.objects.bulk_create([
+        through(recipe_id=recipe_id, tag_id=tag_id)
+        for recipe_id in Recipe.objects.filter(
+            user=user
+        ).values_list('id', flat=True)
+        for tag_id in Tag.objects.filter(
+            user=user
+        ).values_list('id', flat=True)
+    ])
+
+
+class DeleteInChunksTests(TestCase):
+    """ test the chunked set based deletes """
+    def setUp(self):  # noqa
+        self.user = create_user()
+        self.other = create_user('other@example.com')
+        add_recipes(self.user, 25)
+        add_recipes(self.other, 3)
+
+    def test_deletes_matching_rows_in_chunks(self):
+        with CaptureQueriesContext(connection) as ctx:
+            deleted = delete_in_chunks(
+                Recipe.tags.through.objects.filter(recipe__user=self.user),
+                chunk_size=10
+            )
+
+        self.assertEqual(deleted, 50)
+        deletes = [
+            query for query in ctx.captured_queries
+            if query['sql'].startswith('DELETE')
+        ]
+        # five full chunks and the one finding nothing left
+        self.assertEqual(len(deletes), 6)
+        self.assertEqual(Recipe.tags.through.objects.count(), 6)
+
+    @override_settings(FAST_DELETE={'CHUNK_SIZE': 10})
+    def test_delete_user_data(self):
+        delete_user_data(self.user.id)
+
+        self.assertFalse(Recipe.objects.filter(user=self.user).exists())
+        self.assertFalse(Tag.objects.filter(user=self.user).exists())
+        self.assertEqual(Recipe.objects.filter(user=self.other).count(), 3)
+        self.assertEqual(Recipe.tags.through.objects.count(), 6)
+
+
+class DeleteUserTests(TestCase):
+    """ test deleting an account , as the admin does """
+    def setUp(self):  # noqa
+        self.user = create_user()
+
+    def test_delete_user(self):
+        add_recipes(self.user, 5)
+        Token.objects.create(user=self.user)
+
+        job = delete_user(self.user.pk)
+
+        self.assertIsNone(job)
+        self.assertFalse(
+            get_user_model().objects.filter(pk=self.user.pk).exists()
+        )
+        self.assertFalse(Recipe.objects.exists())
+        self.assertFalse(Tag.objects.exists())
+        self.assertFalse(Token.objects.exists())
+
+    @override_settings(FAST_DELETE={'BACKGROUND_THRESHOLD': 2})
+    def test_delete_large_account_in_background(self):
+        add_recipes(self.user, 5)
+
+        job = delete_user(self.user.pk)
+
+        self.assertEqual(job.name, 'user.delete')
+        self.user.refresh_from_db()
+        # locked out while the data is deleted
+        self.assertFalse(self.user.is_active)
+
+        jobs.run(jobs.claim())
+
+        self.assertFalse(
+            get_user_model().objects.filter(pk=self.user.pk).exists()
+        )
+        self.assertFalse(Recipe.objects.exists())
+        self.assertEqual(Job.objects.get().status, Job.SUCCEEDED)
+
+    @override_settings(FAST_DELETE={
+        'BACKGROUND_THRESHOLD': 2, 'CHUNK_SIZE': 4
+    })
+    def test_background_delete_reports_progress(self):
+        add_recipes(self.user, 5)
+        job = delete_user(self.user.pk)
+        heartbeats = []
+
+        with patch.object(
+            Job,
+            'set_progress',
+            autospec=True,
+            side_effect=lambda job, progress, total=None: heartbeats.append(
+                progress
+            ),
+        ):
+            jobs.run(jobs.claim())
+
+        # the rows deleted so far after every chunk of the ten m2m rows ,
+        # the five recipes and the two tags
+        self.assertEqual(heartbeats, [0, 4, 8, 10, 10, 14, 15, 17])
+        self.assertEqual(Job.objects.get(pk=job.pk).status, Job.SUCCEEDED)
+
+    def test_delete_revokes_signed_tokens(self):
+        tokens.denylist.clear()
+        self.addCleanup(tokens.denylist.clear)
+        key = tokens.issue_token(self.user.pk)
+
+        delete_user(self.user.pk)
+
+        with self.assertRaises(tokens.InvalidToken):
+            tokens.verify_token(key)
+
+
+class DeleteMemoryTests(TransactionTestCase):
+    """
+    test the memory of chunked deletes , outside a test transaction so
+    every chunk commits as it would in production
+    """
+    @override_settings(FAST_DELETE={'CHUNK_SIZE': 500})
+    def test_memory_is_constant(self):
+        """ the peak memory of a delete does not grow with the rows """
+        peaks = []
+        # the first run also fills the bounded statement caches
+        for count in (1000, 1000, 5000):
+            user = create_user(f'user{len(peaks)}@example.com')
+            add_recipes(user, count, tags=3)
+            gc.collect()
+            tracemalloc.start()
+            try:
+                delete_user_data(user.id)
+                peaks.append(tracemalloc.get_traced_memory()[1])
+            finally:
+                tracemalloc.stop()
+            self.assertFalse(Recipe.objects.filter(user=user).exists())
+
+        # five times the rows , the same chunks , the slack covers the
+        # interpreter caches filling up per statement , the collector
+        # peaks at about 6MB deleting the 5000 recipes
+        self.assertLess(peaks[2], peaks[1] + 64 * 1024, peaks)
@@ -0,0 +1,132 @@
+import threading
+from unittest.mock import patch
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.test import APIClient
+
+from core import hashers
+
+TOKEN_URL = reverse('user:token')
+CREATE_USER_URL = reverse('user:create')
+CHEAP_HASHING = {
+    'ARGON2_TIME_COST': 1,
+    'ARGON2_MEMORY_COST': 1024,
+    'PBKDF2_ITERATIONS': 1000,
+    'WORKERS': 1,
+}
+
+
+@override_settings(PASSWORD_HASHING=CHEAP_HASHING)
+class HashingPoolTests(SimpleTestCase):
+    """ test the hashing worker pool """
+    def setUp(self):  # noqa
+        hashers.reset_executor()
+        self.addCleanup(hashers.reset_executor)
+
+    def test_hashes_on_a_worker(self):
+        name = hashers.run(lambda: threading.current_thread().name)
+
+        self.assertTrue(name.startswith('hasher'))
+
+    @override_settings(PASSWORD_HASHING={**CHEAP_HASHING, 'WORKERS': 0})
+    def test_no_workers_hash_on_the_caller(self):
+        name = hashers.run(lambda: threading.current_thread().name)
+
+        self.assertEqual(name, threading.current_thread().name)
+
+    @override_settings(PASSWORD_HASHING={
+        **CHEAP_HASHING,
+        'QUEUE_SIZE': 0,
+        'QUEUE_TIMEOUT': 0.01,
+    })
+    def test_refuses_hashes_when_full(self):
+        started = threading.Event()
+        release = threading.Event()
+        busy = threading.Thread(
+            target=hashers.run,
+            args=(lambda: started.set() or release.wait(),)
+        )
+        busy.start()
+        started.wait()
+        try:
+            with self.assertRaises(hashers.HashingBusy):
+                hashers.run(lambda: None)
+        finally:
+            release.set()
+            busy.join()
+
+        self.assertIsNone(hashers.run(lambda: None))
+
+    def test_uses_configured_cost(self):
+        encoded = make_password('password', hasher='argon2')
+
+        self.assertIn('m=1024,t=1,p=1', encoded)
+
+
+@override_settings(PASSWORD_HASHING=CHEAP_HASHING)
+class RehashOnLoginTests(TestCase):
+    """ test logins move passwords to the preferred hasher and cost """
+    def setUp(self):  # noqa
+        self.client = APIClient()
+        with override_settings(PASSWORD_HASHERS=[
+            'core.hashers.PBKDF2PasswordHasher'
+        ]):
+            self.user = get_user_model().objects.create_user(
+                email='user@example.com',
+                password='test-password'
+            )
+
+    def login(self):
+        res = self.client.post(TOKEN_URL, {
+            'email': 'user@example.com',
+            'password': 'test-password',
+        })
+        self.user.refresh_from_db()
+        return res
+
+    def test_login_rehashes_with_the_preferred_hasher(self):
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$'))
+
+        res = self.login()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(self.user.password.startswith('argon2$'))
+
+    def test_login_rehashes_when_the_cost_changes(self):
+        self.login()
+
+        with override_settings(PASSWORD_HASHING={
+            **CHEAP_HASHING,
+            'ARGON2_TIME_COST': 2,
+        }):
+            res = self.login()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('t=2', self.user.password)
+
+    @patch('core.hashers.run', side_effect=hashers.HashingBusy)
+    def test_busy_hashing_answers_503(self, patched_run):
+        res = self.login()
+
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        res = self.client.post(CREATE_USER_URL, {
+            'email': 'new@example.com',
+            'password': 'new-password',
+            'name': 'New',
+        })
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    @patch('core.hashers.run', side_effect=hashers.HashingBusy)
+    def test_busy_hashing_outside_the_api(self, patched_run):
+        """ test commands and the admin get a plain exception """
+        with self.assertRaises(hashers.HashingBusy) as ctx:
+            get_user_model().objects.create_user(
+                email='new@example.com',
+                password='new-password'
+            )
+
+        self.assertNotIsInstance(ctx.exception, APIException)
@@ -0,0 +1,326 @@
+import threading
+from datetime import timedelta
+from io import StringIO
+from unittest import skipUnless
+from unittest.mock import patch
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import jobs
+from core.models import Job
+from recipe.models import Recipe, RecipeStats
+from recipe.views import RecipeViewSet
+
+JOBS_URL = reverse('core:job-list')
+BULK_URL = reverse('recipe:recipe-bulk-create')
+
+
+def detail_url(job_id):
+    return reverse('core:job-detail', args=[job_id])
+
+
+def create_user(email='test@example.com'):
+    return get_user_model().objects.create_user(
+        email=email,
+        password='test1234'
+    )
+
+
+def recipe_rows(count, **params):
+    return [
+        {'title': f'Recipe {i}', 'time_minutes': 5, 'price': '2.00', **params}
+        for i in range(count)
+    ]
+
+
+class Flaky:
+    """ a handler failing the first times it is called """
+    def __init__(self, failures):
+        self.failures = failures
+
+    def __call__(self, job):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError('temporary failure')
+        return {'done': True}
+
+
+@override_settings(JOBS={'RETRY_DELAY': 10})
+class JobQueueTests(TestCase):
+    """ test queueing , claiming and running jobs """
+    def setUp(self):  # noqa
+        handlers = patch.dict(jobs._handlers, {
+            'test.ok': lambda job: {'echo': job.payload},
+            'test.flaky': Flaky(1),
+            'test.broken': Flaky(10),
+            'test.invalid': self.invalid,
+        })
+        handlers.start()
+        self.addCleanup(handlers.stop)
+
+    @staticmethod
+    def invalid(job):
+        raise jobs.JobError('bad payload', result={'field': 'x'})
+
+    def test_enqueue_unknown_job(self):
+        with self.assertRaises(ValueError):
+            jobs.enqueue('test.unknown')
+
+    def test_claim_and_run(self):
+        queued = jobs.enqueue('test.ok', {'a': 1})
+
+        job = jobs.claim()
+
+        self.assertEqual(job.pk, queued.pk)
+        self.assertEqual(job.status, Job.RUNNING)
+        self.assertEqual(job.attempts, 1)
+        self.assertIsNone(jobs.claim())
+
+        jobs.run(job)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.SUCCEEDED)
+        self.assertEqual(job.result, {'echo': {'a': 1}})
+        self.assertIsNotNone(job.finished)
+
+    def test_claim_in_run_at_order(self):
+        later = jobs.enqueue('test.ok')
+        sooner = jobs.enqueue(
+            'test.ok', run_at=timezone.now() - timedelta(seconds=5)
+        )
+        jobs.enqueue('test.ok', run_at=timezone.now() + timedelta(hours=1))
+
+        self.assertEqual(jobs.claim().pk, sooner.pk)
+        self.assertEqual(jobs.claim().pk, later.pk)
+        # not due yet
+        self.assertIsNone(jobs.claim())
+
+    def test_failed_job_is_retried_later(self):
+        jobs.enqueue('test.flaky')
+
+        with self.assertLogs('core.jobs', 'ERROR'):
+            job = jobs.run(jobs.claim())
+
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertIn('temporary failure', job.error)
+        self.assertGreater(job.run_at, timezone.now() + timedelta(seconds=5))
+        self.assertIsNone(jobs.claim())
+
+        Job.objects.update(run_at=timezone.now())
+        job = jobs.run(jobs.claim())
+
+        self.assertEqual(job.status, Job.SUCCEEDED)
+        self.assertEqual(job.attempts, 2)
+        self.assertEqual(job.error, '')
+
+    def test_job_fails_after_max_attempts(self):
+        jobs.enqueue('test.broken', max_attempts=2)
+
+        with self.assertLogs('core.jobs', 'ERROR'):
+            jobs.run(jobs.claim())
+            Job.objects.update(run_at=timezone.now())
+            job = jobs.run(jobs.claim())
+
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, 2)
+
+    def test_job_error_is_not_retried(self):
+        jobs.enqueue('test.invalid')
+
+        job = jobs.run(jobs.claim())
+
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.error, 'bad payload')
+        self.assertEqual(job.result, {'field': 'x'})
+
+    @override_settings(JOBS={'LEASE': 60})
+    def test_lost_job_is_queued_again(self):
+        job = jobs.enqueue('test.ok')
+        jobs.claim()
+        Job.objects.update(heartbeat=timezone.now() - timedelta(minutes=5))
+
+        self.assertEqual(jobs.requeue_lost(), 1)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertIn('lost', job.error)
+
+    def test_set_progress(self):
+        job = jobs.enqueue('test.ok')
+
+        job.set_progress(3, 10)
+
+        job.refresh_from_db()
+        self.assertEqual((job.progress, job.total), (3, 10))
+        self.assertIsNotNone(job.heartbeat)
+
+    def test_run_jobs_command(self):
+        jobs.enqueue('test.ok')
+        jobs.enqueue('test.invalid')
+        out = StringIO()
+
+        call_command('run_jobs', once=True, stdout=out)
+
+        self.assertIn('2 jobs run', out.getvalue())
+        self.assertEqual(
+            sorted(Job.objects.values_list('status', flat=True)),
+            [Job.FAILED, Job.SUCCEEDED]
+        )
+
+
+@skipUnless(connection.vendor == 'postgresql', 'postgres row locks')
+class SkipLockedTests(TransactionTestCase):
+    """ test workers claiming jobs at the same time """
+    def setUp(self):  # noqa
+        handlers = patch.dict(jobs._handlers, {'test.ok': lambda job: None})
+        handlers.start()
+        self.addCleanup(handlers.stop)
+
+    def claim_on_thread(self):
+        claimed = []
+
+        def claim():
+            try:
+                claimed.append(jobs.claim())
+            finally:
+                connections.close_all()
+        thread = threading.Thread(target=claim)
+        thread.start()
+        thread.join(timeout=10)
+        self.assertFalse(thread.is_alive(), 'the claim waited on the lock')
+        return claimed[0]
+
+    def test_locked_job_is_skipped(self):
+        first = jobs.enqueue('test.ok')
+        second = jobs.enqueue('test.ok')
+
+        with transaction.atomic():
+            # another worker in the middle of claiming the first job
+            Job.objects.select_for_update().get(pk=first.pk)
+            claimed = self.claim_on_thread()
+
+        self.assertEqual(claimed.pk, second.pk)
+
+    def test_concurrent_workers(self):
+        for _ in range(6):
+            jobs.enqueue('test.ok')
+        out = StringIO()
+
+        call_command('run_jobs', once=True, concurrency=3, stdout=out)
+
+        self.assertIn('6 jobs run', out.getvalue())
+        self.assertFalse(Job.objects.exclude(attempts=1).exists())
+        self.assertFalse(Job.objects.exclude(status=Job.SUCCEEDED).exists())
+
+
+class JobApiTests(TestCase):
+    """ test polling jobs and the jobs queued by the api """
+    def setUp(self):  # noqa
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_auth_is_required(self):
+        res = APIClient().get(JOBS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_only_own_jobs(self):
+        other = create_user('other@example.com')
+        jobs.enqueue('recipe.rebuild_stats', user=other)
+        job = jobs.enqueue('recipe.rebuild_stats', user=self.user)
+
+        res = self.client.get(JOBS_URL)
+
+        self.assertEqual(
+            [row['id'] for row in res.data['results']], [job.pk]
+        )
+        res = self.client.get(detail_url(job.pk))
+        self.assertEqual(res.data['status'], Job.QUEUED)
+
+    def test_bulk_import_job(self):
+        res = self.client.post(
+            BULK_URL,
+            recipe_rows(5, tags=[{'name': 'Vegan'}]),
+            format='json',
+            HTTP_PREFER='respond-async'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(res['Location'], detail_url(res.data['id']))
+        self.assertFalse(Recipe.objects.exists())
+
+        jobs.run(jobs.claim())
+
+        res = self.client.get(res['Location'])
+        self.assertEqual(res.data['status'], Job.SUCCEEDED)
+        self.assertEqual((res.data['progress'], res.data['total']), (5, 5))
+        self.assertEqual(res.data['result'], {'created': 5})
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 5)
+        self.assertEqual(
+            Recipe.tags.through.objects.filter(tag__name='Vegan').count(), 5
+        )
+
+    def test_bulk_import_job_is_capped(self):
+        with patch.object(RecipeViewSet, 'bulk_async_max_rows', 3):
+            res = self.client.post(
+                BULK_URL,
+                recipe_rows(4),
+                format='json',
+                HTTP_PREFER='respond-async'
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Job.objects.exists())
+
+    def test_bulk_import_job_resumes(self):
+        job = jobs.enqueue('recipe.bulk_import', {
+            'rows': recipe_rows(5),
+            'chunk_size': 2,
+        }, user=self.user)
+        # the first chunk was written by an attempt that then failed
+        Job.objects.filter(pk=job.pk).update(progress=2)
+
+        job = jobs.run(jobs.claim())
+
+        self.assertEqual(job.result, {'created': 5})
+        self.assertEqual(
+            list(Recipe.objects.order_by('id').values_list(
+                'title', flat=True
+            )),
+            ['Recipe 2', 'Recipe 3', 'Recipe 4']
+        )
+
+    def test_bulk_import_job_invalid_rows(self):
+        rows = recipe_rows(3) + recipe_rows(1, price='bad')
+        jobs.enqueue('recipe.bulk_import', {
+            'rows': rows,
+            'chunk_size': 3,
+        }, user=self.user)
+
+        job = jobs.run(jobs.claim())
+
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.result['created'], 3)
+        self.assertIn('price', job.result['errors'][0])
+        self.assertEqual(Recipe.objects.count(), 3)
+
+    def test_rebuild_stats_job(self):
+        Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=5, price=10
+        )
+        out = StringIO()
+
+        call_command('rebuild_recipe_stats', background=True, stdout=out)
+        job = jobs.run(jobs.claim())
+
+        self.assertIn(f'queued job {job.pk}', out.getvalue())
+        self.assertEqual(job.result, {'rebuilt': 1})
+        self.assertEqual((job.progress, job.total), (1, 1))
+        self.assertEqual(RecipeStats.objects.get().recipe_count, 1)
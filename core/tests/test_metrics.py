@@ -0,0 +1,98 @@
+import os
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.metrics import Histogram, registry
+
+METRICS_URL = reverse('ops-metrics')
+RECIPES_URL = reverse('recipe:recipe-list')
+RECIPES_VIEW = 'recipe:recipe-list'
+
+
+class HistogramTests(TestCase):
+    """ test the fixed bucket histogram """
+    def test_percentiles(self):
+        histogram = Histogram((1, 10, 100))
+        for value in [0.5] * 90 + [50] * 9 + [500]:
+            histogram.observe(value)
+
+        self.assertEqual(histogram.count, 100)
+        self.assertEqual(histogram.percentile(50), 1)
+        self.assertEqual(histogram.percentile(99), 100)
+        self.assertEqual(histogram.percentile(100), 500)
+
+    def test_memory_is_constant(self):
+        histogram = Histogram((1, 10, 100))
+        for value in range(10000):
+            histogram.observe(value)
+
+        self.assertEqual(len(histogram.counts), 4)
+        self.assertEqual(histogram.counts[-1], 10000 - 101)
+
+
+class RequestMetricsTests(TestCase):
+    """ test the request metrics middleware and the metrics endpoint """
+    def setUp(self):  # noqa
+        registry.clear()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_server_timing_header(self):
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        timing = res['Server-Timing']
+        self.assertIn('total;dur=', timing)
+        self.assertIn('db;dur=', timing)
+        self.assertIn('serializer;dur=', timing)
+
+    def test_records_per_view(self):
+        self.client.get(RECIPES_URL)
+        self.client.get(RECIPES_URL)
+
+        view = registry.snapshot()[RECIPES_VIEW]
+        self.assertEqual(view['wall_ms']['count'], 2)
+        self.assertEqual(view['serializer_ms']['count'], 2)
+        self.assertGreater(view['queries']['mean'], 0)
+        self.assertGreater(view['response_bytes']['mean'], 0)
+
+    @override_settings(REQUEST_METRICS={'ENABLED': False})
+    def test_disabled(self):
+        res = self.client.get(RECIPES_URL)
+
+        self.assertNotIn('Server-Timing', res)
+        self.assertNotIn(RECIPES_VIEW, registry.snapshot())
+
+    def test_profiles_sampled_requests(self):
+        with tempfile.TemporaryDirectory() as directory:
+            config = {'PROFILE_SAMPLE_RATE': 1.0, 'PROFILE_DIR': directory}
+            with override_settings(REQUEST_METRICS=config):
+                self.client.get(RECIPES_URL)
+
+            dumps = os.listdir(directory)
+            self.assertEqual(len(dumps), 1)
+            self.assertTrue(dumps[0].startswith('recipe-recipe-list-'))
+
+    def test_metrics_requires_staff(self):
+        res = self.client.get(METRICS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_metrics_for_staff(self):
+        self.user.is_staff = True
+        self.user.save()
+        self.client.get(RECIPES_URL)
+
+        res = self.client.get(METRICS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data[RECIPES_VIEW]['wall_ms']['count'], 1)
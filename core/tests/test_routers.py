@@ -0,0 +1,87 @@
+from unittest.mock import patch
+from django.db import connection, connections
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from core import routers
+
+REPLICAS = {
+    'ALIASES': ['replica_1', 'replica_2'],
+    'MAX_LAG': 5,
+    'LOCAL_PINS': True,
+}
+
+
+@override_settings(READ_REPLICAS=REPLICAS)
+class ReplicaRouterTests(SimpleTestCase):
+    """ test the read replica router """
+    def setUp(self):  # noqa
+        self.router = routers.ReplicaRouter()
+
+    def test_reads_go_to_the_primary_by_default(self):
+        self.assertIsNone(self.router.db_for_read(None))
+
+    def test_reads_go_to_the_chosen_replica(self):
+        with routers.reads_from('replica_1'):
+            self.assertEqual(self.router.db_for_read(None), 'replica_1')
+            self.assertEqual(self.router.db_for_write(None), 'default')
+        self.assertIsNone(self.router.db_for_read(None))
+
+    def test_reads_inside_a_transaction_go_to_the_primary(self):
+        with routers.reads_from('replica_1'), \
+                patch.object(connections['default'], 'in_atomic_block', True):
+            self.assertIsNone(self.router.db_for_read(None))
+
+    def test_replicas_are_not_migrated(self):
+        self.assertFalse(self.router.allow_migrate('replica_1', 'recipe'))
+        self.assertTrue(self.router.allow_migrate('default', 'recipe'))
+
+    @patch('core.routers.get_lag')
+    def test_choose_replica_skips_lagging_replicas(self, patched_get_lag):
+        patched_get_lag.side_effect = {'replica_1': 30, 'replica_2': 1}.get
+
+        self.assertEqual(routers.choose_replica(), 'replica_2')
+
+    @patch('core.routers.get_lag')
+    def test_choose_replica_falls_back_to_the_primary(self, patched_get_lag):
+        patched_get_lag.side_effect = {'replica_1': 30, 'replica_2': None}.get
+
+        self.assertIsNone(routers.choose_replica())
+
+    @patch('core.routers.get_lag', return_value=0)
+    def test_local_pin_cache_falls_back_to_the_primary(self, patched_get_lag):
+        with override_settings(READ_REPLICAS={
+            **REPLICAS, 'LOCAL_PINS': False
+        }):
+            self.assertIsNone(routers.choose_replica())
+        with override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+        }}):
+            self.assertIsNone(routers.choose_replica())
+        self.assertIn(routers.choose_replica(), REPLICAS['ALIASES'])
+
+    def test_pins(self):
+        routers.pin_to_primary(1)
+
+        self.assertTrue(routers.is_pinned(1))
+        self.assertFalse(routers.is_pinned(2))
+
+
+class ReplicaLagTests(TestCase):
+    """ test measuring the replica lag """
+    def setUp(self):  # noqa
+        routers.reset_lags()
+        self.addCleanup(routers.reset_lags)
+
+    def test_lag_of_a_primary_is_zero(self):
+        if connection.vendor != 'postgresql':
+            self.skipTest('postgres lag query')
+        self.assertEqual(routers.get_lag('default'), 0)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(routers.get_lag('default'), 0)
+
+    def test_unreachable_replica_has_no_lag(self):
+        with patch.object(connection, 'cursor', side_effect=(
+            routers.DatabaseError
+        )), patch.object(connection, 'close'):
+            self.assertIsNone(routers.get_lag('default'))
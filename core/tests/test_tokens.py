@@ -0,0 +1,282 @@
+from django.contrib.auth import get_user_model
+from drf_spectacular.generators import SchemaGenerator
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core import tokens
+
+TOKEN_URL = reverse('user:token')
+ME_URL = reverse('user:me')
+RECIPES_URL = reverse('recipe:recipe-list')
+KEYS = [('new', 'new-secret'), ('old', 'old-secret')]
+
+
+def create_user(email='user@example.com'):
+    return get_user_model().objects.create_user(
+        email=email,
+        password='test-password',
+        name='Test'
+    )
+
+
+@override_settings(SIGNED_TOKENS={'KEYS': KEYS, 'TTL': 60})
+class SignedTokenTests(TestCase):
+    """ test signing and verifying tokens """
+    def setUp(self):  # noqa
+        tokens.denylist.clear()
+        self.addCleanup(tokens.denylist.clear)
+        self.user_id = create_user().pk
+        self.other_id = create_user('other@example.com').pk
+
+    def test_round_trip(self):
+        token = tokens.verify_token(
+            tokens.issue_token(self.user_id, now=1000), now=1001
+        )
+
+        self.assertEqual(token.user_id, self.user_id)
+        self.assertEqual(token.key_id, 'new')
+        self.assertEqual(token.expires_at, 1060)
+
+    def test_expired(self):
+        key = tokens.issue_token(self.user_id, now=1000)
+
+        with self.assertRaisesMessage(tokens.InvalidToken, 'expired'):
+            tokens.verify_token(key, now=1060)
+
+    def test_tampered(self):
+        key = tokens.issue_token(self.user_id, now=1000).replace(
+            f'.{self.user_id}.', f'.{self.other_id}.'
+        )
+
+        with self.assertRaisesMessage(tokens.InvalidToken, 'signature'):
+            tokens.verify_token(key, now=1001)
+
+    def test_malformed(self):
+        for key in ['s1', 's1.new.x.1.2.id.sig', 'abc']:
+            with self.assertRaises(tokens.InvalidToken):
+                tokens.verify_token(key)
+
+    def test_key_rotation(self):
+        with override_settings(SIGNED_TOKENS={'KEYS': KEYS[1:]}):
+            key = tokens.issue_token(self.user_id)
+
+        self.assertEqual(tokens.verify_token(key).key_id, 'old')
+        with override_settings(SIGNED_TOKENS={'KEYS': KEYS[:1]}):
+            with self.assertRaisesMessage(tokens.InvalidToken, 'unknown'):
+                tokens.verify_token(key)
+
+    def test_revoke_token(self):
+        key = tokens.issue_token(self.user_id)
+        tokens.denylist.revoke_token(tokens.verify_token(key))
+
+        with self.assertRaisesMessage(tokens.InvalidToken, 'revoked'):
+            tokens.verify_token(key)
+        tokens.verify_token(tokens.issue_token(self.user_id))
+
+    def test_revoke_user(self):
+        old = tokens.issue_token(self.user_id, now=1000)
+        tokens.revoke_user(self.user_id, now=1000)
+
+        with self.assertRaisesMessage(tokens.InvalidToken, 'revoked'):
+            tokens.verify_token(old, now=1001)
+        tokens.verify_token(
+            tokens.issue_token(self.user_id, now=1000.1), now=1001
+        )
+        tokens.verify_token(
+            tokens.issue_token(self.other_id, now=1000), now=1001
+        )
+
+    def test_revocation_is_seen_by_other_processes(self):
+        """ test a process without the revocation in its denylist """
+        old = tokens.issue_token(self.user_id, now=1000)
+        tokens.revoke_user(self.user_id, now=1000)
+        tokens.denylist.clear()
+
+        with self.assertRaisesMessage(tokens.InvalidToken, 'revoked'):
+            tokens.verify_token(old, now=1001)
+
+    def test_deleted_user(self):
+        key = tokens.issue_token(self.user_id, now=1000)
+        get_user_model().objects.filter(pk=self.user_id).delete()
+
+        with self.assertRaisesMessage(tokens.InvalidToken, 'revoked'):
+            tokens.verify_token(key, now=1001)
+
+    def test_denylist_drops_expired_entries(self):
+        tokens.denylist.revoke_token(tokens.verify_token(
+            tokens.issue_token(self.user_id, now=1000), now=1001
+        ))
+        tokens.denylist.revoke_user(self.user_id)
+
+        self.assertEqual(len(tokens.denylist), 1)
+
+
+class SharedRevocationTests(TestCase):
+    """ test the revocations kept in the revocation cache """
+    def setUp(self):  # noqa
+        tokens.denylist.clear()
+        self.addCleanup(tokens.denylist.clear)
+        tokens.get_revocation_cache().clear()
+        self.addCleanup(tokens.get_revocation_cache().clear)
+        self.user_id = create_user().pk
+
+    @override_settings(SIGNED_TOKENS={'LOCAL_REVOCATIONS': True})
+    def test_verify_reads_the_cache(self):
+        key = tokens.issue_token(self.user_id)
+        with self.assertNumQueries(1):
+            tokens.verify_token(key)
+
+        with self.assertNumQueries(0):
+            tokens.verify_token(key)
+        tokens.revoke_user(self.user_id)
+        tokens.denylist.clear()
+        with self.assertNumQueries(0):
+            with self.assertRaisesMessage(tokens.InvalidToken, 'revoked'):
+                tokens.verify_token(key)
+
+    def test_local_cache_is_not_shared(self):
+        """ test every verify reads the user row """
+        self.assertFalse(tokens.revocations_are_shared())
+        key = tokens.issue_token(self.user_id)
+
+        for _ in range(2):
+            with self.assertNumQueries(1):
+                tokens.verify_token(key)
+
+    @override_settings(SIGNED_TOKENS={'LOCAL_REVOCATIONS': True})
+    def test_verify_without_lookup(self):
+        key = tokens.issue_token(self.user_id)
+
+        with self.assertNumQueries(0):
+            self.assertIsNone(tokens.verify_token(key, lookup=False))
+        tokens.verify_token(key)
+        self.assertEqual(
+            tokens.verify_token(key, lookup=False).user_id, self.user_id
+        )
+
+
+@override_settings(SIGNED_TOKENS={'ENABLED': True, 'KEYS': KEYS})
+class SignedTokenApiTests(TestCase):
+    """ test the api with signed tokens """
+    def setUp(self):  # noqa
+        tokens.denylist.clear()
+        self.addCleanup(tokens.denylist.clear)
+        tokens.get_revocation_cache().clear()
+        self.addCleanup(tokens.get_revocation_cache().clear)
+        self.user = create_user()
+        self.client = APIClient()
+
+    def login(self):
+        res = self.client.post(TOKEN_URL, {
+            'email': 'user@example.com',
+            'password': 'test-password',
+        })
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Token {res.data["token"]}'
+        )
+        return res
+
+    def test_login_issues_a_signed_token(self):
+        res = self.login()
+
+        self.assertTrue(tokens.is_signed_token(res.data['token']))
+        self.assertEqual(res.data['expires_in'], 3600)
+        self.assertFalse(Token.objects.exists())
+
+    @override_settings(SIGNED_TOKENS={
+        'ENABLED': True, 'KEYS': KEYS, 'LOCAL_REVOCATIONS': True
+    })
+    def test_reads_without_an_auth_lookup(self):
+        self.login()
+        # caches the revocations of the user
+        self.client.get(RECIPES_URL)
+
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        for query in ctx.captured_queries:
+            self.assertNotIn('authtoken_token', query['sql'])
+            self.assertNotIn('user_user', query['sql'])
+
+    def test_me_loads_the_user(self):
+        self.login()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['email'], 'user@example.com')
+        self.assertEqual(res.data['name'], 'Test')
+
+    def test_invalid_signed_token(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Token s1.new.1.2.3.4.x')
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_database_tokens_keep_working(self):
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_revocations_are_shared(self):
+        """ test other processes refuse the tokens revoked by one """
+        self.login()
+        tokens.revoke_user(self.user.pk)
+        tokens.denylist.clear()
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.user.refresh_from_db()
+        self.assertIsNotNone(self.user.tokens_valid_after)
+
+    def test_deactivation_revokes_signed_tokens(self):
+        self.login()
+        self.user.is_active = False
+        self.user.save()
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_change_revokes_signed_tokens(self):
+        self.login()
+
+        res = self.client.patch(ME_URL, {'password': 'new-password'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        res = self.client.get(RECIPES_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        res = self.client.post(TOKEN_URL, {
+            'email': 'user@example.com',
+            'password': 'new-password',
+        })
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Token {res.data["token"]}'
+        )
+        res = self.client.get(RECIPES_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+
+class SignedTokenSchemaTests(SimpleTestCase):
+    """ test the schema declares the signed tokens """
+    def test_security_scheme(self):
+        schema = SchemaGenerator().get_schema(request=None, public=True)
+
+        scheme = schema['components']['securitySchemes']['signedTokenAuth']
+        self.assertEqual(scheme['name'], 'Authorization')
+        self.assertIn(
+            {'signedTokenAuth': []},
+            schema['paths'][RECIPES_URL]['get']['security']
+        )
@@ -0,0 +1,244 @@
+"""
+Stateless signed auth tokens , HMAC-SHA256 with expiry and key rotation
+"""
+import math
+import secrets
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.signing import b64_encode
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+DEFAULT_SIGNED_TOKENS = {
+    # the token endpoint issues signed tokens instead of database tokens
+    'ENABLED': False,
+    # [(key id, secret)] , the first signs and all of them verify , empty
+    # signs with SECRET_KEY
+    'KEYS': [],
+    'TTL': 3600,
+    # alias in CACHES holding the revocation time of the users , has to be
+    # shared by every process , with a process local cache every verify
+    # reads the user row unless LOCAL_REVOCATIONS says the deployment
+    # runs a single process
+    'REVOCATION_CACHE': 'default',
+    'LOCAL_REVOCATIONS': False,
+    'KEY_PREFIX': 'tokens-valid-after:',
+}
+VERSION = 's1'
+KEY_SALT = 'core.tokens'
+
+SignedToken = namedtuple(
+    'SignedToken',
+    ['key_id', 'user_id', 'issued_at', 'expires_at', 'token_id']
+)
+
+
+class InvalidToken(Exception):
+    pass
+
+
+def get_signed_tokens_config():
+    return {**DEFAULT_SIGNED_TOKENS, **getattr(settings, 'SIGNED_TOKENS', {})}
+
+
+def get_keys():
+    return get_signed_tokens_config()['KEYS'] or [
+        ('default', settings.SECRET_KEY)
+    ]
+
+
+def sign(secret, payload):
+    return b64_encode(salted_hmac(
+        KEY_SALT, payload, secret=secret, algorithm='sha256'
+    ).digest()).decode()
+
+
+def is_signed_token(key):
+    return key.startswith(VERSION + '.')
+
+
+def issue_token(user_id, now=None):
+    """ return a signed token for the user , valid for TTL seconds """
+    now = now or time.time()
+    key_id, secret = get_keys()[0]
+    payload = '.'.join([
+        VERSION,
+        key_id,
+        str(user_id),
+        # milliseconds , a login right after a revocation is not revoked
+        str(int(now * 1000)),
+        str(int(now) + get_signed_tokens_config()['TTL']),
+        secrets.token_hex(8),
+    ])
+    return f'{payload}.{sign(secret, payload)}'
+
+
+def verify_token(key, now=None, lookup=True):
+    """
+    return the SignedToken of a key , raises InvalidToken , with lookup
+    False None when checking the revocations needs the database
+    """
+    payload, _, signature = key.rpartition('.')
+    parts = payload.split('.')
+    if len(parts) != 6 or parts[0] != VERSION:
+        raise InvalidToken('malformed token')
+    secret = dict(get_keys()).get(parts[1])
+    if secret is None:
+        raise InvalidToken('unknown signing key')
+    if not constant_time_compare(sign(secret, payload), signature):
+        raise InvalidToken('bad signature')
+    try:
+        token = SignedToken(
+            parts[1],
+            int(parts[2]),
+            int(parts[3]) / 1000,
+            int(parts[4]),
+            parts[5]
+        )
+    except ValueError:
+        raise InvalidToken('malformed token')
+    if token.expires_at <= (now or time.time()):
+        raise InvalidToken('token expired')
+    if denylist.is_revoked(token):
+        raise InvalidToken('token revoked')
+    valid_after = get_tokens_valid_after(token.user_id, lookup)
+    if valid_after is None:
+        return None
+    if token.issued_at <= valid_after:
+        raise InvalidToken('token revoked')
+    return token
+
+
+def get_revocation_cache():
+    return caches[get_signed_tokens_config()['REVOCATION_CACHE']]
+
+
+def revocations_are_shared():
+    """
+    whether a revocation cached by one process is seen by the others , a
+    revocation only the revoking process sees lets the others accept the
+    revoked tokens
+    """
+    cache = get_revocation_cache()
+    if isinstance(cache, DummyCache):
+        return False
+    return get_signed_tokens_config()['LOCAL_REVOCATIONS'] or \
+        not isinstance(cache, LocMemCache)
+
+
+def get_tokens_valid_after(user_id, lookup=True):
+    """
+    return the time tokens of the user have to be issued after , 0 when
+    never revoked , with lookup False None when that needs the database
+    """
+    config = get_signed_tokens_config()
+    shared = revocations_are_shared()
+    if shared:
+        valid_after = get_revocation_cache().get(
+            config['KEY_PREFIX'] + str(user_id)
+        )
+        if valid_after is not None:
+            return valid_after
+    if not lookup:
+        return None
+    # the primary , a replica may not have the revocation yet
+    rows = list(get_user_model().objects.using(DEFAULT_DB_ALIAS).filter(
+        pk=user_id
+    ).values_list('tokens_valid_after', flat=True))
+    if not rows:
+        # a deleted user has no valid tokens
+        valid_after = math.inf
+    else:
+        valid_after = rows[0].timestamp() if rows[0] else 0
+    if shared:
+        # add , a revocation stored meanwhile wins over the row read
+        get_revocation_cache().add(
+            config['KEY_PREFIX'] + str(user_id), valid_after, config['TTL']
+        )
+    return valid_after
+
+
+def revoke_user(user_id, now=None):
+    """
+    revoke every token of the user issued until now in every process , the
+    user row keeps the time and the revocation cache holds it for the
+    verifies
+    """
+    now = now or time.time()
+    get_user_model().objects.filter(pk=user_id).update(
+        tokens_valid_after=datetime.fromtimestamp(now, timezone.utc)
+    )
+    if revocations_are_shared():
+        config = get_signed_tokens_config()
+        # the tokens it revokes expire within TTL
+        get_revocation_cache().set(
+            config['KEY_PREFIX'] + str(user_id), now, config['TTL']
+        )
+    denylist.revoke_user(user_id, now)
+
+
+class Denylist:
+    """
+    revoked signed tokens of this process , in front of the revocations
+    of revoke_user shared by every process , an entry is kept only until
+    the tokens it revokes expire , so it stays as small as the revocations
+    of the last TTL
+    """
+    def __init__(self):
+        # token id -> expires at
+        self._tokens = {}
+        # user id -> (revoked at , expires at) , revokes older tokens
+        self._users = {}
+        self._lock = threading.Lock()
+
+    def revoke_token(self, token):
+        with self._lock:
+            self._purge()
+            self._tokens[token.token_id] = token.expires_at
+
+    def revoke_user(self, user_id, now=None):
+        """ revoke every token of the user issued until now """
+        now = now or time.time()
+        with self._lock:
+            self._purge()
+            self._users[user_id] = (
+                now, now + get_signed_tokens_config()['TTL']
+            )
+
+    def is_revoked(self, token):
+        if token.token_id in self._tokens:
+            return True
+        revoked = self._users.get(token.user_id)
+        return revoked is not None and token.issued_at <= revoked[0]
+
+    def _purge(self):
+        now = time.time()
+        self._tokens = {
+            token_id: expires_at
+            for token_id, expires_at in self._tokens.items()
+            if expires_at > now
+        }
+        self._users = {
+            user_id: revoked
+            for user_id, revoked in self._users.items()
+            if revoked[1] > now
+        }
+
+    def clear(self):
+        with self._lock:
+            self._tokens = {}
+            self._users = {}
+
+    def __len__(self):
+        return len(self._tokens) + len(self._users)
+
+
+denylist = Denylist()
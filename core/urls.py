@@ -0,0 +1,13 @@
+from django.urls import path, include
+from rest_framework.routers import SimpleRouter
+from core import views
+
+app_name = 'core'
+
+router = SimpleRouter()
+router.register('jobs', views.JobViewSet)
+
+urlpatterns = [
+    path('batch/', views.BatchView.as_view(), name='batch'),
+    path('', include(router.urls))
+]
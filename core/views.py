@@ -0,0 +1,72 @@
+"""
+Views for the operators of the api , the job status and the batch requests
+"""
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema
+from rest_framework import authentication, generics, permissions, viewsets
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from core.authentication import (
+    CachedTokenAuthentication,
+    SignedTokenAuthentication,
+)
+from core import batch
+from core.metrics import registry
+from core.models import Job
+from core.serializers import (
+    BatchResultSerializer,
+    BatchSerializer,
+    JobSerializer,
+)
+
+
+class MetricsView(APIView):
+    """ per view histograms recorded by the request metrics middleware """
+    authentication_classes = [
+        authentication.SessionAuthentication,
+        CachedTokenAuthentication,
+    ]
+    permission_classes = [permissions.IsAdminUser]
+
+    @extend_schema(responses=OpenApiTypes.OBJECT)
+    def get(self, request):
+        return Response(registry.snapshot())
+
+
+class JobViewSet(viewsets.ReadOnlyModelViewSet):
+    """ the jobs queued for the user , poll a job until it finishes """
+    serializer_class = JobSerializer
+    queryset = Job.objects.all()
+    authentication_classes = [
+        SignedTokenAuthentication,
+        CachedTokenAuthentication,
+    ]
+    permission_classes = [permissions.IsAuthenticated]
+    ordering = '-id'
+
+    def get_queryset(self):
+        return self.queryset.filter(user=self.request.user)
+
+
+class BatchView(generics.GenericAPIView):
+    """
+    run several api requests in one round trip , they are authenticated
+    once and answered together in the order they were sent , every
+    sub-request answers on its own so a failing one does not fail the
+    others , consecutive GET requests run at the same time
+    """
+    serializer_class = BatchSerializer
+    authentication_classes = [
+        SignedTokenAuthentication,
+        CachedTokenAuthentication,
+    ]
+    permission_classes = [permissions.IsAuthenticated]
+
+    @extend_schema(responses=BatchResultSerializer)
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response({'responses': batch.run_batch(
+            request, serializer.validated_data['requests']
+        )})
@@ -0,0 +1,37 @@
+"""
+Chunked deletes of recipe data , they skip the python side collector and
+the signals , so the data version and the stats are updated here
+"""
+from core.deletion import delete_in_chunks
+from recipe import stats
+from recipe.models import Recipe, Tag
+from recipe.versioning import bump_version
+
+
+def delete_user_data(user_id, progress=None):
+    """
+    delete the recipes and tags of a user , the m2m rows first ,
+    progress(deleted) is called after every chunk with the rows deleted
+    so far
+    """
+    through = Recipe.tags.through
+    deleted = 0
+    for queryset in [
+        through.objects.filter(recipe__user_id=user_id),
+        through.objects.filter(tag__user_id=user_id),
+        Recipe.objects.filter(user_id=user_id),
+        Tag.objects.filter(user_id=user_id),
+    ]:
+        deleted += delete_in_chunks(queryset, progress=(
+            None if progress is None
+            else lambda count, before=deleted: progress(before + count)
+        ))
+    stats.invalidate(user_id)
+    bump_version(user_id)
+
+
+def delete_tag(tag):
+    """ unlink the recipes of a tag in chunks , then delete the tag """
+    delete_in_chunks(Recipe.tags.through.objects.filter(tag_id=tag.id))
+    # sends the signals bumping the version and counting the tag
+    tag.delete()
@@ -0,0 +1,55 @@
+"""
+Job handlers of the recipe app , see core.jobs
+"""
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from core import jobs
+from recipe import serializers
+from recipe.stats import rebuild_all_stats
+
+
+@jobs.register('recipe.bulk_import')
+def bulk_import(job):
+    """
+    create the recipes of the payload chunk by chunk , the progress is
+    saved with each chunk so a retry resumes after the last one written
+    """
+    if job.user_id is None:
+        raise jobs.JobError('the user was deleted')
+    rows = job.payload['rows']
+    chunk_size = job.payload['chunk_size']
+    created = job.progress
+    job.set_progress(created, len(rows))
+    remaining = iter(rows[created:])
+    while True:
+        chunk = list(islice(remaining, chunk_size))
+        if not chunk:
+            break
+        serializer = serializers.RecipeDetailSerializer(data=chunk, many=True)
+        if not serializer.is_valid():
+            raise jobs.JobError('invalid recipes', result={
+                'created': created,
+                'errors': serializer.errors,
+            })
+        with transaction.atomic():
+            serializer.save(user_id=job.user_id)
+            created += len(chunk)
+            job.set_progress(created)
+    return {'created': created}
+
+
+@jobs.register('recipe.rebuild_stats')
+def rebuild_stats(job):
+    user_ids = job.payload.get('user_ids')
+    job.set_progress(0, len(user_ids) if user_ids else (
+        get_user_model().objects.count()
+    ))
+    rebuilt = rebuild_all_stats(
+        user_ids,
+        job.payload.get('batch_size', 500),
+        progress=job.set_progress,
+    )
+    return {'rebuilt': rebuilt}
@@ -0,0 +1,101 @@
+"""
+Django command comparing the renderers of the recipe list
+"""
+import time
+import tracemalloc
+from unittest.mock import patch
+
+import msgpack
+import orjson
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from recipe.management.commands.bench_serializers import (
+    Command as BenchSerializers,
+)
+from recipe.views import RecipeViewSet
+
+
+class Command(BaseCommand):
+    help = (
+        'download every recipe of generated data with each renderer , '
+        'page by page or as one ndjson stream , reports the throughput and '
+        'the peak memory allocated , everything is rolled back afterwards'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument('--tags', type=int, default=5)
+        parser.add_argument('--page-size', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=3)
+        parser.add_argument('--host', default='localhost',
+                            help='host header , must be in ALLOWED_HOSTS')
+
+    def handle(self, *args, **options):
+        self.page_size = options['page_size']
+        cases = [
+            ('drf json', 'application/json', orjson.loads, [JSONRenderer]),
+            ('orjson', 'application/json', orjson.loads, None),
+            ('msgpack', 'application/msgpack', msgpack.unpackb, None),
+            ('ndjson stream', 'application/x-ndjson', None, None),
+        ]
+        with transaction.atomic(), \
+                override_settings(RESPONSE_CACHE={'ENABLED': False}):
+            user = BenchSerializers().seed(options['recipes'], options['tags'])
+            self.client = APIClient(HTTP_HOST=options['host'])
+            self.client.force_authenticate(user)
+            for name, media_type, loads, renderer_classes in cases:
+                with patch.object(
+                    RecipeViewSet,
+                    'renderer_classes',
+                    renderer_classes or RecipeViewSet.renderer_classes
+                ):
+                    self.report(name, options['repeat'], lambda: self.fetch(
+                        media_type, loads
+                    ))
+            transaction.set_rollback(True)
+
+    def report(self, name, repeat, func):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            rows, size = func()
+            timings.append(time.perf_counter() - start)
+        seconds = min(timings)
+        # traced separately , tracing slows everything down
+        tracemalloc.start()
+        try:
+            func()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.stdout.write(
+            f'{name:<14}: {rows / seconds:>9.0f} rows/s '
+            f'{size / seconds / 2 ** 20:>7.1f} MB/s '
+            f'{size / rows:>5.0f} bytes/row '
+            f'peak {peak / 2 ** 20:.1f} MB'
+        )
+
+    def fetch(self, media_type, loads):
+        """ download every recipe , returns (rows, bytes) """
+        url = reverse('recipe:recipe-list')
+        if loads is None:
+            res = self.client.get(url, HTTP_ACCEPT=media_type)
+            rows = size = 0
+            for part in res.streaming_content:
+                rows += part.count(b'\n')
+                size += len(part)
+            return rows, size
+        rows = size = 0
+        url = f'{url}?page_size={self.page_size}'
+        while url:
+            res = self.client.get(url, HTTP_ACCEPT=media_type)
+            page = loads(res.content)
+            rows += len(page['results'])
+            size += len(res.content)
+            url = page['next']
+        return rows, size
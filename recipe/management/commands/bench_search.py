@@ -0,0 +1,109 @@
+"""
+Django command timing the recipe search as the data set grows
+"""
+import random
+import statistics
+import time
+import uuid
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from recipe.models import Recipe
+from recipe.search import search_recipes
+from recipe.serializers import RecipeValuesSerializer
+
+WORDS = [
+    'apple', 'basil', 'bean', 'beef', 'bread', 'butter', 'cake', 'carrot',
+    'cheese', 'chicken', 'chili', 'chocolate', 'coconut', 'corn', 'cream',
+    'curry', 'egg', 'fish', 'garlic', 'ginger', 'honey', 'lamb', 'lemon',
+    'lentil', 'mango', 'mushroom', 'noodle', 'onion', 'pasta', 'pea',
+    'pepper', 'pie', 'pork', 'potato', 'rice', 'salad', 'salmon', 'soup',
+    'spinach', 'stew', 'tart', 'tofu', 'tomato', 'vanilla', 'walnut',
+]
+# found in the same number of recipes at every size
+RARE_WORD = 'saffron'
+
+
+class Command(BaseCommand):
+    help = (
+        'time a ranked search page on a growing generated data set , '
+        'everything is rolled back afterwards'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            default='10000,100000',
+            help='comma separated recipe counts , eg 10000,100000,1000000',
+        )
+        parser.add_argument('--matches', type=int, default=50)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--page-size', type=int, default=100)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('the search benchmark needs postgres')
+        sizes = sorted(int(size) for size in options['sizes'].split(','))
+        rng = random.Random(0)
+
+        with transaction.atomic():
+            user = get_user_model().objects.create_user(
+                email=f'bench-{uuid.uuid4().hex}@example.com'
+            )
+            total = 0
+            self.stdout.write('recipes      search ms')
+            for size in sizes:
+                # the matches are all seeded with the first size
+                matches = 0 if total else options['matches']
+                self.seed(user, size - total, matches, rng)
+                total = size
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE recipe_recipe')
+                timing = self.median_of(
+                    options['repeat'],
+                    lambda: self.search_page(user, options['page_size'])
+                )
+                self.stdout.write(f'{size:>10}   {timing * 1000:>9.2f}')
+            transaction.set_rollback(True)
+
+    def seed(self, user, count, matches, rng):
+        """ add count recipes , matches of them mention the rare word """
+        rare = set(rng.sample(range(count), min(matches, count)))
+        batch = []
+        for i in range(count):
+            words = rng.sample(WORDS, 6)
+            if i in rare:
+                words[0] = RARE_WORD
+            batch.append(Recipe(
+                user=user,
+                title=' '.join(words[:3]),
+                description=' '.join(words[3:]),
+                time_minutes=rng.randint(1, 240),
+                price=Decimal(rng.randint(100, 9999)) / 100,
+            ))
+            if len(batch) == 10000:
+                Recipe.objects.bulk_create(batch)
+                batch = []
+        Recipe.objects.bulk_create(batch)
+
+    @staticmethod
+    def search_page(user, page_size):
+        queryset = search_recipes(
+            Recipe.objects.filter(user=user),
+            RARE_WORD
+        ).order_by('-rank', '-id')
+        fields = [*RecipeValuesSerializer.value_fields(), 'rank']
+        rows = list(queryset.values(*fields)[:page_size])
+        return RecipeValuesSerializer(rows, many=True).data
+
+    @staticmethod
+    def median_of(repeat, func):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        return statistics.median(timings)
@@ -0,0 +1,95 @@
+"""
+Django command comparing the model and the values recipe serializers
+"""
+import time
+import uuid
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipe.models import Recipe, Tag
+from recipe.serializers import (
+    RecipeSerializer,
+    RecipeValuesSerializer,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'time the recipe list serialization on generated data , '
+        'everything is rolled back afterwards'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=1000)
+        parser.add_argument('--tags', type=int, default=5)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            user = self.seed(options['recipes'], options['tags'])
+            recipes = Recipe.objects.filter(user=user).order_by('-id')
+
+            model_time = self.best_of(
+                options['repeat'],
+                lambda: RecipeSerializer(
+                    recipes.prefetch_related('tags'),
+                    many=True
+                ).data
+            )
+            values_time = self.best_of(
+                options['repeat'],
+                lambda: RecipeValuesSerializer(
+                    recipes.values(*RecipeValuesSerializer.value_fields()),
+                    many=True
+                ).data
+            )
+            transaction.set_rollback(True)
+
+        self.stdout.write(f'model serializer  : {model_time * 1000:.1f} ms')
+        self.stdout.write(f'values serializer : {values_time * 1000:.1f} ms')
+        self.stdout.write(self.style.SUCCESS(
+            f'speedup x{model_time / values_time:.1f}'
+        ))
+
+    def seed(self, recipe_count, tag_count):
+        user = get_user_model().objects.create_user(
+            email=f'bench-{uuid.uuid4().hex}@example.com'
+        )
+        Tag.objects.bulk_create([
+            Tag(user=user, name=f'Tag {i}') for i in range(tag_count)
+        ])
+        Recipe.objects.bulk_create([
+            Recipe(
+                user=user,
+                title=f'Recipe {i}',
+                time_minutes=i % 120,
+                price=Decimal(i % 10000) / 100,
+                description='description ' * 20,
+                link=f'https://example.com/{i}',
+            )
+            for i in range(recipe_count)
+        ])
+        tag_ids = list(
+            Tag.objects.filter(user=user).values_list('id', flat=True)
+        )
+        through = Recipe.tags.through
+        through.objects.bulk_create([
+            through(recipe_id=recipe_id, tag_id=tag_id)
+            for recipe_id in Recipe.objects.filter(
+                user=user
+            ).values_list('id', flat=True)
+            for tag_id in tag_ids
+        ])
+        return user
+
+    @staticmethod
+    def best_of(repeat, func):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
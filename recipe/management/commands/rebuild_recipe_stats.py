@@ -0,0 +1,33 @@
+"""
+Django command recomputing the per user recipe aggregates from scratch
+"""
+from django.core.management.base import BaseCommand
+
+from core import jobs
+from recipe.stats import rebuild_all_stats
+
+
+class Command(BaseCommand):
+    help = (
+        'recompute the recipe stats of the given users or of every user , '
+        'each batch of users is replaced in its own transaction'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('user_ids', nargs='*', type=int)
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='users recomputed per transaction')
+        parser.add_argument('--background', action='store_true',
+                            help='queue a job for the run_jobs workers')
+
+    def handle(self, *args, **options):
+        user_ids = options['user_ids'] or None
+        if options['background']:
+            job = jobs.enqueue('recipe.rebuild_stats', {
+                'user_ids': user_ids,
+                'batch_size': options['batch_size'],
+            })
+            self.stdout.write(f'queued job {job.pk}')
+            return
+        rebuilt = rebuild_all_stats(user_ids, options['batch_size'])
+        self.stdout.write(f'rebuilt the stats of {rebuilt} users')
@@ -0,0 +1,54 @@
+# Generated by Django 3.2.25 on 2026-10-18 19:48
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def merge_duplicate_tags(apps, schema_editor):
+    """ merge tags sharing a user and name into the oldest one """
+    Tag = apps.get_model('recipe', 'Tag')
+    Through = apps.get_model('recipe', 'Recipe').tags.through
+    duplicates = Tag.objects.values('user_id', 'name').annotate(
+        keep_id=Min('id'),
+        total=Count('id'),
+    ).filter(total__gt=1)
+    for duplicate in duplicates:
+        keep_id = duplicate['keep_id']
+        drop_ids = list(Tag.objects.filter(
+            user_id=duplicate['user_id'],
+            name=duplicate['name'],
+        ).exclude(id=keep_id).values_list('id', flat=True))
+        tagged = set(Through.objects.filter(
+            tag_id=keep_id,
+        ).values_list('recipe_id', flat=True))
+        moved = set(Through.objects.filter(
+            tag_id__in=drop_ids,
+        ).values_list('recipe_id', flat=True)) - tagged
+        Through.objects.bulk_create([
+            Through(recipe_id=recipe_id, tag_id=keep_id)
+            for recipe_id in moved
+        ])
+        Tag.objects.filter(id__in=drop_ids).delete()
+    if schema_editor.connection.vendor == 'postgresql':
+        # the deletes leave deferred foreign key checks pending , postgres
+        # refuses to alter recipe_tag for the constraint until they ran
+        schema_editor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0002_auto_20240720_1039'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['user', '-id'], name='recipe_user_id_desc_idx'),
+        ),
+        migrations.RunPython(merge_duplicate_tags, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='tag',
+            constraint=models.UniqueConstraint(fields=('user', 'name'), name='unique_user_tag_name'),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 3.2.25 on 2026-10-18 20:04
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+CREATE_SEARCH_SQL = [
+    """
+    CREATE FUNCTION recipe_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('pg_catalog.english',
+                                  coalesce(NEW.title, '')), 'A') ||
+            setweight(to_tsvector('pg_catalog.english',
+                                  coalesce(NEW.description, '')), 'B');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER recipe_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF title, description ON recipe_recipe
+    FOR EACH ROW EXECUTE FUNCTION recipe_search_vector_update()
+    """,
+    'UPDATE recipe_recipe SET title = title',
+    """
+    CREATE INDEX recipe_search_vector_idx
+    ON recipe_recipe USING gin (search_vector)
+    """,
+]
+
+DROP_SEARCH_SQL = [
+    'DROP INDEX IF EXISTS recipe_search_vector_idx',
+    'DROP TRIGGER IF EXISTS recipe_search_vector_trigger ON recipe_recipe',
+    'DROP FUNCTION IF EXISTS recipe_search_vector_update()',
+]
+
+
+def run_on_postgres(statements):
+    """ the search vector is only maintained on postgres """
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0006_drop_redundant_user_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(
+            run_on_postgres(CREATE_SEARCH_SQL),
+            run_on_postgres(DROP_SEARCH_SQL),
+        ),
+    ]
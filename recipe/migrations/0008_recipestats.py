@@ -0,0 +1,31 @@
+# Generated by Django 3.2.25 on 2026-10-18 21:13
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0001_initial'),
+        ('recipe', '0007_recipe_search_vector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='user.user')),
+                ('recipe_count', models.BigIntegerField(default=0)),
+                ('tag_count', models.BigIntegerField(default=0)),
+                ('time_minutes_total', models.BigIntegerField(default=0)),
+                ('price_total', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('price_under_5', models.BigIntegerField(default=0)),
+                ('price_under_10', models.BigIntegerField(default=0)),
+                ('price_under_20', models.BigIntegerField(default=0)),
+                ('price_under_50', models.BigIntegerField(default=0)),
+                ('price_under_100', models.BigIntegerField(default=0)),
+                ('price_100_and_over', models.BigIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -1,11 +1,17 @@
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from django.conf import settings
 
+# upper bounds of the price buckets of RecipeStats , the last is open
+PRICE_BUCKETS = (5, 10, 20, 50, 100)
+
 
 class Recipe(models.Model):
+    # indexed by the (user, ...) composite indexes below
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
-        on_delete=models.CASCADE
+        on_delete=models.CASCADE,
+        db_index=False
     )
     title = models.CharField(max_length=255)
     description = models.TextField(blank=True)
@@ -13,6 +19,34 @@ class Recipe(models.Model):
     price = models.DecimalField(max_digits=5, decimal_places=2)
     link = models.CharField(max_length=255, blank=True)
     tags = models.ManyToManyField('Tag')
+    # weighted title and description , maintained by a database trigger
+    # on postgres , see migration 0007
+    search_vector = SearchVectorField(null=True, editable=False)
+    # bumped by every update , clients send it back in If-Match
+    version = models.PositiveIntegerField(default=1, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['user', '-id'],
+                name='recipe_user_id_desc_idx'
+            ),
+            models.Index(
+                fields=['user', 'time_minutes'],
+                name='recipe_user_time_idx'
+            ),
+            models.Index(
+                fields=['user', 'price'],
+                name='recipe_user_price_idx'
+            ),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # the stats apply the difference to these on save
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
 
     def __str__(self):
         return self.title
@@ -20,11 +54,80 @@ class Recipe(models.Model):
 
 class Tag(models.Model):
     """ tags for filtering recipes """
+    # indexed by the unique (user, name) constraint below
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
-        on_delete=models.CASCADE
+        on_delete=models.CASCADE,
+        db_index=False
     )
     name = models.CharField(max_length=255)
 
+    class Meta:
+        # the unique index also serves the (user, name) lookups and ordering
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'name'],
+                name='unique_user_tag_name'
+            ),
+        ]
+
     def __str__(self):
         return self.name
+
+
+class DataVersion(models.Model):
+    """ per user counter bumped on every recipe or tag write """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True
+    )
+    version = models.PositiveBigIntegerField(default=0)
+    modified = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.user_id}:{self.version}'
+
+
+class RecipeStats(models.Model):
+    """
+    per user aggregates of the recipes and tags , kept up to date on every
+    write , see recipe.stats
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True
+    )
+    recipe_count = models.BigIntegerField(default=0)
+    tag_count = models.BigIntegerField(default=0)
+    time_minutes_total = models.BigIntegerField(default=0)
+    price_total = models.DecimalField(
+        max_digits=20,
+        decimal_places=2,
+        default=0
+    )
+    # recipes per price bucket , see PRICE_BUCKETS
+    price_under_5 = models.BigIntegerField(default=0)
+    price_under_10 = models.BigIntegerField(default=0)
+    price_under_20 = models.BigIntegerField(default=0)
+    price_under_50 = models.BigIntegerField(default=0)
+    price_under_100 = models.BigIntegerField(default=0)
+    price_100_and_over = models.BigIntegerField(default=0)
+
+    @staticmethod
+    def price_bucket_fields():
+        return [f'price_under_{bound}' for bound in PRICE_BUCKETS] + [
+            f'price_{PRICE_BUCKETS[-1]}_and_over'
+        ]
+
+    @classmethod
+    def price_bucket_field(cls, price):
+        """ the bucket field counting a price """
+        for bound, field in zip(PRICE_BUCKETS, cls.price_bucket_fields()):
+            if price < bound:
+                return field
+        return cls.price_bucket_fields()[-1]
+
+    def __str__(self):
+        return f'{self.user_id}:{self.recipe_count}'
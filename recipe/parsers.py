@@ -0,0 +1,37 @@
+import json
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+
+class NDJSONRows:
+    """ the rows of an ndjson body , parsed as they are iterated """
+    def __init__(self, stream, encoding):
+        self.stream = stream
+        self.encoding = encoding
+
+    def __iter__(self):
+        for number, line in enumerate(self.stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line.decode(self.encoding))
+            except ValueError as exc:
+                raise ParseError(
+                    f'NDJSON parse error on line {number} - {exc}'
+                )
+
+
+class NDJSONParser(BaseParser):
+    """
+    parses newline delimited json , rows are yielded lazily so large
+    uploads are never held in memory all at once
+    """
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        return NDJSONRows(stream, encoding)
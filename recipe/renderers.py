@@ -0,0 +1,74 @@
+import msgpack
+import orjson
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+# what the standard encoder does not know , decimals , lazy strings , ...
+_encode_default = JSONEncoder().default
+# datetimes are formatted by the default like JSONRenderer does
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+
+class NDJSONRenderer(BaseRenderer):
+    """ renders a list of rows as newline delimited json """
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if not isinstance(data, list):
+            data = [data]
+        return b''.join(self.render_row(row) for row in data)
+
+    @staticmethod
+    def render_row(row):
+        """ render a single row terminated by a newline """
+        return orjson.dumps(
+            row,
+            default=_encode_default,
+            option=ORJSON_OPTIONS | orjson.OPT_APPEND_NEWLINE,
+        )
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    the output of JSONRenderer encoded by orjson , several times faster ,
+    indented output is left to JSONRenderer
+    """
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(
+                data, accepted_media_type, renderer_context
+            )
+        ret = orjson.dumps(
+            data,
+            default=_encode_default,
+            option=ORJSON_OPTIONS,
+        )
+        # escaped like JSONRenderer does , the output may be embedded in js
+        return ret.replace(
+            '\u2028'.encode(), b'\\u2028'
+        ).replace(
+            '\u2029'.encode(), b'\\u2029'
+        )
+
+
+class MessagePackRenderer(BaseRenderer):
+    """ renders MessagePack , smaller than json and as fast to decode """
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(
+            data,
+            default=_encode_default,
+            use_bin_type=True,
+        )
@@ -0,0 +1,38 @@
+"""
+Full text search over recipe titles and descriptions
+"""
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connections
+from django.db.models import F, FloatField, Q
+from django.db.models.functions import Cast
+
+SEARCH_CONFIG = 'english'
+
+
+def search_is_ranked(queryset):
+    """ postgres ranks the matches , other backends fall back to LIKE """
+    return connections[queryset.db].vendor == 'postgresql'
+
+
+def search_recipes(queryset, text):
+    """
+    filter the recipes matching text , on postgres through the gin indexed
+    search vector with a rank annotation , elsewhere every word has to be
+    found in the title or the description
+    """
+    if search_is_ranked(queryset):
+        query = SearchQuery(
+            text,
+            config=SEARCH_CONFIG,
+            search_type='websearch'
+        )
+        # ts_rank is a real , as a double it round trips exactly through
+        # the cursor so the keyset pagination sees consistent positions
+        return queryset.filter(search_vector=query).annotate(
+            rank=Cast(SearchRank(F('search_vector'), query), FloatField())
+        )
+    for word in text.split():
+        queryset = queryset.filter(
+            Q(title__icontains=word) | Q(description__icontains=word)
+        )
+    return queryset
@@ -1,16 +1,100 @@
-from rest_framework import serializers
-from recipe.models import Recipe, Tag
+from django.db import connections, router, transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework import serializers, status
+from rest_framework.exceptions import APIException
+from core.serializers import (
+    TimedDataMixin,
+    TimedListSerializer,
+    ValuesSerializer,
+)
+from recipe import stats
+from recipe.models import PRICE_BUCKETS, Recipe, RecipeStats, Tag
+from recipe.versioning import bump_version
 
 
-class TagSerializer(serializers.ModelSerializer):
+class VersionConflict(APIException):
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = _('The recipe was changed since this version was read.')
+    default_code = 'version_conflict'
+
+
+def get_or_create_tags(user_id, names):
+    """
+    resolve tag names for a user in bulk , one query for the existing
+    tags and one upsert for the missing ones , returns name -> tag
+    """
+    names = list(dict.fromkeys(names))
+    if not names:
+        return {}
+    tags = {
+        tag.name: tag
+        for tag in Tag.objects.filter(user_id=user_id, name__in=names)
+    }
+    missing = [
+        Tag(user_id=user_id, name=name) for name in names if name not in tags
+    ]
+    if missing:
+        # tags created concurrently are skipped by the unique constraint
+        # and picked up by the select that follows
+        Tag.objects.bulk_create(missing, ignore_conflicts=True)
+        created = {
+            tag.name: tag for tag in Tag.objects.filter(
+                user_id=user_id,
+                name__in=[tag.name for tag in missing],
+            )
+        }
+        tags.update(created)
+        # bulk inserts send no signals , the tags created concurrently are
+        # among created too , so the count is taken again
+        stats.recount_tags(user_id)
+    return tags
+
+
+class TagSerializer(TimedDataMixin, serializers.ModelSerializer):
 
     class Meta:
         model = Tag
         fields = ['id', 'name']
         read_only_fields = ['id']
+        list_serializer_class = TimedListSerializer
+
+
+class RecipeListSerializer(TimedDataMixin, serializers.ListSerializer):
+    """ creates a batch of recipes , their tags and m2m rows in bulk """
 
+    def create(self, validated_data):
+        if not validated_data:
+            return []
+        tags_per_recipe = [attrs.pop('tags', []) for attrs in validated_data]
+        recipes = [Recipe(**attrs) for attrs in validated_data]
+        # saved with user= , the same owner for the whole batch
+        user_id = recipes[0].user_id
+        connection = connections[router.db_for_write(Recipe)]
+        if connection.features.can_return_rows_from_bulk_insert:
+            Recipe.objects.bulk_create(recipes)
+            stats.recipes_created(user_id, recipes)
+        else:
+            # without returned ids the m2m rows can not be linked
+            for recipe in recipes:
+                recipe.save()
 
-class RecipeSerializer(serializers.ModelSerializer):
+        tags = get_or_create_tags(
+            user_id,
+            [tag['name'] for recipe_tags in tags_per_recipe
+             for tag in recipe_tags],
+        )
+        through = Recipe.tags.through
+        through.objects.bulk_create([
+            through(recipe_id=recipe.id, tag_id=tags[name].id)
+            for recipe, recipe_tags in zip(recipes, tags_per_recipe)
+            for name in dict.fromkeys(tag['name'] for tag in recipe_tags)
+        ])
+        # bulk inserts send no signals
+        bump_version(user_id)
+        return recipes
+
+
+class RecipeSerializer(TimedDataMixin, serializers.ModelSerializer):
 
     tags = TagSerializer(many=True, required=False)
 
@@ -18,36 +102,132 @@ class RecipeSerializer(serializers.ModelSerializer):
         model = Recipe
         fields = ['id', 'title', 'time_minutes', 'price', 'link', 'tags']
         read_only_fields = ['id']
+        list_serializer_class = RecipeListSerializer
 
-    def __get_or_create_tags(self, tags, recipe):
-        """ handle getting or creating tags as needed """
-        auth_user = self.context['request'].user
-        for tag in tags:
-            tag_obj, created = Tag.objects.get_or_create(
-                user=auth_user,
-                **tag,
-            )
-            recipe.tags.add(tag_obj)
-        return recipe
+    def __set_tags(self, tags, recipe, replace=False):
+        """
+        attach the tags through the m2m table , diffing when replacing ,
+        returns whether the tags changed
+        """
+        tag_ids = {
+            tag.id for tag in get_or_create_tags(
+                recipe.user_id,
+                [tag['name'] for tag in tags],
+            ).values()
+        }
+        current_ids = set()
+        if replace:
+            current_ids = set(recipe.tags.values_list('id', flat=True))
+        through = Recipe.tags.through
+        removed_ids = current_ids - tag_ids
+        if removed_ids:
+            through.objects.filter(
+                recipe_id=recipe.id,
+                tag_id__in=removed_ids,
+            ).delete()
+        added_ids = tag_ids - current_ids
+        through.objects.bulk_create([
+            through(recipe_id=recipe.id, tag_id=tag_id)
+            for tag_id in added_ids
+        ])
+        if added_ids or removed_ids:
+            # bulk writes on the m2m table send no signals
+            bump_version(recipe.user_id)
+        return bool(added_ids or removed_ids)
 
     def create(self, validated_data):  # noqa
         tags = validated_data.pop('tags', [])
-        recipe = Recipe.objects.create(**validated_data)
-        self.__get_or_create_tags(tags, recipe)
+        with transaction.atomic():
+            recipe = Recipe.objects.create(**validated_data)
+            self.__set_tags(tags, recipe)
         return recipe
 
     def update(self, instance, validated_data):
+        """
+        update the recipe under a row lock , only the changed columns are
+        written and the version is bumped when anything changed , with
+        expected_versions the recipe must still be at one of them
+        """
+        expected_versions = validated_data.pop('expected_versions', None)
         tags = validated_data.pop('tags', None)
-        if tags is not None:
-            instance.tags.clear()
-            self.__get_or_create_tags(tags, instance)
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
-        instance.save()
-        return instance
+        with transaction.atomic():
+            # concurrent updates of the recipe wait here
+            recipe = Recipe.objects.select_for_update().get(pk=instance.pk)
+            if expected_versions is not None and \
+                    recipe.version not in expected_versions:
+                raise VersionConflict()
+            changed = [
+                attr for attr, value in validated_data.items()
+                if getattr(recipe, attr) != value
+            ]
+            for attr in changed:
+                setattr(recipe, attr, validated_data[attr])
+            tags_changed = tags is not None and \
+                self.__set_tags(tags, recipe, replace=True)
+            if changed or tags_changed:
+                # the row is locked , nobody else bumps it meanwhile
+                recipe.version += 1
+                recipe.save(update_fields=[*changed, 'version'])
+        return recipe
 
 
 class RecipeDetailSerializer(RecipeSerializer):
     """ we are extending the class above """
     class Meta(RecipeSerializer.Meta):
-        fields = RecipeSerializer.Meta.fields + ['description']
+        fields = RecipeSerializer.Meta.fields + ['description', 'version']
+        read_only_fields = ['id', 'version']
+
+
+class RecipeValuesSerializer(ValuesSerializer):
+    """ fast read only output of RecipeSerializer """
+    serializer_class = RecipeSerializer
+
+
+class RecipeDetailValuesSerializer(ValuesSerializer):
+    """ fast read only output of RecipeDetailSerializer """
+    serializer_class = RecipeDetailSerializer
+
+
+class TagValuesSerializer(ValuesSerializer):
+    """ renders tag rows for the list endpoint """
+    serializer_class = TagSerializer
+
+
+class RecipeStatsSerializer(serializers.ModelSerializer):
+    """ renders the aggregates of a user , averages are derived on read """
+    recipes = serializers.IntegerField(source='recipe_count')
+    tags = serializers.IntegerField(source='tag_count')
+    average_time_minutes = serializers.SerializerMethodField()
+    average_price = serializers.SerializerMethodField()
+    price_distribution = serializers.SerializerMethodField()
+
+    class Meta:
+        model = RecipeStats
+        fields = [
+            'recipes',
+            'tags',
+            'average_time_minutes',
+            'average_price',
+            'price_distribution',
+        ]
+        read_only_fields = fields
+
+    def get_average_time_minutes(self, stats) -> float:
+        if not stats.recipe_count:
+            return None
+        return round(stats.time_minutes_total / stats.recipe_count, 2)
+
+    def get_average_price(self, stats) -> str:
+        if not stats.recipe_count:
+            return None
+        return str(round(stats.price_total / stats.recipe_count, 2))
+
+    def get_price_distribution(self, stats) -> list:
+        """ [{min, max, count}] per price bucket , the last max is null """
+        bounds = [0, *PRICE_BUCKETS, None]
+        return [
+            {'min': low, 'max': high, 'count': getattr(stats, field)}
+            for field, low, high in zip(
+                RecipeStats.price_bucket_fields(), bounds, bounds[1:]
+            )
+        ]
@@ -0,0 +1,45 @@
+"""
+Signal handlers bumping the user data version and updating the user
+aggregates on recipe and tag writes
+"""
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from recipe import stats
+from recipe.models import Recipe, Tag
+from recipe.versioning import bump_version
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def bump_on_write(sender, instance, **kwargs):
+    bump_version(instance.user_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def bump_on_tags_changed(sender, instance, action, **kwargs):
+    if action.startswith('post_'):
+        bump_version(instance.user_id)
+
+
+@receiver(post_save, sender=Recipe)
+def update_stats_on_recipe_save(sender, instance, created, **kwargs):
+    stats.recipe_saved(instance, created)
+
+
+@receiver(post_delete, sender=Recipe)
+def update_stats_on_recipe_delete(sender, instance, **kwargs):
+    stats.apply_delta(instance.user_id, stats.recipe_delta(instance, -1))
+
+
+@receiver(post_save, sender=Tag)
+def update_stats_on_tag_save(sender, instance, created, **kwargs):
+    if created:
+        stats.apply_delta(instance.user_id, {'tag_count': 1}, inserted=True)
+
+
+@receiver(post_delete, sender=Tag)
+def update_stats_on_tag_delete(sender, instance, **kwargs):
+    stats.apply_delta(instance.user_id, {'tag_count': -1})
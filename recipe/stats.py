@@ -0,0 +1,199 @@
+"""
+Per user recipe and tag aggregates maintained incrementally on writes
+"""
+from django.contrib.auth import get_user_model
+from django.db import router, transaction
+from django.db.models import Count, F, Q, Sum
+
+from recipe.models import PRICE_BUCKETS, Recipe, RecipeStats, Tag
+
+# the recipe fields the aggregates are computed from
+STAT_FIELDS = ('user_id', 'time_minutes', 'price')
+
+
+def recipe_delta(recipe, sign=1):
+    """ the change of the aggregates when a recipe is added or removed """
+    # the attributes hold whatever was assigned , eg strings
+    time_minutes = Recipe._meta.get_field('time_minutes').to_python(
+        recipe.time_minutes
+    )
+    price = Recipe._meta.get_field('price').to_python(recipe.price)
+    return {
+        'recipe_count': sign,
+        'time_minutes_total': sign * time_minutes,
+        'price_total': sign * price,
+        RecipeStats.price_bucket_field(price): sign,
+    }
+
+
+def merge(*deltas):
+    merged = {}
+    for delta in deltas:
+        for field, value in delta.items():
+            merged[field] = merged.get(field, 0) + value
+    return {field: value for field, value in merged.items() if value}
+
+
+def lock_user(user_id, **kwargs):
+    """ lock the user row , orders the writes and the computing reads """
+    get_user_model().objects.select_for_update(**kwargs).filter(
+        pk=user_id
+    ).exists()
+
+
+def apply_delta(user_id, delta, inserted=False):
+    """
+    add delta to the aggregates of a user with one update , a missing row
+    is left missing and computed in full on the next read , inserted says
+    the write inserted rows of the user , the write is expected to be in
+    a transaction not committed yet , see get_stats
+    """
+    if not delta:
+        return
+    fields = {field: F(field) + value for field, value in delta.items()}
+    if RecipeStats.objects.filter(user_id=user_id).update(**fields) or \
+            inserted:
+        # the foreign key of an insert holds a share lock on the user row
+        return
+    with transaction.atomic(savepoint=False):
+        # a read computing the row meanwhile does not see this write , the
+        # lock waits for its row or holds it back until this write commits
+        lock_user(user_id, no_key=True)
+        RecipeStats.objects.filter(user_id=user_id).update(**fields)
+
+
+def invalidate(user_id):
+    """ drop the aggregates of a user , the next read computes them """
+    with transaction.atomic(savepoint=False):
+        # not before a read computing the row inserted it
+        lock_user(user_id, no_key=True)
+        RecipeStats.objects.filter(user_id=user_id).delete()
+
+
+def recipe_saved(recipe, created):
+    old = getattr(recipe, '_loaded_values', {})
+    if created:
+        apply_delta(recipe.user_id, recipe_delta(recipe), inserted=True)
+    elif all(field in old for field in STAT_FIELDS):
+        if old['user_id'] != recipe.user_id:
+            invalidate(old['user_id'])
+            invalidate(recipe.user_id)
+        else:
+            apply_delta(recipe.user_id, merge(
+                recipe_delta(Recipe(**old), -1),
+                recipe_delta(recipe),
+            ))
+    else:
+        # loaded with deferred fields , the old values are unknown
+        invalidate(recipe.user_id)
+    recipe._loaded_values = {
+        field: getattr(recipe, field) for field in STAT_FIELDS
+    }
+
+
+def recipes_created(user_id, recipes):
+    """ the aggregates of bulk inserted recipes , they send no signals """
+    apply_delta(
+        user_id,
+        merge(*(recipe_delta(recipe) for recipe in recipes)),
+        inserted=True
+    )
+
+
+def compute_stats(user_ids):
+    """ compute the aggregates of the users from scratch , user id -> row """
+    bounds = [0, *PRICE_BUCKETS, None]
+    buckets = {
+        field: Count('id', filter=Q(price__gte=low) & (
+            Q(price__lt=high) if high is not None else Q()
+        ))
+        for field, low, high in zip(
+            RecipeStats.price_bucket_fields(), bounds, bounds[1:]
+        )
+    }
+    rows = {
+        user_id: RecipeStats(user_id=user_id) for user_id in user_ids
+    }
+    for values in Recipe.objects.filter(user_id__in=user_ids).values(
+        'user_id'
+    ).annotate(
+        recipe_count=Count('id'),
+        time_minutes_total=Sum('time_minutes'),
+        price_total=Sum('price'),
+        **buckets
+    ).order_by():
+        for field, value in values.items():
+            setattr(rows[values['user_id']], field, value)
+    for values in Tag.objects.filter(user_id__in=user_ids).values(
+        'user_id'
+    ).annotate(tag_count=Count('id')).order_by():
+        rows[values['user_id']].tag_count = values['tag_count']
+    return rows
+
+
+def recount_tags(user_id):
+    """
+    count the tags of a user again , for bulk inserts skipping the tags
+    created concurrently , the lock on the row orders the counts so each
+    one sees the tags committed before it
+    """
+    with transaction.atomic(savepoint=False):
+        if RecipeStats.objects.select_for_update().filter(
+            user_id=user_id
+        ).exists():
+            RecipeStats.objects.filter(user_id=user_id).update(
+                tag_count=Tag.objects.filter(user_id=user_id).count()
+            )
+
+
+def get_stats(user_id):
+    """ return the aggregates of a user , one primary key lookup """
+    try:
+        return RecipeStats.objects.get(user_id=user_id)
+    except RecipeStats.DoesNotExist:
+        pass
+    with transaction.atomic(using=router.db_for_write(RecipeStats)):
+        # waits for the writes of the user in flight , the recipe and tag
+        # inserts hold a share lock on the user row and apply_delta locks
+        # it , the writes that follow wait for the row to be inserted
+        lock_user(user_id)
+        stats = RecipeStats.objects.filter(user_id=user_id).first()
+        if stats is None:
+            # computed after the lock , the writes before it are committed
+            stats = compute_stats([user_id])[user_id]
+            stats.save(force_insert=True)
+        return stats
+
+
+def rebuild_stats(user_ids):
+    """ replace the aggregates of the users with freshly computed ones """
+    with transaction.atomic():
+        rows = compute_stats(user_ids)
+        RecipeStats.objects.filter(user_id__in=user_ids).delete()
+        RecipeStats.objects.bulk_create(rows.values())
+    return rows
+
+
+def rebuild_all_stats(user_ids=None, batch_size=500, progress=None):
+    """
+    rebuild the aggregates of the users , of every user when None , each
+    batch of users in its own transaction , progress(rebuilt) is called
+    after every batch , returns the users rebuilt
+    """
+    if user_ids is None:
+        user_ids = get_user_model().objects.order_by('pk').values_list(
+            'pk', flat=True
+        ).iterator()
+    batch, rebuilt = [], 0
+    for user_id in user_ids:
+        batch.append(user_id)
+        if len(batch) == batch_size:
+            rebuilt += len(rebuild_stats(batch))
+            batch = []
+            if progress is not None:
+                progress(rebuilt)
+    if batch:
+        rebuilt += len(rebuild_stats(batch))
+        if progress is not None:
+            progress(rebuilt)
+    return rebuilt
@@ -0,0 +1,204 @@
+from decimal import Decimal
+from unittest import skipUnless
+from unittest.mock import patch
+import json
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import (
+    AsyncRequestFactory,
+    TransactionTestCase,
+    override_settings,
+)
+from django.urls import resolve, reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core import authentication, tokens
+from core.asyncdb import close_pools
+from core.async_views import async_read
+from recipe.models import Recipe, Tag
+from recipe.views import RecipeViewSet, TagViewSet
+from user.views import ManageUserView
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+ME_URL = reverse('user:me')
+
+
+def detail_url(recipe_id):
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+@skipUnless(connection.vendor == 'postgresql', 'async reads need postgres')
+class AsyncReadTests(TransactionTestCase):
+    """
+    test the async read paths against the sync views , the pool
+    connections only see committed rows so these are transaction tests
+    """
+    # the sync views may read from configured replicas
+    databases = '__all__'
+
+    def setUp(self):  # noqa
+        authentication.reset_local_cache()
+        tokens.get_revocation_cache().clear()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+            name='Test Name',
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.auth = f'Token {self.token.key}'
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=self.auth)
+        for i in range(3):
+            recipe = Recipe.objects.create(
+                user=self.user,
+                title=f'Recipe {i}',
+                time_minutes=i + 1,
+                price=Decimal('5.25'),
+                description='sample description',
+            )
+            tag = Tag.objects.create(user=self.user, name=f'Tag {i}')
+            recipe.tags.add(tag)
+        self.recipe = recipe
+        # the sync request creates the data version and caches the token
+        self.client.get(RECIPES_URL)
+
+    async def get(self, url, **headers):
+        match = resolve(url.split('?')[0])
+        view = async_read(match.func)
+        request = AsyncRequestFactory().get(
+            url, authorization=self.auth, **headers
+        )
+        try:
+            response = await view(request, *match.args, **match.kwargs)
+        finally:
+            await close_pools()
+        if hasattr(response, 'render'):
+            # the handler renders the responses of the sync views
+            response.render()
+        return response
+
+    async def test_recipe_list_matches_sync(self):
+        url = f'{RECIPES_URL}?page_size=2'
+        with patch.object(RecipeViewSet, 'list', side_effect=AssertionError):
+            res = await self.get(url)
+
+        expected = await self.sync_get(url)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(res.content), expected.json())
+        self.assertEqual(res['ETag'], expected['ETag'])
+
+    async def test_recipe_filters_match_sync(self):
+        tag = await sync_to_async(Tag.objects.get)(name='Tag 1')
+        for params in [
+            f'tags={tag.id}',
+            'max_time=2&min_price=5.00&max_price=6',
+            'search=recipe',
+        ]:
+            url = f'{RECIPES_URL}?{params}'
+            with patch.object(
+                RecipeViewSet, 'list', side_effect=AssertionError
+            ):
+                res = await self.get(url)
+
+            expected = await self.sync_get(url)
+            self.assertEqual(json.loads(res.content), expected.json())
+
+    async def test_recipe_list_not_modified(self):
+        expected = await self.sync_get(RECIPES_URL)
+        with patch.object(RecipeViewSet, 'list', side_effect=AssertionError):
+            res = await self.get(
+                RECIPES_URL, **{'if-none-match': expected['ETag']}
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    async def test_recipe_retrieve_matches_sync(self):
+        url = detail_url(self.recipe.id)
+        with patch.object(
+            RecipeViewSet, 'retrieve', side_effect=AssertionError
+        ):
+            res = await self.get(url)
+
+        expected = await self.sync_get(url)
+        self.assertEqual(json.loads(res.content), expected.json())
+        # the version of the recipe leads the etag
+        self.assertEqual(res['ETag'], expected['ETag'])
+        self.assertTrue(res['ETag'].startswith('"1-'))
+
+    async def test_tag_list_matches_sync(self):
+        with patch.object(TagViewSet, 'list', side_effect=AssertionError):
+            res = await self.get(TAGS_URL)
+
+        expected = await self.sync_get(TAGS_URL)
+        self.assertEqual(json.loads(res.content), expected.json())
+
+    async def test_me(self):
+        with patch.object(ManageUserView, 'get', side_effect=AssertionError):
+            res = await self.get(ME_URL)
+
+        self.assertEqual(json.loads(res.content), {
+            'email': 'user@example.com',
+            'name': 'Test Name',
+        })
+
+    async def test_missing_recipe_falls_back(self):
+        res = await self.get(detail_url(self.recipe.id + 100))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_invalid_params_fall_back(self):
+        res = await self.get(f'{RECIPES_URL}?tags=a,b')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    async def test_uncached_token_falls_back(self):
+        authentication.reset_local_cache()
+
+        res = await self.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(json.loads(res.content)['results']), 3)
+
+    @override_settings(SIGNED_TOKENS={'LOCAL_REVOCATIONS': True})
+    async def test_signed_token(self):
+        key = tokens.issue_token(self.user.id)
+        self.auth = f'Token {key}'
+        # the first verify caches the revocations of the user
+        await sync_to_async(tokens.verify_token)(key)
+        with patch.object(RecipeViewSet, 'list', side_effect=AssertionError):
+            res = await self.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(json.loads(res.content)['results']), 3)
+        # the user of a signed token is loaded by the sync view
+        res = await self.get(ME_URL)
+        self.assertEqual(json.loads(res.content)['name'], 'Test Name')
+
+    async def test_signed_token_without_cached_revocations(self):
+        """ test the sync view reads the revocations of the user """
+        self.auth = f'Token {tokens.issue_token(self.user.id)}'
+        with patch.object(
+            RecipeViewSet,
+            'list',
+            autospec=True,
+            side_effect=RecipeViewSet.list
+        ) as patched_list:
+            res = await self.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        patched_list.assert_called_once()
+
+    async def test_invalid_token_falls_back(self):
+        self.auth = 'Token invalid'
+
+        res = await self.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def sync_get(self, url):
+        return await sync_to_async(self.client.get)(url)
@@ -0,0 +1,72 @@
+from io import StringIO
+from unittest import skipUnless
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from recipe.models import Recipe, RecipeStats
+
+
+class CommandTests(TestCase):
+    """ test the recipe management commands """
+    def test_bench_serializers(self):
+        out = StringIO()
+
+        call_command(
+            'bench_serializers',
+            recipes=20,
+            tags=3,
+            repeat=1,
+            stdout=out
+        )
+
+        self.assertIn('speedup', out.getvalue())
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_bench_renderers(self):
+        out = StringIO()
+
+        call_command(
+            'bench_renderers',
+            recipes=20,
+            page_size=8,
+            repeat=1,
+            host='testserver',
+            stdout=out
+        )
+
+        self.assertEqual(len(out.getvalue().splitlines()), 4)
+        self.assertFalse(Recipe.objects.exists())
+
+    @skipUnless(connection.vendor == 'postgresql', 'postgres search')
+    def test_bench_search(self):
+        out = StringIO()
+
+        call_command(
+            'bench_search',
+            sizes='50,100',
+            matches=5,
+            repeat=1,
+            stdout=out
+        )
+
+        self.assertEqual(len(out.getvalue().splitlines()), 3)
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_rebuild_recipe_stats(self):
+        users = [
+            get_user_model().objects.create_user(email=f'user{i}@example.com')
+            for i in range(3)
+        ]
+        Recipe.objects.create(
+            user=users[0], title='Soup', time_minutes=5, price=10
+        )
+        out = StringIO()
+
+        call_command('rebuild_recipe_stats', batch_size=2, stdout=out)
+
+        self.assertIn('3 users', out.getvalue())
+        self.assertEqual(RecipeStats.objects.count(), 3)
+        self.assertEqual(
+            RecipeStats.objects.get(user=users[0]).price_under_20, 1
+        )
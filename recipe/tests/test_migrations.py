@@ -0,0 +1,59 @@
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TransactionTestCase
+
+BEFORE = [('recipe', '0002_auto_20240720_1039')]
+AFTER = [('recipe', '0003_recipe_tag_indexes')]
+
+
+class MergeDuplicateTagsTests(TransactionTestCase):
+    """ test the migration merging tags before making them unique """
+    def setUp(self):  # noqa
+        self.addCleanup(self.migrate, None)
+
+    def migrate(self, targets):
+        """ migrate to targets , None for the latest migrations """
+        executor = MigrationExecutor(connection)
+        if targets is None:
+            targets = executor.loader.graph.leaf_nodes()
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def test_merges_duplicate_tags(self):
+        apps = self.migrate(BEFORE)
+        User = apps.get_model('user', 'User')
+        Tag = apps.get_model('recipe', 'Tag')
+        Recipe = apps.get_model('recipe', 'Recipe')
+        user = User.objects.create(email='user@example.com')
+        other = User.objects.create(email='other@example.com')
+        kept = Tag.objects.create(user=user, name='Vegan')
+        dropped = Tag.objects.create(user=user, name='Vegan')
+        Tag.objects.create(user=other, name='Vegan')
+        first = Recipe.objects.create(
+            user=user, title='Soup', time_minutes=5, price='8.00'
+        )
+        second = Recipe.objects.create(
+            user=user, title='Stew', time_minutes=5, price='8.00'
+        )
+        first.tags.add(kept, dropped)
+        second.tags.add(dropped)
+
+        apps = self.migrate(AFTER)
+
+        Tag = apps.get_model('recipe', 'Tag')
+        Recipe = apps.get_model('recipe', 'Recipe')
+        self.assertEqual(
+            list(Tag.objects.filter(user_id=user.id).values_list(
+                'id', flat=True
+            )),
+            [kept.id]
+        )
+        self.assertEqual(Tag.objects.filter(user_id=other.id).count(), 1)
+        for recipe_id in (first.id, second.id):
+            self.assertEqual(
+                list(Recipe.objects.get(id=recipe_id).tags.values_list(
+                    'id', flat=True
+                )),
+                [kept.id]
+            )
@@ -1,4 +1,7 @@
 from decimal import Decimal
+from unittest import skipUnless
+from django.contrib.postgres.search import SearchQuery
+from django.db import IntegrityError, connection
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 from recipe.models import Recipe, Tag
@@ -32,3 +35,92 @@ class TestRecipe(TestCase):
         user = create_user()
         tag = Tag.objects.create(user=user, name='Tag1')
         self.assertEqual(str(tag), tag.name)
+
+    def test_tag_name_unique_per_user(self):
+        user = create_user()
+        other_user = create_user(email='other@example.com')
+        Tag.objects.create(user=user, name='Tag1')
+        Tag.objects.create(user=other_user, name='Tag1')
+
+        with self.assertRaises(IntegrityError):
+            Tag.objects.create(user=user, name='Tag1')
+
+    @skipUnless(connection.vendor == 'postgresql', 'postgres trigger')
+    def test_search_vector_kept_current(self):
+        user = create_user()
+        recipe = Recipe.objects.create(
+            user=user,
+            title='Lemon tart',
+            time_minutes=5,
+            price=Decimal('5.50'),
+        )
+        recipe.refresh_from_db()
+        self.assertIn('lemon', recipe.search_vector)
+
+        recipe.title = 'Apple pie'
+        recipe.save()
+        recipe.refresh_from_db()
+        self.assertIn('appl', recipe.search_vector)
+        self.assertNotIn('lemon', recipe.search_vector)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'postgres EXPLAIN output')
+class TestIndexUsage(TestCase):
+    """ test the recipe and tag list queries are served by the indexes """
+    @classmethod
+    def setUpTestData(cls):  # noqa
+        cls.user = create_user()
+        # another account makes the user filter selective
+        other_user = create_user(email='other@example.com')
+        for user, count in ((cls.user, 2000), (other_user, 10000)):
+            Recipe.objects.bulk_create([
+                Recipe(
+                    user=user,
+                    title=f'Recipe {i}',
+                    time_minutes=i % 100,
+                    price=Decimal(i % 100),
+                )
+                for i in range(count)
+            ])
+            Tag.objects.bulk_create([
+                Tag(user=user, name=f'Tag {i}') for i in range(count)
+            ])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def explain(self, queryset):
+        """ explain the query with sequential scans discouraged """
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        return queryset.explain()
+
+    def test_recipe_list_uses_index(self):
+        # sliced like a page of the list endpoint
+        plan = self.explain(
+            Recipe.objects.filter(user=self.user).order_by('-id')[:10]
+        )
+        self.assertIn('recipe_user_id_desc_idx', plan)
+        self.assertNotIn('Sort', plan)
+
+    def test_recipe_filters_use_index(self):
+        plan = self.explain(
+            Recipe.objects.filter(user=self.user, time_minutes__lte=10)
+        )
+        self.assertIn('recipe_user_time_idx', plan)
+        plan = self.explain(
+            Recipe.objects.filter(user=self.user, price__lte=Decimal('2'))
+        )
+        self.assertIn('recipe_user_price_idx', plan)
+
+    def test_search_uses_gin_index(self):
+        plan = self.explain(Recipe.objects.filter(
+            search_vector=SearchQuery('recipe', config='english')
+        ))
+        self.assertIn('recipe_search_vector_idx', plan)
+
+    def test_tag_list_uses_index(self):
+        plan = self.explain(
+            Tag.objects.filter(user=self.user).order_by('-name')[:10]
+        )
+        self.assertIn('unique_user_tag_name', plan)
+        self.assertNotIn('Sort', plan)
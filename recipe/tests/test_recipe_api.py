@@ -1,19 +1,32 @@
+import threading
+from unittest import skipUnless
+from unittest.mock import patch
 from rest_framework.test import APIClient
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase, override_settings
 from django.contrib.auth import get_user_model
 from django.urls import reverse
+from django.db import connection, connections
+from django.test.utils import CaptureQueriesContext
 from decimal import Decimal
+import json
+import msgpack
 from rest_framework import status
+from rest_framework.renderers import JSONRenderer
 from recipe.models import (
     Recipe,
     Tag
 )
+from recipe.versioning import get_version
+from recipe.views import RecipeViewSet
+from recipe.tests.utils import QueryCountMixin
 from recipe.serializers import (
     RecipeSerializer,
     RecipeDetailSerializer
 )
 
 RECIPES_URL = reverse('recipe:recipe-list')
+BULK_URL = reverse('recipe:recipe-bulk-create')
+EXPORT_URL = reverse('recipe:recipe-export')
 
 
 def detail_url(recipe_id):
@@ -39,6 +52,11 @@ def create_user(**params):
     return get_user_model().objects.create_user(**params)
 
 
+def tags_payload(count, prefix='Tag'):
+    """ build a tags payload with the given number of tags """
+    return [{'name': f'{prefix} {i}'} for i in range(count)]
+
+
 class TestPublicRecipeAPI(TestCase):
     def setUp(self):  # noqa
         self.client = APIClient()
@@ -63,7 +81,7 @@ class TestPrivateRecipeAPI(TestCase):
         serializer = RecipeSerializer(recipes, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_retrieve_recipes_limited_to_user(self):
         other_user = create_user(
@@ -79,7 +97,132 @@ class TestPrivateRecipeAPI(TestCase):
         serializer = RecipeSerializer(recipes, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
+
+    def test_recipes_keyset_pagination(self):
+        """ test deep pages are fetched by seeking , not by offset """
+        recipe_ids = [create_recipe(self.user).id for _ in range(7)]
+
+        seen = []
+        url = f'{RECIPES_URL}?page_size=2'
+        while url:
+            with CaptureQueriesContext(connection) as ctx:
+                res = self.client.get(url)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(res.data['results']), 2)
+            for query in ctx.captured_queries:
+                self.assertNotIn('OFFSET', query['sql'])
+            seen.extend(recipe['id'] for recipe in res.data['results'])
+            url = res.data['next']
+
+        self.assertEqual(seen, sorted(recipe_ids, reverse=True))
+
+    def test_filter_by_tags(self):
+        """ test filtering recipes by any of the given tags """
+        r1 = create_recipe(user=self.user, title='Thai Curry')
+        r2 = create_recipe(user=self.user, title='Aubergine Tahini')
+        r3 = create_recipe(user=self.user, title='Fish and Chips')
+        tag1 = Tag.objects.create(user=self.user, name='Vegan')
+        tag2 = Tag.objects.create(user=self.user, name='Vegetarian')
+        r1.tags.add(tag1, tag2)
+        r2.tags.add(tag2)
+
+        res = self.client.get(RECIPES_URL, {'tags': f'{tag1.id},{tag2.id}'})
+
+        ids = [recipe['id'] for recipe in res.data['results']]
+        self.assertEqual(ids, [r2.id, r1.id])
+        self.assertNotIn(r3.id, ids)
+
+    def test_filter_by_time_and_price(self):
+        quick = create_recipe(self.user, time_minutes=10, price='3.00')
+        create_recipe(self.user, time_minutes=60, price='3.00')
+        create_recipe(self.user, time_minutes=10, price='12.00')
+        create_recipe(self.user, time_minutes=10, price='1.00')
+
+        res = self.client.get(RECIPES_URL, {
+            'max_time': 15,
+            'min_price': '2.50',
+            'max_price': '5',
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        ids = [recipe['id'] for recipe in res.data['results']]
+        self.assertEqual(ids, [quick.id])
+
+    def test_filter_invalid_params(self):
+        for params in [{'tags': '1,x'}, {'max_time': 'soon'},
+                       {'max_price': 'cheap'}]:
+            res = self.client.get(RECIPES_URL, params)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_search_recipes(self):
+        """ test searching the title and the description """
+        curry = create_recipe(self.user, title='Thai green curry')
+        soup = create_recipe(
+            self.user,
+            title='Winter soup',
+            description='a mild curry flavoured soup'
+        )
+        create_recipe(self.user, title='Pancakes')
+        other_user = create_user(email='other@example.com', password='pw1234')
+        create_recipe(other_user, title='Curry')
+
+        res = self.client.get(RECIPES_URL, {'search': 'curry'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        ids = {recipe['id'] for recipe in res.data['results']}
+        self.assertEqual(ids, {curry.id, soup.id})
+
+    def test_search_sees_updated_title(self):
+        recipe = create_recipe(self.user, title='Pancakes')
+        self.client.patch(detail_url(recipe.id), {'title': 'Waffles'})
+
+        res = self.client.get(RECIPES_URL, {'search': 'waffles'})
+        self.assertEqual(
+            [item['id'] for item in res.data['results']],
+            [recipe.id]
+        )
+        res = self.client.get(RECIPES_URL, {'search': 'pancakes'})
+        self.assertEqual(res.data['results'], [])
+
+    @skipUnless(connection.vendor == 'postgresql', 'ranked on postgres')
+    def test_search_ranked_and_paginated(self):
+        """ test title matches rank first and pages do not overlap """
+        in_description = [
+            create_recipe(
+                self.user,
+                title=f'Dish {i}',
+                description='served with rice'
+            ).id
+            for i in range(4)
+        ]
+        in_title = create_recipe(self.user, title='Rice pudding').id
+
+        ids = []
+        url = f'{RECIPES_URL}?search=rice&page_size=2'
+        while url:
+            res = self.client.get(url)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            ids.extend(recipe['id'] for recipe in res.data['results'])
+            url = res.data['next']
+
+        self.assertEqual(ids[0], in_title)
+        self.assertEqual(sorted(ids[1:]), sorted(in_description))
+
+    @skipUnless(connection.vendor == 'postgresql', 'ranked on postgres')
+    def test_search_sparse_fields_paginated(self):
+        """ test ranked pages seek on the rank without rendering it """
+        for i in range(3):
+            create_recipe(self.user, title=f'Rice {i}')
+
+        titles = []
+        url = f'{RECIPES_URL}?search=rice&page_size=2&fields=title'
+        while url:
+            res = self.client.get(url)
+            titles.extend(recipe['title'] for recipe in res.data['results'])
+            url = res.data['next']
+
+        self.assertEqual(sorted(titles), ['Rice 0', 'Rice 1', 'Rice 2'])
 
     def test_recipe_detail(self):
         recipe = create_recipe(self.user)
@@ -272,3 +415,615 @@ class TestPrivateRecipeAPI(TestCase):
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(recipe.tags.count(), 0)
+
+    def test_create_recipe_tags_query_count_is_constant(self):
+        """ test creating tags does not cost queries per tag """
+        counts = []
+        for count in (1, 30):
+            payload = {
+                'title': f'Recipe with {count} tags',
+                'time_minutes': 10,
+                'price': Decimal('2.50'),
+                'tags': tags_payload(count, prefix=f'Tag {count}'),
+            }
+            with CaptureQueriesContext(connection) as ctx:
+                res = self.client.post(RECIPES_URL, payload, format='json')
+            self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+            self.assertEqual(len(res.data['tags']), count)
+            counts.append(len(ctx.captured_queries))
+
+        self.assertEqual(counts[0], counts[1])
+        # two of them update the recipe and tag counts of the user stats ,
+        # two more are the savepoint of the create transaction
+        self.assertLessEqual(counts[1], 12)
+
+    def test_update_recipe_tags_query_count_is_constant(self):
+        """ test replacing tags does not cost queries per tag """
+        # the etag of the response would create the version row first
+        get_version(self.user.id)
+        counts = []
+        for count in (1, 30):
+            recipe = create_recipe(user=self.user)
+            recipe.tags.add(
+                Tag.objects.create(user=self.user, name=f'Old {count}')
+            )
+            payload = {'tags': tags_payload(count, prefix=f'New {count}')}
+            with CaptureQueriesContext(connection) as ctx:
+                res = self.client.patch(
+                    detail_url(recipe.id),
+                    payload,
+                    format='json'
+                )
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertEqual(recipe.tags.count(), count)
+            counts.append(len(ctx.captured_queries))
+
+        self.assertEqual(counts[0], counts[1])
+
+    def test_update_recipe_keeps_unchanged_tags(self):
+        """ test updating tags only touches the tags that changed """
+        tag_keep = Tag.objects.create(user=self.user, name='Keep')
+        tag_drop = Tag.objects.create(user=self.user, name='Drop')
+        recipe = create_recipe(user=self.user)
+        recipe.tags.add(tag_keep, tag_drop)
+        link = Recipe.tags.through.objects.get(recipe=recipe, tag=tag_keep)
+
+        payload = {'tags': [{'name': 'Keep'}, {'name': 'Added'}]}
+        res = self.client.patch(detail_url(recipe.id), payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            set(recipe.tags.values_list('name', flat=True)),
+            {'Keep', 'Added'}
+        )
+        self.assertTrue(
+            Recipe.tags.through.objects.filter(id=link.id).exists()
+        )
+
+    def test_partial_update_writes_changed_fields(self):
+        """ test a patch updates only the columns that changed """
+        recipe = create_recipe(user=self.user)
+
+        payload = {'title': 'New title', 'price': recipe.price}
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.patch(detail_url(recipe.id), payload)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['version'], 2)
+        updates = [
+            query['sql'] for query in ctx.captured_queries
+            if query['sql'].startswith('UPDATE "recipe_recipe"')
+        ]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('"title"', updates[0])
+        self.assertIn('"version"', updates[0])
+        self.assertNotIn('"price"', updates[0])
+        self.assertNotIn('"description"', updates[0])
+
+    def test_update_without_changes_keeps_version(self):
+        recipe = create_recipe(user=self.user)
+
+        res = self.client.patch(detail_url(recipe.id), {'title': recipe.title})
+
+        self.assertEqual(res.data['version'], 1)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.version, 1)
+
+    def test_update_if_match(self):
+        """ test If-Match takes the version the update was based on """
+        recipe = create_recipe(user=self.user)
+        url = detail_url(recipe.id)
+
+        res = self.client.patch(url, {'title': 'First'}, HTTP_IF_MATCH='"1"')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['version'], 2)
+
+        for if_match in ['"1"', 'W/"1"', '"1-abc"', '"x"', '"-2"']:
+            res = self.client.patch(
+                url, {'title': 'Stale'}, HTTP_IF_MATCH=if_match
+            )
+            self.assertEqual(
+                res.status_code, status.HTTP_412_PRECONDITION_FAILED
+            )
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, 'First')
+
+        res = self.client.patch(url, {'title': 'Any'}, HTTP_IF_MATCH='*')
+        self.assertEqual(res.data['version'], 3)
+        res = self.client.put(url, {
+            'title': 'Full', 'time_minutes': 1, 'price': '1.00'
+        }, HTTP_IF_MATCH='"1", "3"')
+        self.assertEqual(res.data['version'], 4)
+        # a compressed read returns a weak etag
+        res = self.client.patch(
+            url, {'title': 'Weak'}, HTTP_IF_MATCH='W/"4-abc"'
+        )
+        self.assertEqual(res.data['version'], 5)
+
+    def test_update_if_match_etag_of_a_read(self):
+        """ test the etag of a read is the one If-Match takes """
+        recipe = create_recipe(user=self.user)
+        url = detail_url(recipe.id)
+        etag = self.client.get(url)['ETag']
+
+        res = self.client.patch(url, {'title': 'New'}, HTTP_IF_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+        # the etag of the update is the one of the next read
+        self.assertEqual(self.client.get(url)['ETag'], res['ETag'])
+        res = self.client.patch(url, {'title': 'Stale'}, HTTP_IF_MATCH=etag)
+        self.assertEqual(
+            res.status_code, status.HTTP_412_PRECONDITION_FAILED
+        )
+        res = self.client.patch(
+            url, {'title': 'Fresh'}, HTTP_IF_MATCH=self.client.get(url)['ETag']
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, 'Fresh')
+
+    def test_create_recipe_duplicate_tag_names(self):
+        """ test repeated tag names in the payload create a single tag """
+        payload = {
+            'title': 'Soup',
+            'time_minutes': 20,
+            'price': Decimal('3.00'),
+            'tags': [{'name': 'Warm'}, {'name': 'Warm'}],
+        }
+        res = self.client.post(RECIPES_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            Tag.objects.filter(user=self.user, name='Warm').count(), 1
+        )
+        self.assertEqual(len(res.data['tags']), 1)
+
+    def test_bulk_create_recipes_json(self):
+        """ test creating recipes in bulk from a json array """
+        payload = [
+            {
+                'title': f'Recipe {i}',
+                'time_minutes': i + 1,
+                'price': '1.50',
+                'tags': [{'name': 'Shared'}, {'name': f'Own {i}'}],
+            }
+            for i in range(5)
+        ]
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['created'], 5)
+        recipes = Recipe.objects.filter(user=self.user)
+        self.assertEqual(recipes.count(), 5)
+        self.assertEqual(
+            Tag.objects.filter(user=self.user, name='Shared').count(), 1
+        )
+        for recipe in recipes:
+            self.assertEqual(recipe.tags.count(), 2)
+
+    def test_bulk_create_recipes_ndjson_in_chunks(self):
+        """ test creating recipes in bulk from an ndjson stream """
+        rows = [
+            {'title': f'Recipe {i}', 'time_minutes': 5, 'price': '2.00'}
+            for i in range(7)
+        ]
+        body = '\n'.join(json.dumps(row) for row in rows) + '\n'
+        with patch.object(RecipeViewSet, 'bulk_chunk_size', 3):
+            res = self.client.post(
+                BULK_URL,
+                body,
+                content_type='application/x-ndjson'
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['created'], 7)
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 7)
+
+    def test_bulk_create_invalid_chunk(self):
+        """ test an invalid chunk is rejected and earlier chunks are kept """
+        payload = [
+            {'title': 'Good', 'time_minutes': 5, 'price': '2.00'},
+            {'title': 'Bad', 'price': '2.00'},
+        ]
+        with patch.object(RecipeViewSet, 'bulk_chunk_size', 1):
+            res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data['created'], 1)
+        self.assertIn('time_minutes', res.data['errors'][0])
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 1)
+
+    def test_bulk_create_requires_list(self):
+        payload = {'title': 'Single', 'time_minutes': 5, 'price': '2.00'}
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_bulk_create_rejects_scalars(self):
+        """ test json bodies that are not arrays are rejected """
+        for body in ['3', 'true', 'null', '"recipes"']:
+            for prefer in ['', 'respond-async']:
+                res = self.client.post(
+                    BULK_URL,
+                    body,
+                    content_type='application/json',
+                    HTTP_PREFER=prefer
+                )
+
+                self.assertEqual(
+                    res.status_code, status.HTTP_400_BAD_REQUEST
+                )
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_export_recipes_ndjson(self):
+        """ test exporting streams the user recipes as ndjson """
+        other_user = create_user(
+            email='other@example.com',
+            password='other_password123'
+        )
+        create_recipe(other_user)
+        for i in range(3):
+            recipe = create_recipe(self.user, title=f'Recipe {i}')
+            recipe.tags.add(Tag.objects.create(user=self.user, name=f'T{i}'))
+
+        with patch.object(RecipeViewSet, 'export_chunk_size', 2):
+            res = self.client.get(EXPORT_URL)
+            body = b''.join(res.streaming_content).decode()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in body.splitlines()]
+        recipes = Recipe.objects.filter(user=self.user).order_by('-id')
+        serializer = RecipeDetailSerializer(recipes, many=True)
+        self.assertEqual(rows, json.loads(json.dumps(serializer.data)))
+
+    def test_list_sparse_fields(self):
+        """ test fields= trims the output , the columns and the tag fetch """
+        recipe = create_recipe(self.user, title='Soup')
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Warm'))
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(RECIPES_URL, {'fields': 'id,title'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            res.data['results'], [{'id': recipe.id, 'title': 'Soup'}]
+        )
+        sql = ' '.join(query['sql'] for query in queries)
+        self.assertNotIn('recipe_recipe_tags', sql)
+        self.assertNotIn('"price"', sql)
+
+    def test_list_exclude_fields(self):
+        recipe = create_recipe(self.user)
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Warm'))
+
+        res = self.client.get(RECIPES_URL, {'exclude': 'tags,link'})
+
+        self.assertEqual(
+            list(res.data['results'][0]),
+            ['id', 'title', 'time_minutes', 'price']
+        )
+
+    def test_sparse_fields_with_tags(self):
+        recipe = create_recipe(self.user)
+        tag = Tag.objects.create(user=self.user, name='Warm')
+        recipe.tags.add(tag)
+
+        res = self.client.get(RECIPES_URL, {'fields': 'tags'})
+
+        self.assertEqual(
+            res.data['results'],
+            [{'tags': [{'id': tag.id, 'name': 'Warm'}]}]
+        )
+
+    def test_sparse_fields_unknown(self):
+        for params in [
+            {'fields': 'title,secret'},
+            {'exclude': 'secret'},
+            {'fields': 'title', 'exclude': 'title'},
+        ]:
+            res = self.client.get(RECIPES_URL, params)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_retrieve_sparse_fields(self):
+        recipe = create_recipe(self.user, description='Long text')
+
+        res = self.client.get(
+            detail_url(recipe.id), {'fields': 'title,description'}
+        )
+
+        self.assertEqual(
+            res.data, {'title': recipe.title, 'description': 'Long text'}
+        )
+
+    def test_sparse_fields_keyset_pagination(self):
+        """ test the cursor works without the ordering field rendered """
+        for i in range(3):
+            create_recipe(self.user, title=f'Recipe {i}')
+
+        res = self.client.get(RECIPES_URL, {'fields': 'title', 'page_size': 2})
+        titles = [row['title'] for row in res.data['results']]
+        res = self.client.get(res.data['next'])
+        titles += [row['title'] for row in res.data['results']]
+
+        self.assertEqual(titles, ['Recipe 2', 'Recipe 1', 'Recipe 0'])
+        self.assertEqual(list(res.data['results'][0]), ['title'])
+
+    def test_list_json_matches_drf_renderer(self):
+        """ test the fast json renderer writes what JSONRenderer writes """
+        recipe = create_recipe(self.user, title='Crème \u2028 brûlée')
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Sweet'))
+
+        res = self.client.get(RECIPES_URL, HTTP_ACCEPT='application/json')
+
+        self.assertEqual(res['Content-Type'], 'application/json')
+        self.assertEqual(res.content, JSONRenderer().render(res.data))
+
+    def test_list_msgpack(self):
+        """ test listing recipes as messagepack """
+        recipe = create_recipe(self.user)
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Vegan'))
+        expected = self.client.get(RECIPES_URL).json()
+
+        res = self.client.get(RECIPES_URL, HTTP_ACCEPT='application/msgpack')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(res.content), expected)
+
+    def test_list_ndjson_streams_every_row(self):
+        """ test ndjson lists stream every matching row , unpaginated """
+        for i in range(5):
+            recipe = create_recipe(self.user, title=f'Recipe {i}')
+            recipe.tags.add(Tag.objects.create(user=self.user, name=f'T{i}'))
+        create_recipe(self.user, title='Slow', time_minutes=60)
+
+        with patch.object(RecipeViewSet, 'export_chunk_size', 2):
+            res = self.client.get(
+                RECIPES_URL,
+                {'page_size': 2, 'max_time': 30},
+                HTTP_ACCEPT='application/x-ndjson'
+            )
+            body = b''.join(res.streaming_content).decode()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+        self.assertIn('ETag', res)
+        rows = [json.loads(line) for line in body.splitlines()]
+        recipes = Recipe.objects.filter(
+            user=self.user, time_minutes__lte=30
+        ).order_by('-id')
+        serializer = RecipeSerializer(recipes, many=True)
+        self.assertEqual(rows, json.loads(json.dumps(serializer.data)))
+
+
+@skipUnless(connection.vendor == 'postgresql', 'postgres row locks')
+class TestRecipeConcurrentUpdates(TransactionTestCase):
+    """ test concurrent patches of one recipe lose no update """
+    threads = 4
+
+    def setUp(self):  # noqa
+        self.user = create_user(email='test@example.com', password='test1234')
+        self.recipe = create_recipe(self.user, time_minutes=0)
+        self.url = detail_url(self.recipe.id)
+
+    def run_threads(self, target):
+        barrier = threading.Barrier(self.threads)
+        errors = []
+
+        def run(i):
+            client = APIClient()
+            client.force_authenticate(self.user)
+            try:
+                barrier.wait()
+                target(client, i)
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connections.close_all()
+        threads = [
+            threading.Thread(target=run, args=(i,))
+            for i in range(self.threads)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=60)
+        self.assertEqual(errors, [])
+
+    def test_concurrent_increments_with_if_match(self):
+        increments = 5
+
+        def increment(client, i):
+            done = 0
+            while done < increments:
+                recipe = client.get(self.url).data
+                res = client.patch(
+                    self.url,
+                    {'time_minutes': recipe['time_minutes'] + 1},
+                    HTTP_IF_MATCH=f'"{recipe["version"]}"'
+                )
+                if res.status_code == status.HTTP_200_OK:
+                    done += 1
+                else:
+                    assert res.status_code == 412, res.status_code
+
+        self.run_threads(increment)
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.time_minutes, self.threads * increments)
+        self.assertEqual(self.recipe.version, 1 + self.threads * increments)
+
+    def test_concurrent_patches_of_different_fields(self):
+        payloads = [
+            {'title': 'Patched title'},
+            {'description': 'patched description'},
+            {'link': 'https://example.com/patched'},
+            {'price': '9.99'},
+        ]
+
+        def patch_field(client, i):
+            res = client.patch(self.url, payloads[i])
+            assert res.status_code == 200, res.status_code
+
+        self.run_threads(patch_field)
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.title, 'Patched title')
+        self.assertEqual(self.recipe.description, 'patched description')
+        self.assertEqual(self.recipe.link, 'https://example.com/patched')
+        self.assertEqual(self.recipe.price, Decimal('9.99'))
+        self.assertEqual(self.recipe.version, 1 + len(payloads))
+
+
+class TestRecipeQueryCounts(QueryCountMixin, TestCase):
+    """ test recipe endpoints do not run queries per row """
+    def setUp(self):  # noqa
+        self.client = APIClient()
+        self.user = create_user(email='test@example.com', password='test1234')
+        self.client.force_authenticate(self.user)
+
+    def add_recipes(self, count):
+        for _ in range(count):
+            recipe = create_recipe(self.user)
+            recipe.tags.add(
+                Tag.objects.create(user=self.user, name=f'A{recipe.id}'),
+                Tag.objects.create(user=self.user, name=f'B{recipe.id}'),
+            )
+
+    def test_list_query_count(self):
+        self.assertConstantQueries(
+            self.add_recipes,
+            lambda: self.client.get(RECIPES_URL)
+        )
+
+    def test_export_query_count(self):
+        self.assertConstantQueries(
+            self.add_recipes,
+            lambda: self.client.get(EXPORT_URL)
+        )
+
+    def test_retrieve_query_count(self):
+        recipe = create_recipe(self.user)
+
+        def add_tags(count):
+            start = recipe.tags.count()
+            recipe.tags.add(*[
+                Tag.objects.create(user=self.user, name=f'Tag {i}')
+                for i in range(start, start + count)
+            ])
+
+        self.assertConstantQueries(
+            add_tags,
+            lambda: self.client.get(detail_url(recipe.id))
+        )
+
+    def test_list_defers_description(self):
+        """ test the list query does not load the description column """
+        self.add_recipes(1)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(RECIPES_URL)
+        recipe_queries = [
+            query['sql'] for query in ctx.captured_queries
+            if 'FROM "recipe_recipe"' in query['sql']
+        ]
+        self.assertEqual(len(recipe_queries), 1)
+        self.assertNotIn('description', recipe_queries[0])
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+})
+class TestRecipeConditionalRequests(TestCase):
+    """ test etag and last modified handling of recipe reads """
+    def setUp(self):  # noqa
+        self.client = APIClient()
+        self.user = create_user(email='test@example.com', password='test1234')
+        self.client.force_authenticate(self.user)
+        self.recipe = create_recipe(self.user)
+
+    def test_unchanged_list_not_modified(self):
+        res = self.client.get(RECIPES_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('ETag', res)
+        self.assertIn('Last-Modified', res)
+
+        # only the version lookup runs
+        with self.assertNumQueries(1):
+            res = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=res['ETag'])
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_unchanged_ndjson_list_not_modified(self):
+        ndjson = 'application/x-ndjson'
+        etag = self.client.get(RECIPES_URL)['ETag']
+        res = self.client.get(RECIPES_URL, HTTP_ACCEPT=ndjson)
+        # the representations differ so do their validators
+        self.assertNotEqual(res['ETag'], etag)
+
+        res = self.client.get(
+            RECIPES_URL,
+            HTTP_ACCEPT=ndjson,
+            HTTP_IF_NONE_MATCH=res['ETag']
+        )
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_if_modified_since_not_modified(self):
+        res = self.client.get(RECIPES_URL)
+        res = self.client.get(
+            RECIPES_URL,
+            HTTP_IF_MODIFIED_SINCE=res['Last-Modified']
+        )
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_write_changes_etag(self):
+        etag = self.client.get(RECIPES_URL)['ETag']
+        self.client.post(
+            RECIPES_URL,
+            {'title': 'New', 'time_minutes': 5, 'price': '1.00'}
+        )
+
+        res = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 2)
+        self.assertNotEqual(res['ETag'], etag)
+
+    def test_tag_update_changes_etag(self):
+        """ test replacing only the tags of a recipe changes the etag """
+        etag = self.client.get(detail_url(self.recipe.id))['ETag']
+        self.client.patch(
+            detail_url(self.recipe.id),
+            {'tags': [{'name': 'Lunch'}]},
+            format='json'
+        )
+
+        res = self.client.get(
+            detail_url(self.recipe.id),
+            HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['tags'][0]['name'], 'Lunch')
+
+    def test_etag_differs_per_user(self):
+        etag = self.client.get(RECIPES_URL)['ETag']
+        other_user = create_user(email='other@example.com', password='pw1234')
+        self.client.force_authenticate(other_user)
+
+        res = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    @override_settings(RESPONSE_CACHE={'ENABLED': True})
+    def test_cached_list_page(self):
+        """ test a repeated list is served from the page cache """
+        first = self.client.get(RECIPES_URL)
+
+        with self.assertNumQueries(1):
+            res = self.client.get(RECIPES_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.content, first.content)
+        self.assertEqual(res['ETag'], first['ETag'])
+
+        create_recipe(self.user, title='Another')
+        res = self.client.get(RECIPES_URL)
+        self.assertEqual(len(res.json()['results']), 2)
@@ -0,0 +1,113 @@
+from unittest import skipUnless
+from unittest.mock import patch
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import routers
+from recipe.models import Recipe
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+REPLICA = 'replica_1'
+
+
+def create_user(email='user@example.com', password='test_123'):
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+@override_settings(READ_REPLICAS={'ALIASES': ['default']})
+@patch('core.routers.choose_replica', return_value='default')
+class ReplicaReadTests(TestCase):
+    """ test which requests read from a replica """
+    def setUp(self):  # noqa
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.addCleanup(routers.get_pin_cache().clear)
+
+    def test_safe_requests_choose_a_replica(self, patched_choose):
+        self.assertEqual(
+            self.client.get(RECIPES_URL).status_code,
+            status.HTTP_200_OK
+        )
+        self.client.get(TAGS_URL)
+
+        self.assertEqual(patched_choose.call_count, 2)
+        self.assertIsNone(routers.current_replica())
+
+    def test_writes_pin_the_user_to_the_primary(self, patched_choose):
+        res = self.client.post(RECIPES_URL, {
+            'title': 'Soup',
+            'time_minutes': 10,
+            'price': '5.00',
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(routers.is_pinned(self.user.pk))
+        self.client.get(RECIPES_URL)
+        patched_choose.assert_not_called()
+
+    def test_failed_writes_do_not_pin(self, patched_choose):
+        res = self.client.post(RECIPES_URL, {'title': 'Soup'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(routers.is_pinned(self.user.pk))
+
+
+@skipUnless(REPLICA in settings.DATABASES, 'needs a replica alias')
+@override_settings(READ_REPLICAS={
+    **settings.READ_REPLICAS, 'LOCAL_PINS': True
+})
+class ReplicaRoutingTests(TransactionTestCase):
+    """ test the reads against a second database alias """
+    databases = '__all__'
+
+    def setUp(self):  # noqa
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        routers.reset_lags()
+        self.addCleanup(routers.reset_lags)
+
+    def get_recipes(self):
+        with CaptureQueriesContext(connections[REPLICA]) as ctx:
+            res = self.client.get(RECIPES_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res, len(ctx.captured_queries)
+
+    def test_reads_from_the_replica(self):
+        Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=5, price='1.00'
+        )
+
+        res, replica_queries = self.get_recipes()
+
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertGreater(replica_queries, 0)
+
+    def test_reads_own_writes_from_the_primary(self):
+        self.client.post(RECIPES_URL, {
+            'title': 'Soup',
+            'time_minutes': 10,
+            'price': '5.00',
+        })
+
+        res, replica_queries = self.get_recipes()
+
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(replica_queries, 0)
+
+    @override_settings(READ_REPLICAS={
+        'ALIASES': [REPLICA], 'MAX_LAG': 1, 'LOCAL_PINS': True
+    })
+    @patch('core.routers.get_lag', return_value=10)
+    def test_lagging_replica_falls_back_to_the_primary(self, patched_lag):
+        _, replica_queries = self.get_recipes()
+
+        self.assertEqual(replica_queries, 0)
@@ -0,0 +1,98 @@
+from decimal import Decimal
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.db.models import Prefetch
+from recipe.models import Recipe, Tag
+from recipe.serializers import (
+    RecipeSerializer,
+    RecipeDetailSerializer,
+    RecipeValuesSerializer,
+    RecipeDetailValuesSerializer,
+)
+
+
+class TestRecipeListSerializer(TestCase):
+    """ test creating recipes in bulk """
+    def test_create_empty_list(self):
+        user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='test1234'
+        )
+        serializer = RecipeDetailSerializer(data=[], many=True)
+        self.assertTrue(serializer.is_valid())
+
+        with self.assertNumQueries(0):
+            self.assertEqual(serializer.save(user=user), [])
+
+
+class TestValuesSerializerParity(TestCase):
+    """ test the fast read serializers match the model serializers """
+    def setUp(self):  # noqa
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='test1234'
+        )
+        tags = [
+            Tag.objects.create(user=self.user, name=name)
+            for name in ['Vegan', 'Lunch', 'Äpfel']
+        ]
+        samples = [
+            {'price': Decimal('5.5'), 'link': ''},
+            {'price': Decimal('0.00'), 'description': ''},
+            {'price': Decimal('999.99'), 'title': 'Crème brûlée'},
+        ]
+        for i, params in enumerate(samples):
+            recipe = Recipe.objects.create(
+                user=self.user,
+                title=params.get('title', f'Recipe {i}'),
+                time_minutes=i * 7,
+                price=params['price'],
+                description=params.get('description', f'Description {i}'),
+                link=params.get('link', f'https://example.com/{i}'),
+            )
+            recipe.tags.add(*tags[:i])
+
+    def recipes(self):
+        return Recipe.objects.filter(user=self.user).order_by('-id')
+
+    def prefetched_recipes(self):
+        """ the tags of the values serializers come in id order """
+        return self.recipes().prefetch_related(
+            Prefetch('tags', queryset=Tag.objects.order_by('id'))
+        )
+
+    def test_list_parity(self):
+        expected = RecipeSerializer(self.prefetched_recipes(), many=True).data
+        rows = self.recipes().values(*RecipeValuesSerializer.value_fields())
+        data = RecipeValuesSerializer(rows, many=True).data
+
+        self.assertEqual(data, expected)
+        self.assertEqual(
+            [list(item) for item in data],
+            [list(item) for item in expected]
+        )
+
+    def test_detail_parity(self):
+        rows = self.recipes().values(
+            *RecipeDetailValuesSerializer.value_fields()
+        )
+        for recipe, row in zip(self.prefetched_recipes(), rows):
+            expected = RecipeDetailSerializer(recipe).data
+            data = RecipeDetailValuesSerializer(row).data
+
+            self.assertEqual(data, expected)
+            self.assertEqual(list(data), list(expected))
+
+    def test_list_uses_one_query_for_tags(self):
+        rows = list(
+            self.recipes().values(*RecipeValuesSerializer.value_fields())
+        )
+        with self.assertNumQueries(1):
+            RecipeValuesSerializer(rows, many=True).data
+
+    def test_value_fields_skip_description_for_list(self):
+        self.assertNotIn('description', RecipeValuesSerializer.value_fields())
+        self.assertIn(
+            'description',
+            RecipeDetailValuesSerializer.value_fields()
+        )
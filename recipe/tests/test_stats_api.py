@@ -0,0 +1,248 @@
+from decimal import Decimal
+from unittest.mock import patch
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from recipe import serializers, stats
+from recipe.models import Recipe, RecipeStats, Tag
+from recipe.tests.utils import QueryCountMixin
+
+STATS_URL = reverse('recipe:stats')
+RECIPES_URL = reverse('recipe:recipe-list')
+BULK_URL = reverse('recipe:recipe-bulk-create')
+
+
+def detail_url(recipe_id):
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def recipe_payload(**params):
+    payload = {'title': 'Sample', 'time_minutes': 10, 'price': '4.50'}
+    payload.update(params)
+    return payload
+
+
+def stored_stats(user):
+    """ the maintained row as the fields compute_stats returns """
+    return aggregates(RecipeStats.objects.get(user=user))
+
+
+def aggregates(row):
+    return {
+        field.attname: getattr(row, field.attname)
+        for field in RecipeStats._meta.concrete_fields
+    }
+
+
+class PublicStatsApiTests(TestCase):
+    def test_auth_is_required(self):
+        res = APIClient().get(STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateStatsApiTests(QueryCountMixin, TestCase):
+    def setUp(self):  # noqa
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='test1234'
+        )
+        self.client.force_authenticate(self.user)
+
+    def assertStatsMatch(self):  # noqa
+        """ the maintained row equals the aggregates computed from scratch """
+        computed = stats.compute_stats([self.user.id])[self.user.id]
+        self.assertEqual(stored_stats(self.user), aggregates(computed))
+
+    def test_empty_stats(self):
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['recipes'], 0)
+        self.assertEqual(res.data['tags'], 0)
+        self.assertIsNone(res.data['average_price'])
+        self.assertEqual(len(res.data['price_distribution']), 6)
+        self.assertTrue(RecipeStats.objects.filter(user=self.user).exists())
+
+    def test_stats_values(self):
+        self.client.get(STATS_URL)
+        self.client.post(RECIPES_URL, recipe_payload(
+            time_minutes=10, price='4.00', tags=[{'name': 'Vegan'}]
+        ), format='json')
+        self.client.post(RECIPES_URL, recipe_payload(
+            time_minutes=20, price='120.00'
+        ), format='json')
+
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.data['recipes'], 2)
+        self.assertEqual(res.data['tags'], 1)
+        self.assertEqual(res.data['average_time_minutes'], 15)
+        self.assertEqual(res.data['average_price'], '62.00')
+        counts = [
+            bucket['count'] for bucket in res.data['price_distribution']
+        ]
+        self.assertEqual(counts, [1, 0, 0, 0, 0, 1])
+        self.assertEqual(res.data['price_distribution'][-1]['min'], 100)
+        self.assertIsNone(res.data['price_distribution'][-1]['max'])
+
+    def test_stats_follow_api_writes(self):
+        self.client.get(STATS_URL)
+        res = self.client.post(RECIPES_URL, recipe_payload(
+            tags=[{'name': 'Vegan'}, {'name': 'Quick'}]
+        ), format='json')
+        recipe_id = res.data['id']
+        self.assertStatsMatch()
+
+        self.client.patch(detail_url(recipe_id), {'price': '75.00'})
+        self.assertStatsMatch()
+        self.assertEqual(stored_stats(self.user)['price_under_100'], 1)
+
+        self.client.put(detail_url(recipe_id), recipe_payload(
+            time_minutes=30, tags=[{'name': 'Dinner'}]
+        ), format='json')
+        self.assertStatsMatch()
+
+        self.client.delete(detail_url(recipe_id))
+        self.assertStatsMatch()
+        self.assertEqual(stored_stats(self.user)['recipe_count'], 0)
+
+    def test_stats_follow_bulk_create(self):
+        self.client.get(STATS_URL)
+
+        self.client.post(BULK_URL, [
+            recipe_payload(price=str(price), tags=[{'name': f'Tag {price}'}])
+            for price in range(0, 200, 15)
+        ], format='json')
+
+        self.assertStatsMatch()
+        self.assertEqual(stored_stats(self.user)['recipe_count'], 14)
+
+    def test_stats_follow_orm_writes(self):
+        self.client.get(STATS_URL)
+        recipe = Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=5, price=Decimal('8')
+        )
+        tag = Tag.objects.create(user=self.user, name='Lunch')
+        self.assertStatsMatch()
+
+        recipe = Recipe.objects.get(pk=recipe.pk)
+        recipe.price = Decimal('30')
+        recipe.save()
+        self.assertStatsMatch()
+
+        # the old values of a deferred field are unknown
+        recipe = Recipe.objects.only('title').get(pk=recipe.pk)
+        recipe.time_minutes = 50
+        recipe.save()
+        self.assertFalse(RecipeStats.objects.filter(user=self.user).exists())
+        self.client.get(STATS_URL)
+        self.assertStatsMatch()
+
+        tag.delete()
+        recipe.delete()
+        self.assertStatsMatch()
+
+    def test_tags_created_concurrently_are_counted_once(self):
+        self.client.get(STATS_URL)
+        bulk_create = Tag.objects.bulk_create
+
+        def create_concurrently(tags, **kwargs):
+            # another request creates one of the missing tags first
+            Tag.objects.create(user=self.user, name='Vegan')
+            return bulk_create(tags, **kwargs)
+
+        with patch.object(
+            Tag.objects, 'bulk_create', side_effect=create_concurrently
+        ):
+            serializers.get_or_create_tags(self.user.id, ['Vegan', 'Quick'])
+
+        self.assertStatsMatch()
+        self.assertEqual(stored_stats(self.user)['tag_count'], 2)
+
+    def test_update_racing_a_computing_read(self):
+        """ test a row computed before an update commits gets its delta """
+        recipe = Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=5, price=Decimal('8')
+        )
+        # what a read computes while the update is not committed
+        computed = stats.compute_stats([self.user.id])[self.user.id]
+        lock_user = stats.lock_user
+
+        def compute_meanwhile(user_id, **kwargs):
+            computed.save(force_insert=True)
+            lock_user(user_id, **kwargs)
+
+        recipe.price = Decimal('30')
+        with patch.object(stats, 'lock_user', side_effect=compute_meanwhile):
+            recipe.save()
+
+        self.assertStatsMatch()
+
+    def test_read_computed_while_waiting(self):
+        """ test a read waiting for another one takes its row """
+        Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=5, price=Decimal('8')
+        )
+        computed = stats.compute_stats([self.user.id])[self.user.id]
+        lock_user = stats.lock_user
+
+        def compute_meanwhile(user_id, **kwargs):
+            computed.save(force_insert=True)
+            lock_user(user_id, **kwargs)
+
+        with patch.object(stats, 'lock_user', side_effect=compute_meanwhile):
+            row = stats.get_stats(self.user.id)
+
+        self.assertEqual(row.pk, computed.pk)
+        self.assertStatsMatch()
+
+    def test_stats_of_other_users_unchanged(self):
+        other = get_user_model().objects.create_user(
+            email='other@example.com',
+            password='test1234'
+        )
+        stats.get_stats(other.id)
+
+        self.client.post(RECIPES_URL, recipe_payload(), format='json')
+
+        self.assertEqual(stored_stats(other)['recipe_count'], 0)
+
+    def test_stats_not_modified(self):
+        res = self.client.get(STATS_URL)
+
+        res = self.client.get(STATS_URL, HTTP_IF_NONE_MATCH=res['ETag'])
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.client.post(RECIPES_URL, recipe_payload(), format='json')
+        res = self.client.get(STATS_URL, HTTP_IF_NONE_MATCH=res['ETag'])
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['recipes'], 1)
+
+    def test_stats_queries_are_constant(self):
+        def add_recipes(count):
+            for _ in range(count):
+                Recipe.objects.create(
+                    user=self.user, title='Soup', time_minutes=5,
+                    price=Decimal('8')
+                )
+
+        self.assertConstantQueries(
+            add_recipes,
+            lambda: self.client.get(STATS_URL)
+        )
+
+    def test_rebuild_stats(self):
+        stats.get_stats(self.user.id)
+        Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=5, price=Decimal('8')
+        )
+        RecipeStats.objects.filter(user=self.user).update(recipe_count=99)
+
+        stats.rebuild_stats([self.user.id])
+
+        self.assertStatsMatch()
+        self.assertEqual(stored_stats(self.user)['recipe_count'], 1)
@@ -1,3 +1,5 @@
+import json
+
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 from django.urls import reverse
@@ -5,8 +7,9 @@ from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from recipe.models import Tag
+from recipe.models import Recipe, Tag
 from recipe.serializers import TagSerializer
+from recipe.tests.utils import QueryCountMixin
 
 TAGS_URL = reverse('recipe:tag-list')
 
@@ -29,7 +32,7 @@ class PublicTagApiTest(TestCase):
         self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
-class PrivateTagsApiTest(TestCase):
+class PrivateTagsApiTest(QueryCountMixin, TestCase):
     def setUp(self):  # noqa
         self.user = create_user()
         self.client = APIClient()
@@ -44,7 +47,7 @@ class PrivateTagsApiTest(TestCase):
         serializer = TagSerializer(tags, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_tags_limited_to_auth_user(self):
         user2 = create_user(email='user2@example.com', password='test2123')
@@ -53,9 +56,9 @@ class PrivateTagsApiTest(TestCase):
 
         res = self.client.get(TAGS_URL)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data[0]['name'], tag.name)
-        self.assertEqual(res.data[0]['id'], tag.id)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'][0]['name'], tag.name)
+        self.assertEqual(res.data['results'][0]['id'], tag.id)
 
     def test_update_tag(self):
         tag = Tag.objects.create(user=self.user, name='After Dinner')
@@ -68,6 +71,79 @@ class PrivateTagsApiTest(TestCase):
         tag.refresh_from_db()
         self.assertEqual(tag.name, payload['name'])
 
+    def test_update_tag_duplicate_name_error(self):
+        """ test renaming a tag to an existing name is rejected """
+        Tag.objects.create(user=self.user, name='Dinner')
+        tag = Tag.objects.create(user=self.user, name='Supper')
+
+        res = self.client.patch(detail_url(tag.id), {'name': 'Dinner'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        tag.refresh_from_db()
+        self.assertEqual(tag.name, 'Supper')
+
+    def test_tag_list_etag(self):
+        """ test the tag list answers conditional requests """
+        Tag.objects.create(user=self.user, name='Vegan')
+        etag = self.client.get(TAGS_URL)['ETag']
+
+        res = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        Tag.objects.create(user=self.user, name='Desserts')
+        res = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 2)
+
+    def test_list_tags_ndjson(self):
+        for name in ['Vegan', 'Dessert', 'Fruity']:
+            Tag.objects.create(user=self.user, name=name)
+        Tag.objects.create(user=create_user('other@example.com'), name='Soup')
+
+        res = self.client.get(TAGS_URL, HTTP_ACCEPT='application/x-ndjson')
+        body = b''.join(res.streaming_content).decode()
+
+        rows = [json.loads(line) for line in body.splitlines()]
+        tags = Tag.objects.filter(user=self.user).order_by('-name')
+        self.assertEqual(rows, TagSerializer(tags, many=True).data)
+
+    def test_list_tags_sparse_fields(self):
+        for name in ['Vegan', 'Dessert']:
+            Tag.objects.create(user=self.user, name=name)
+
+        res = self.client.get(TAGS_URL, {'fields': 'id', 'page_size': 1})
+        rows = res.data['results']
+        rows += self.client.get(res.data['next']).data['results']
+
+        tags = Tag.objects.filter(user=self.user).order_by('-name')
+        self.assertEqual(rows, [{'id': tag.id} for tag in tags])
+
+    def test_list_tags_unknown_field(self):
+        res = self.client.get(TAGS_URL, {'exclude': 'recipes'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_filter_assigned_only(self):
+        """ test listing only tags assigned to a recipe """
+        assigned = Tag.objects.create(user=self.user, name='Breakfast')
+        Tag.objects.create(user=self.user, name='Lunch')
+        for title in ['Eggs', 'Pancakes']:
+            recipe = Recipe.objects.create(
+                user=self.user,
+                title=title,
+                time_minutes=5,
+                price='1.00',
+            )
+            recipe.tags.add(assigned)
+
+        res = self.client.get(TAGS_URL, {'assigned_only': 1})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            res.data['results'],
+            TagSerializer([assigned], many=True).data
+        )
+
     def test_delete_tag(self):
         tag = Tag.objects.create(user=self.user, name='Breakfast')
 
@@ -76,3 +152,44 @@ class PrivateTagsApiTest(TestCase):
 
         self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
         self.assertFalse(Tag.objects.filter(id=tag.id).exists())
+
+    def test_delete_tag_unlinks_recipes(self):
+        tag = Tag.objects.create(user=self.user, name='Breakfast')
+        for title in ['Eggs', 'Pancakes', 'Toast']:
+            recipe = Recipe.objects.create(
+                user=self.user,
+                title=title,
+                time_minutes=5,
+                price='1.00',
+            )
+            recipe.tags.add(tag)
+
+        res = self.client.delete(detail_url(tag.id))
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(Recipe.objects.count(), 3)
+        self.assertFalse(Recipe.tags.through.objects.exists())
+
+    def test_list_tags_query_count(self):
+        def add_tags(count):
+            start = Tag.objects.count()
+            for i in range(start, start + count):
+                Tag.objects.create(user=self.user, name=f'Tag {i}')
+
+        self.assertConstantQueries(add_tags, lambda: self.client.get(TAGS_URL))
+
+    def test_tags_keyset_pagination(self):
+        """ test walking the tag pages by cursor returns every tag once """
+        for name in ['Apple', 'Banana', 'Cherry', 'Date', 'Elder']:
+            Tag.objects.create(user=self.user, name=name)
+
+        names = []
+        url = f'{TAGS_URL}?page_size=2'
+        while url:
+            res = self.client.get(url)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(res.data['results']), 2)
+            names.extend(tag['name'] for tag in res.data['results'])
+            url = res.data['next']
+
+        self.assertEqual(names, ['Elder', 'Date', 'Cherry', 'Banana', 'Apple'])
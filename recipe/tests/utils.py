@@ -0,0 +1,33 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryCountMixin:
+    """ assertions on the number of queries an endpoint runs """
+
+    def assertConstantQueries(self, add_rows, request, sizes=(1, 5, 20)):  # noqa
+        """
+        grow the data set to each of the given sizes with add_rows(count)
+        and fail if the query count of request() grows with it
+        """
+        counts = []
+        total = 0
+        # warm up so one off work like creating version rows is not counted
+        request()
+        for size in sizes:
+            add_rows(size - total)
+            total = size
+            with CaptureQueriesContext(connection) as ctx:
+                res = request()
+                # consume streamed bodies so their queries are counted
+                if getattr(res, 'streaming', False):
+                    b''.join(res.streaming_content)
+            self.assertLess(res.status_code, 300)
+            counts.append(len(ctx.captured_queries))
+
+        self.assertEqual(
+            len(set(counts)), 1,
+            f'query count grew with the data size: '
+            f'{dict(zip(sizes, counts))}'
+        )
+        return counts[0]
@@ -3,6 +3,7 @@ from django.urls import (
     include
 )
 from rest_framework.routers import DefaultRouter
+from core.async_views import with_async_reads
 from recipe import views
 
 app_name = 'recipe'
@@ -12,5 +13,6 @@ router.register('recipes', views.RecipeViewSet)
 router.register('tags', views.TagViewSet)
 
 urlpatterns = [
-    path('', include(router.urls))
+    path('stats/', views.RecipeStatsView.as_view(), name='stats'),
+    path('', include(with_async_reads(router.urls)))
 ]
@@ -0,0 +1,49 @@
+"""
+Per user data versions used to answer conditional requests
+"""
+from django.db import IntegrityError, router, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from core.asyncdb import fetch
+from recipe.models import DataVersion
+
+
+def get_version(user_id):
+    """
+    return the data version of a user , the row is created on the first
+    read so a missing row means no client has seen a version yet
+    """
+    try:
+        return DataVersion.objects.get(user_id=user_id)
+    except DataVersion.DoesNotExist:
+        try:
+            with transaction.atomic():
+                return DataVersion.objects.create(user_id=user_id)
+        except IntegrityError:
+            # a replica may not have the row yet
+            return DataVersion.objects.using(
+                router.db_for_write(DataVersion)
+            ).get(user_id=user_id)
+
+
+async def async_get_version(user_id):
+    """
+    return (version, modified) of a user for the async read paths , None
+    while the row is missing so the sync path creates it
+    """
+    rows = await fetch(DataVersion.objects.filter(
+        user_id=user_id
+    ).values_list('version', 'modified'))
+    return rows[0] if rows else None
+
+
+def bump_version(user_id):
+    """
+    bump the data version of a user , a single update because a user
+    without a version row has nothing cached anywhere
+    """
+    DataVersion.objects.filter(user_id=user_id).update(
+        version=F('version') + 1,
+        modified=timezone.now(),
+    )
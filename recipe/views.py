@@ -1,30 +1,321 @@
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, OuterRef
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import (
+    extend_schema,
+    extend_schema_view,
+    OpenApiParameter,
+)
+from django.http import StreamingHttpResponse
+from django.urls import reverse
+from django.utils.http import parse_etags
 from rest_framework import (
+    generics,
     viewsets,
-    mixins
+    mixins,
+    status
 )
-from rest_framework.authentication import TokenAuthentication
+from rest_framework.decorators import action
+from rest_framework.exceptions import ParseError, ValidationError
+from rest_framework.parsers import JSONParser
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import BrowsableAPIRenderer, JSONRenderer
+from rest_framework.response import Response
+from core import jobs
+from core.asyncdb import fetch
+from core.authentication import (
+    CachedTokenAuthentication,
+    SignedTokenAuthentication,
+)
+from core.mixins import (
+    AsyncReadMixin,
+    ConditionalGetMixin,
+    ReplicaReadMixin,
+    SparseFieldsMixin,
+)
+from core.serializers import JobSerializer, ValuesSerializer
 from recipe.models import (
     Recipe,
     Tag
 )
-from recipe import serializers
+from recipe import deletion, serializers, stats
+from recipe.parsers import NDJSONParser, NDJSONRows
+from recipe.renderers import (
+    MessagePackRenderer,
+    NDJSONRenderer,
+    ORJSONRenderer,
+)
+from recipe.search import search_is_ranked, search_recipes
+from recipe.versioning import async_get_version, get_version
 
 """ Recipe Views """
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+def _params_to_ints(value, name):
+    """ convert a comma separated query param to a list of ints """
+    try:
+        return [int(str_id) for str_id in value.split(',')]
+    except ValueError:
+        raise ValidationError({name: ['expected comma separated ids']})
+
+
+def _first_value(rows):
+    return rows[0][0] if rows else None
+
+
+def _param_to_number(value, name, number=int):
+    try:
+        return number(value)
+    except (ValueError, InvalidOperation):
+        raise ValidationError({name: ['expected a number']})
+
+
+SPARSE_FIELDS_PARAMETERS = [
+    OpenApiParameter(
+        'fields',
+        OpenApiTypes.STR,
+        description='comma separated fields to render , the others are '
+                    'not fetched',
+    ),
+    OpenApiParameter(
+        'exclude',
+        OpenApiTypes.STR,
+        description='comma separated fields not to render',
+    ),
+]
+
+
+class UserDataVersionMixin:
+    """
+    the data version of ConditionalGetMixin is the one of the request
+    user , bumped on every write to their recipes and tags , see
+    recipe.versioning
+    """
+
+    def get_data_version(self):
+        data_version = get_version(self.request.user.id)
+        return data_version.version, data_version.modified
+
+    async def async_get_data_version(self):
+        return await async_get_version(self.request.user.id)
+
+
+class NDJSONListMixin:
+    """
+    with Accept: application/x-ndjson the list is streamed unpaginated ,
+    rows are rendered as the queryset iterator fetches them so memory
+    stays flat however many rows there are
+    """
+    renderer_classes = [
+        ORJSONRenderer,
+        BrowsableAPIRenderer,
+        MessagePackRenderer,
+        NDJSONRenderer,
+    ]
+    # the async reads render these , the others go to the sync path
+    async_renderer_classes = (JSONRenderer, MessagePackRenderer)
+    # rows fetched per query by the streaming responses
+    export_chunk_size = 2000
+
+    def list(self, request, *args, **kwargs):
+        if isinstance(request.accepted_renderer, NDJSONRenderer):
+            return self.stream_rows(self.get_queryset())
+        return super().list(request, *args, **kwargs)
+
+    def stream_rows(self, queryset):
+        # the rows are read after dispatch , keep them on the chosen replica
+        return StreamingHttpResponse(
+            self._render_rows(queryset.using(queryset.db)),
+            content_type=NDJSONRenderer.media_type
+        )
+
+    def _render_rows(self, queryset):
+        """ yield rendered rows one chunk of rows at a time """
+        rows = queryset.iterator(chunk_size=self.export_chunk_size)
+        serializer_class = self.get_serializer_class()
+        while True:
+            chunk = list(islice(rows, self.export_chunk_size))
+            if not chunk:
+                break
+            for row in serializer_class(chunk, many=True).data:
+                yield NDJSONRenderer.render_row(row)
+
+
+@extend_schema_view(
+    list=extend_schema(
+        parameters=[
+            OpenApiParameter(
+                'tags',
+                OpenApiTypes.STR,
+                description='comma separated tag ids , any of them matches',
+            ),
+            OpenApiParameter(
+                'max_time',
+                OpenApiTypes.INT,
+                description='maximum time_minutes',
+            ),
+            OpenApiParameter(
+                'min_price',
+                OpenApiTypes.DECIMAL,
+                description='minimum price',
+            ),
+            OpenApiParameter(
+                'max_price',
+                OpenApiTypes.DECIMAL,
+                description='maximum price',
+            ),
+            OpenApiParameter(
+                'search',
+                OpenApiTypes.STR,
+                description='full text search , results are ranked',
+            ),
+            *SPARSE_FIELDS_PARAMETERS,
+        ]
+    ),
+    retrieve=extend_schema(parameters=SPARSE_FIELDS_PARAMETERS),
+    export=extend_schema(parameters=SPARSE_FIELDS_PARAMETERS),
+)
+class RecipeViewSet(
+    ReplicaReadMixin,
+    UserDataVersionMixin,
+    ConditionalGetMixin,
+    NDJSONListMixin,
+    SparseFieldsMixin,
+    AsyncReadMixin,
+    viewsets.ModelViewSet
+  ):
     serializer_class = serializers.RecipeDetailSerializer
     queryset = Recipe.objects.all()
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [
+        SignedTokenAuthentication,
+        CachedTokenAuthentication,
+    ]
     permission_classes = [IsAuthenticated]
+    ordering = '-id'
+    # recipes written per transaction by the bulk import
+    bulk_chunk_size = 500
+    # recipes a queued bulk import takes , they are stored in the job
+    bulk_async_max_rows = 10000
 
     def get_queryset(self):
-        return self.queryset.filter(
+        queryset = self.filter_params(self.queryset.filter(
             user=self.request.user
-        ).order_by('-id')
+        )).order_by(*self.get_ordering())
+        serializer_class = self.get_serializer_class()
+        if issubclass(serializer_class, ValuesSerializer):
+            # read paths render plain rows , tags are fetched by the
+            # serializer with one query per page , the cursor pagination
+            # seeks on the rank of ranked searches
+            queryset = queryset.values(*self.get_value_fields(
+                serializer_class, self.get_ordering()
+            ))
+        return queryset
+
+    def is_ranked_search(self):
+        return bool(self.request.query_params.get('search')) and \
+            search_is_ranked(self.queryset)
+
+    def get_ordering(self):
+        if self.is_ranked_search():
+            return ('-rank', self.ordering)
+        return (self.ordering,)
+
+    def filter_params(self, queryset):
+        """ filter the recipes by the query params , all run in sql """
+        params = self.request.query_params
+        if params.get('tags'):
+            tag_ids = _params_to_ints(params['tags'], 'tags')
+            # a semi join on the m2m table , no duplicates and no distinct
+            queryset = queryset.filter(Exists(
+                Recipe.tags.through.objects.filter(
+                    recipe_id=OuterRef('pk'),
+                    tag_id__in=tag_ids,
+                )
+            ))
+        if params.get('max_time'):
+            queryset = queryset.filter(time_minutes__lte=_param_to_number(
+                params['max_time'], 'max_time'
+            ))
+        if params.get('min_price'):
+            queryset = queryset.filter(price__gte=_param_to_number(
+                params['min_price'], 'min_price', Decimal
+            ))
+        if params.get('max_price'):
+            queryset = queryset.filter(price__lte=_param_to_number(
+                params['max_price'], 'max_price', Decimal
+            ))
+        if params.get('search'):
+            queryset = search_recipes(queryset, params['search'])
+        return queryset
+
+    def get_data_version(self):
+        version, modified = super().get_data_version()
+        if self.detail:
+            version = (version, _first_value(
+                list(self.get_recipe_version_queryset())
+            ))
+        return version, modified
+
+    async def async_get_data_version(self):
+        data_version = await super().async_get_data_version()
+        if data_version is None or not self.detail:
+            return data_version
+        version, modified = data_version
+        return (version, _first_value(
+            await fetch(self.get_recipe_version_queryset())
+        )), modified
+
+    def get_recipe_version_queryset(self):
+        """ the version of the recipe of a detail action """
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            queryset = self.queryset.filter(
+                user=self.request.user,
+                **{self.lookup_field: self.kwargs[lookup_url_kwarg]},
+            )
+        except (TypeError, ValueError):
+            # get_object answers the 404
+            queryset = self.queryset.none()
+        return queryset.values_list('version')[:1]
+
+    def get_validators(self, request, version, last_modified):
+        """
+        the etag of a recipe starts with its version , "3-<hash>" , so the
+        one a read returns is the one If-Match takes
+        """
+        key, etag, last_modified = super().get_validators(
+            request, version, last_modified
+        )
+        if self.detail and version[1] is not None:
+            etag = f'"{version[1]}-{key}"'
+        return key, etag, last_modified
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    async def async_retrieve(self, request, *args, **kwargs):
+        return await self.async_conditional_response(
+            super().async_retrieve, request, *args, **kwargs
+        )
 
     def get_serializer_class(self):
+        if getattr(self, 'swagger_fake_view', False):
+            # the schema is generated from the model serializers
+            return self.get_model_serializer_class()
+        if self.action == "list":
+            return self.sparse_fields(serializers.RecipeValuesSerializer)
+        if self.action in ('retrieve', 'export'):
+            return self.sparse_fields(
+                serializers.RecipeDetailValuesSerializer
+            )
+        return self.get_model_serializer_class()
+
+    def get_model_serializer_class(self):
         if self.action == "list":
             return serializers.RecipeSerializer
         return self.serializer_class
@@ -32,11 +323,129 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    def update(self, request, *args, **kwargs):
+        """ the response carries the etag a read of the recipe returns """
+        response = super().update(request, *args, **kwargs)
+        _, etag, last_modified = self.get_validators(
+            request, *self.get_data_version()
+        )
+        return self.set_validators(response, etag, last_modified)
+
+    def perform_update(self, serializer):
+        serializer.save(expected_versions=self.get_expected_versions())
+
+    def get_expected_versions(self):
+        """
+        the recipe versions If-Match accepts , the etag of a read ,
+        "3-<hash>" , or the version field alone , "3" , None when any
+        version goes , weak tags count too as core.compression weakens
+        the etag of a compressed read
+        """
+        if_match = self.request.headers.get('If-Match')
+        if if_match is None:
+            return None
+        etags = parse_etags(if_match)
+        if etags == ['*']:
+            return None
+        versions = set()
+        for etag in etags:
+            if etag.startswith('W/'):
+                etag = etag[2:]
+            version = etag.strip('"').split('-', 1)[0]
+            if etag.startswith('"') and version.isdigit():
+                versions.add(int(version))
+        return versions
+
+    @action(
+        detail=False,
+        methods=['post'],
+        url_path='bulk',
+        parser_classes=[JSONParser, NDJSONParser],
+    )
+    def bulk_create(self, request):
+        """
+        create recipes from a json array or an ndjson stream , every chunk
+        is validated and written in its own transaction , on invalid data
+        the chunks written so far are kept and reported , with the header
+        Prefer: respond-async the import is queued as a job instead
+        """
+        rows = request.data
+        if not isinstance(rows, (list, NDJSONRows)):
+            raise ParseError('expected a list of recipes')
+        if 'respond-async' in request.headers.get('Prefer', ''):
+            return self.bulk_create_job(request, rows)
+        rows = iter(rows)
+        created = 0
+        while True:
+            chunk = list(islice(rows, self.bulk_chunk_size))
+            if not chunk:
+                break
+            serializer = self.get_serializer(data=chunk, many=True)
+            if not serializer.is_valid():
+                return Response(
+                    {'created': created, 'errors': serializer.errors},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            with transaction.atomic():
+                serializer.save(user=request.user)
+            created += len(chunk)
+        return Response({'created': created}, status=status.HTTP_201_CREATED)
+
+    def bulk_create_job(self, request, rows):
+        """
+        queue the import as a job , the client polls the job url , the rows
+        go in the job payload so at most bulk_async_max_rows are taken
+        """
+        rows = list(islice(rows, self.bulk_async_max_rows + 1))
+        if len(rows) > self.bulk_async_max_rows:
+            raise ValidationError(
+                f'at most {self.bulk_async_max_rows} recipes are imported '
+                f'in the background , import more without '
+                f'Prefer: respond-async'
+            )
+        job = jobs.enqueue('recipe.bulk_import', {
+            'rows': rows,
+            'chunk_size': self.bulk_chunk_size,
+        }, user=request.user)
+        return Response(
+            JobSerializer(job).data,
+            status=status.HTTP_202_ACCEPTED,
+            headers={'Location': reverse('core:job-detail', args=[job.pk])},
+        )
+
+    @action(
+        detail=False,
+        methods=['get'],
+        renderer_classes=[NDJSONRenderer, JSONRenderer],
+    )
+    def export(self, request):
+        """ stream every recipe of the user as ndjson """
+        return self.stream_rows(self.get_queryset())
+
 
 """ Recipe Tags Views """
 
 
+@extend_schema_view(
+    list=extend_schema(
+        parameters=[
+            OpenApiParameter(
+                'assigned_only',
+                OpenApiTypes.INT,
+                enum=[0, 1],
+                description='only tags assigned to a recipe',
+            ),
+            *SPARSE_FIELDS_PARAMETERS,
+        ]
+    )
+)
 class TagViewSet(
+    ReplicaReadMixin,
+    UserDataVersionMixin,
+    ConditionalGetMixin,
+    NDJSONListMixin,
+    SparseFieldsMixin,
+    AsyncReadMixin,
     mixins.UpdateModelMixin,
     mixins.ListModelMixin,
     mixins.DestroyModelMixin,
@@ -44,10 +453,79 @@ class TagViewSet(
   ):
     serializer_class = serializers.TagSerializer
     queryset = Tag.objects.all()
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [
+        SignedTokenAuthentication,
+        CachedTokenAuthentication,
+    ]
     permission_classes = [IsAuthenticated]
+    ordering = '-name'
 
     def get_queryset(self):
-        return self.queryset.filter(
-            user=self.request.user
-        ).order_by('-name')
+        queryset = self.queryset.filter(user=self.request.user)
+        assigned_only = _param_to_number(
+            self.request.query_params.get('assigned_only', 0),
+            'assigned_only'
+        )
+        if assigned_only:
+            queryset = queryset.filter(Exists(
+                Recipe.tags.through.objects.filter(tag_id=OuterRef('pk'))
+            ))
+        queryset = queryset.order_by(self.ordering)
+        serializer_class = self.get_serializer_class()
+        if issubclass(serializer_class, ValuesSerializer):
+            queryset = queryset.values(*self.get_value_fields(
+                serializer_class, (self.ordering,)
+            ))
+        return queryset
+
+    def get_serializer_class(self):
+        if getattr(self, 'swagger_fake_view', False):
+            return self.serializer_class
+        if self.action == 'list':
+            return self.sparse_fields(serializers.TagValuesSerializer)
+        return self.serializer_class
+
+    def perform_update(self, serializer):
+        try:
+            with transaction.atomic():
+                serializer.save()
+        except IntegrityError:
+            raise ValidationError(
+                {'name': ['tag with this name already exists']}
+            )
+
+    def perform_destroy(self, instance):
+        deletion.delete_tag(instance)
+
+
+""" Recipe Stats Views """
+
+
+class RecipeStatsView(
+    ReplicaReadMixin,
+    UserDataVersionMixin,
+    ConditionalGetMixin,
+    generics.GenericAPIView
+  ):
+    """
+    aggregates over the recipes and tags of the user , read from one row
+    kept up to date on every write , see recipe.stats
+    """
+    serializer_class = serializers.RecipeStatsSerializer
+    authentication_classes = [
+        SignedTokenAuthentication,
+        CachedTokenAuthentication,
+    ]
+    permission_classes = [IsAuthenticated]
+    # the row is already the cache
+    cached_actions = ()
+    action = 'stats'
+
+    def get_object(self):
+        return stats.get_stats(self.request.user.id)
+
+    def get(self, request, *args, **kwargs):
+        return self.conditional_response(self.retrieve, request)
+
+    def retrieve(self, request):
+        return Response(self.get_serializer(self.get_object()).data)
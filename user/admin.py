@@ -2,6 +2,7 @@ from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.utils.translation import gettext_lazy as _
 from user import models
+from user.deletion import delete_user
 
 
 class UserAdmin(BaseUserAdmin):
@@ -45,5 +46,12 @@ class UserAdmin(BaseUserAdmin):
             }),
     )
 
+    def delete_model(self, request, obj):
+        delete_user(obj.pk)
+
+    def delete_queryset(self, request, queryset):
+        for user_id in queryset.values_list('pk', flat=True):
+            delete_user(user_id)
+
 
 admin.site.register(models.User, UserAdmin)
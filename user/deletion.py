@@ -0,0 +1,40 @@
+"""
+Account deletion , the recipe data goes in chunks before the user row
+"""
+from django.contrib.auth import get_user_model
+from rest_framework.authtoken.models import Token
+
+from core import jobs, tokens
+from core.deletion import get_fast_delete_config
+from recipe.deletion import delete_user_data
+from recipe.models import Recipe
+
+
+def deactivate_user(user_id):
+    """ lock the account out right away , its data may take a while """
+    get_user_model().objects.filter(pk=user_id).update(is_active=False)
+    # the post_delete signal drops the cached tokens
+    Token.objects.filter(user_id=user_id).delete()
+    tokens.revoke_user(user_id)
+
+
+def delete_user_now(user_id, progress=None):
+    delete_user_data(user_id, progress)
+    # what is left is a few rows per user , the collector is fine for those
+    get_user_model().objects.filter(pk=user_id).delete()
+
+
+def delete_user(user_id, background=None):
+    """
+    delete a user and everything it owns , accounts with more than
+    BACKGROUND_THRESHOLD recipes are deleted by a job , returns the job
+    or None once deleted
+    """
+    deactivate_user(user_id)
+    if background is None:
+        background = Recipe.objects.filter(user_id=user_id).count() > \
+            get_fast_delete_config()['BACKGROUND_THRESHOLD']
+    if background:
+        return jobs.enqueue('user.delete', {'user_id': user_id})
+    delete_user_now(user_id)
+    return None
@@ -0,0 +1,16 @@
+"""
+Job handlers of the user app , see core.jobs
+"""
+from core import jobs
+from user.deletion import delete_user_now
+
+
+@jobs.register('user.delete')
+def delete_user(job):
+    """
+    the progress is the rows deleted so far , saved with every chunk so
+    the lease of a long delete never runs out
+    """
+    job.set_progress(0)
+    delete_user_now(job.payload['user_id'], progress=job.set_progress)
+    return {'user_id': job.payload['user_id']}
@@ -29,6 +29,8 @@ class User(AbstractBaseUser, PermissionsMixin):
     name = models.CharField(max_length=255)
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
+    # signed tokens issued until then are revoked , see core.tokens
+    tokens_valid_after = models.DateTimeField(null=True, blank=True)
 
     objects = UserManager()
 
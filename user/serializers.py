@@ -5,8 +5,11 @@ from django.contrib.auth import (
 from django.utils.translation import gettext as _
 from rest_framework import serializers
 
+from core import tokens
+from core.serializers import TimedDataMixin
 
-class UserSerializer(serializers.ModelSerializer):
+
+class UserSerializer(TimedDataMixin, serializers.ModelSerializer):
 
     class Meta:
         model = get_user_model()
@@ -18,12 +21,20 @@ class UserSerializer(serializers.ModelSerializer):
         return get_user_model().objects.create_user(**validated_data)
 
     def update(self, instance, validated_data):
+        """ save only the fields sent , the others may be changed meanwhile """
         password = validated_data.pop('password', None)
-        user = super().update(instance, validated_data)
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        update_fields = list(validated_data)
+        if password:
+            instance.set_password(password)
+            update_fields.append('password')
+        if update_fields:
+            instance.save(update_fields=update_fields)
         if password:
-            user.set_password(password)
-            user.save()
-        return user
+            # signed tokens issued with the old password stop working
+            tokens.revoke_user(instance.pk)
+        return instance
 
 
 class AuthTokenSerializer(serializers.Serializer):
@@ -123,6 +123,15 @@ class PrivateAPIUserTests(TestCase):
         res = self.client.post(ME_URL, {})
         self.assertEqual(res.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
 
+    def test_delete_me_not_allowed(self):
+        """ test accounts are deleted by the admin only """
+        res = self.client.delete(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+        self.assertTrue(
+            get_user_model().objects.filter(pk=self.user.pk).exists()
+        )
+
     def test_update_user_profile(self):
         payload = {'name': 'updated name', 'password': 'updated_password_1234'}
         res = self.client.patch(ME_URL, payload)
@@ -132,3 +141,19 @@ class PrivateAPIUserTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(self.user.name, payload['name'])
         self.assertTrue(self.user.check_password(payload['password']))
+
+    def test_update_keeps_fields_changed_meanwhile(self):
+        """ test a stale authenticated user does not overwrite the row """
+        get_user_model().objects.filter(pk=self.user.pk).update(
+            is_staff=True,
+            name='changed meanwhile'
+        )
+
+        res = self.client.patch(ME_URL, {'email': 'new@example.com'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['name'], 'changed meanwhile')
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.is_staff)
+        self.assertEqual(self.user.name, 'changed meanwhile')
+        self.assertEqual(self.user.email, 'new@example.com')
@@ -1,26 +1,80 @@
-from rest_framework import generics, authentication, permissions
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.shortcuts import get_object_or_404
+from rest_framework import generics, permissions
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
 from rest_framework.settings import api_settings
+from core import tokens
+from core.authentication import (
+    CachedTokenAuthentication,
+    SignedTokenAuthentication,
+)
+from core.mixins import AsyncReadMixin, HashingBusyMixin
 from user.serializers import (
     UserSerializer,
     AuthTokenSerializer,
 )
 
 
-class CreateUserView(generics.CreateAPIView):
+class CreateUserView(HashingBusyMixin, generics.CreateAPIView):
     serializer_class = UserSerializer
 
 
-class CreateAuthTokenView(ObtainAuthToken):
+class CreateAuthTokenView(HashingBusyMixin, ObtainAuthToken):
     serializer_class = AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES  # django api docs
 
+    def post(self, request, *args, **kwargs):
+        config = tokens.get_signed_tokens_config()
+        if not config['ENABLED']:
+            return super().post(request, *args, **kwargs)
+        # a signed token needs no token row
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user = serializer.validated_data['user']
+        return Response({
+            'token': tokens.issue_token(user.pk),
+            'expires_in': config['TTL'],
+        })
+
 
-class ManageUserView(generics.RetrieveUpdateAPIView):
+class ManageUserView(
+    HashingBusyMixin,
+    AsyncReadMixin,
+    generics.RetrieveUpdateAPIView
+  ):
     serializer_class = UserSerializer
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [
+        SignedTokenAuthentication,
+        CachedTokenAuthentication,
+    ]
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self):
         """ return the authenticated user"""
-        return self.request.user
+        user = self.request.user
+        if self.request.method not in SAFE_METHODS:
+            # the user cached with the token may be stale , writes start
+            # from the locked row
+            return get_object_or_404(
+                get_user_model().objects.select_for_update(),
+                pk=user.pk
+            )
+        if user.get_deferred_fields():
+            # signed tokens carry only the user id
+            user = get_object_or_404(get_user_model(), pk=user.pk)
+        return user
+
+    def update(self, request, *args, **kwargs):
+        with transaction.atomic():
+            return super().update(request, *args, **kwargs)
+
+    async def async_get(self, request, *args, **kwargs):
+        """ the user comes with the cached token , nothing is queried """
+        if request.user.get_deferred_fields():
+            # the sync path loads the user of a signed token
+            return None
+        serializer = self.get_serializer(self.get_object())
+        return Response(serializer.data)